@@ -0,0 +1,197 @@
+"""
+Benchmark do banco: vazão síncrona e assíncrona com triagens concorrentes.
+
+    python -m benchmarks.db [--concorrencia 1 8 32] [--requisicoes 500]
+
+Cada requisição simulada espera `--latencia` segundos (a chamada ao
+LLM), grava uma triagem com os sinais vitais e a lê de volta pelo ID.
+No modo `sync` as requisições rodam em um pool de threads do tamanho da
+concorrência, como as rotas síncronas do FastAPI, cada uma com a sua
+`Session`; no `async` são corrotinas em um único event loop, cada uma
+com a sua `AsyncSession`. Os dois modos usam os engines de
+`hackathon.db`, com o pool configurado em `Settings` (variáveis
+`DATABASE_POOL_*`). Por padrão o banco é um SQLite temporário;
+`--database-url` mede outro banco (as tabelas são criadas se preciso).
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+from benchmarks.triagem import rss_mb, summarize
+from hackathon.db import create_async_db_engine, create_db_engine
+from hackathon.llm.refine import triagem_examples
+from hackathon.models import TriagemOrm
+from hackathon.schemas import TriagemModel
+from hackathon.settings import get_settings
+from hackathon.writer import IdGenerator, to_orm
+
+MODES = ('sync', 'async')
+WARMUP = 5
+
+new_id = IdGenerator()
+
+
+def triagens(total: int) -> list[TriagemModel]:
+    return [
+        triagem_examples[i % len(triagem_examples)][1].model_copy(
+            update={'id': new_id()}, deep=True
+        )
+        for i in range(total)
+    ]
+
+
+def run_sync(
+    engine: Engine, items: list[TriagemModel], concurrency: int, latency: float
+) -> tuple[list[float], int, float]:
+    latencies: list[float] = []
+    errors: list[Exception] = []
+
+    def request(triagem: TriagemModel):
+        start = time.perf_counter()
+        time.sleep(latency)
+        try:
+            with Session(engine) as session:
+                session.add(to_orm(triagem))
+                session.commit()
+            with Session(engine) as session:
+                session.get(TriagemOrm, triagem.id)
+        except SQLAlchemyError as exc:
+            errors.append(exc)
+        latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        start = time.perf_counter()
+        list(executor.map(request, items))
+        elapsed = time.perf_counter() - start
+
+    return latencies, len(errors), elapsed
+
+
+async def run_async(
+    engine: AsyncEngine,
+    items: list[TriagemModel],
+    concurrency: int,
+    latency: float,
+) -> tuple[list[float], int, float]:
+    latencies: list[float] = []
+    errors = 0
+    pending = iter(items)
+
+    async def worker():
+        nonlocal errors
+        for triagem in pending:
+            start = time.perf_counter()
+            await asyncio.sleep(latency)
+            try:
+                async with AsyncSession(engine) as session:
+                    session.add(to_orm(triagem))
+                    await session.commit()
+                async with AsyncSession(engine) as session:
+                    await session.get(TriagemOrm, triagem.id)
+            except SQLAlchemyError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def measure_async(
+    database_url: str, args: argparse.Namespace
+) -> dict[str, dict]:
+    engine = create_async_db_engine(database_url)
+    results = {}
+    try:
+        await run_async(engine, triagens(WARMUP), 1, 0)
+        for concurrency in args.concorrencia:
+            results[f'async c={concurrency}'] = summarize(
+                *await run_async(
+                    engine,
+                    triagens(args.requisicoes),
+                    concurrency,
+                    args.latencia,
+                ),
+                rss_mb(os.getpid()),
+            )
+    finally:
+        await engine.dispose()
+    return results
+
+
+def measure_sync(
+    database_url: str, args: argparse.Namespace
+) -> dict[str, dict]:
+    engine = create_db_engine(database_url)
+    results = {}
+    try:
+        run_sync(engine, triagens(WARMUP), 1, 0)
+        for concurrency in args.concorrencia:
+            results[f'sync c={concurrency}'] = summarize(
+                *run_sync(
+                    engine,
+                    triagens(args.requisicoes),
+                    concurrency,
+                    args.latencia,
+                ),
+                rss_mb(os.getpid()),
+            )
+    finally:
+        engine.dispose()
+    return results
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--concorrencia', type=int, nargs='+', default=[1, 8, 32]
+    )
+    parser.add_argument('--requisicoes', type=int, default=500)
+    parser.add_argument(
+        '--latencia', type=float, default=0.05, help='latência do LLM (s)'
+    )
+    parser.add_argument(
+        '--modo', nargs='+', default=list(MODES), choices=MODES
+    )
+    parser.add_argument('--database-url', help='banco a medir')
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    print(
+        f'pool: {settings.DATABASE_POOL_SIZE} conexões '
+        f'+ {settings.DATABASE_MAX_OVERFLOW} extras, '
+        f'pre-ping {settings.DATABASE_POOL_PRE_PING}, '
+        f'reciclagem {settings.DATABASE_POOL_RECYCLE}s'
+    )
+
+    results: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = (
+            args.database_url or f'sqlite:///{Path(tmp) / "bench.db"}'
+        )
+        # as tabelas vêm do engine síncrono
+        create_db_engine(database_url).dispose()
+
+        if 'sync' in args.modo:
+            results |= measure_sync(database_url, args)
+        if 'async' in args.modo:
+            results |= asyncio.run(measure_async(database_url, args))
+
+    header = ('p50_ms', 'p95_ms', 'p99_ms', 'rps', 'rss_mb', 'erros')
+    print(f'{"cenário":<16}' + ''.join(f'{h:>10}' for h in header))
+    for name, result in results.items():
+        print(f'{name:<16}' + ''.join(f'{result[h]:>10}' for h in header))
+
+
+if __name__ == '__main__':
+    main()
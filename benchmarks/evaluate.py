@@ -0,0 +1,264 @@
+"""
+Avaliação de acurácia por campo, latência e tokens sobre um corpus rotulado.
+
+    python -m benchmarks.evaluate [--perfil verbose compact] [--k 0 2]
+
+O corpus é um JSONL com `texto` e `esperado` (um `TriagemModel`). Cada
+combinação de `--perfil`, `--k` e `--modo` extrai todas as notas em
+paralelo com o LLM configurado (`get_router`). A comparação normaliza
+os valores: sinais vitais, datas, dor e urgência são comparados pelo
+número extraído (unidades e vírgula decimal não importam) e os campos
+de texto livre pelo F1 das palavras.
+
+As respostas ficam gravadas em `--gravacoes`, com latência e tokens, e
+são reaproveitadas enquanto a nota, o prompt, os exemplos e o modelo
+não mudarem; `--sem-gravacoes` força chamadas novas.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import re
+import statistics
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable
+
+from hackathon.llm.cache import normalize_text
+from hackathon.llm.chain import TriagemPipeline, get_router
+from hackathon.llm.profiles import PromptProfile
+from hackathon.llm.rules import ExtractionMode
+from hackathon.llm.tokens import approx_tokens, message_text
+from hackathon.metrics import request_usage
+from hackathon.parsers import (
+    parse_date,
+    parse_float,
+    parse_int,
+    parse_pressao_arterial,
+)
+from hackathon.schemas import SinaisVitaisModel, TriagemModel
+
+HERE = Path(__file__).resolve().parent
+CORPUS = HERE / 'corpus.jsonl'
+RECORDINGS = HERE / '.gravacoes.jsonl'
+
+PARSED_FIELDS: dict[str, Callable[[str | None], Any]] = {
+    'pressao_arterial': parse_pressao_arterial,
+    'temperatura': parse_float,
+    'frequencia_cardiaca': parse_int,
+    'frequencia_respiratoria': parse_int,
+    'saturacao_oxigenio': parse_int,
+    'inicio_sintoma': parse_date,
+    'escala_dor': parse_int,
+    'urgencia': parse_int,
+}
+TEXT_FIELDS = (
+    'historico_individual',
+    'historico_familiar',
+    'sintoma',
+    'sintoma_localizacao',
+    'sintomas_associados',
+)
+FIELDS = (*PARSED_FIELDS, *TEXT_FIELDS)
+WORD_PATTERN = re.compile(r'\w{3,}')
+
+
+def flatten(triagem: TriagemModel) -> dict[str, str | None]:
+    sinais_vitais = triagem.sinais_vitais or SinaisVitaisModel()
+    values = sinais_vitais.model_dump(exclude={'id'})
+    values |= triagem.model_dump(exclude={'id', 'sinais_vitais'})
+    return values
+
+
+def words(value: str) -> set[str]:
+    value = unicodedata.normalize('NFKD', value.casefold())
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return set(WORD_PATTERN.findall(value))
+
+
+def field_score(field: str, expected: str | None, actual: str | None) -> float:
+    if expected is None or actual is None:
+        return float(expected is None and actual is None)
+
+    if field in PARSED_FIELDS:
+        parse = PARSED_FIELDS[field]
+        if parse(expected) not in {None, (None, None)}:
+            return float(parse(expected) == parse(actual))
+
+    expected_words, actual_words = words(expected), words(actual)
+    if not expected_words and not actual_words:
+        return 1.0
+    common = len(expected_words & actual_words)
+    return 2 * common / (len(expected_words) + len(actual_words))
+
+
+def score(expected: TriagemModel, actual: TriagemModel) -> dict[str, float]:
+    expected_values, actual_values = flatten(expected), flatten(actual)
+    return {
+        field: field_score(field, expected_values[field], actual_values[field])
+        for field in FIELDS
+    }
+
+
+class Recordings:
+    """Respostas gravadas, em JSONL, indexadas pela configuração e nota."""
+
+    def __init__(self, path: Path | None):
+        self.path = path
+        self.records: dict[str, dict] = {}
+        if path is not None and path.exists():
+            with path.open(encoding='utf-8') as file:
+                for line in file:
+                    record = json.loads(line)
+                    self.records[record['chave']] = record
+
+    def get(self, key: str) -> dict | None:
+        return self.records.get(key)
+
+    def add(self, record: dict):
+        self.records[record['chave']] = record
+        if self.path is not None:
+            with self.path.open('a', encoding='utf-8') as file:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def estimate_usage(pipeline: TriagemPipeline, text: str, output: str) -> dict:
+    messages = pipeline.prompt.invoke({'text': text}).to_messages()
+    return {
+        'input_tokens': sum(approx_tokens(message_text(m)) for m in messages),
+        'output_tokens': approx_tokens(output),
+    }
+
+
+async def extract(
+    pipeline: TriagemPipeline,
+    text: str,
+    mode: ExtractionMode,
+    recordings: Recordings,
+    semaphore: asyncio.Semaphore,
+) -> dict:
+    payload = f'{pipeline.version}:{mode}:'
+    key = hashlib.sha256((payload + normalize_text(text)).encode()).hexdigest()
+    if (record := recordings.get(key)) is not None:
+        return record | {'gravado': True}
+
+    usage: dict[str, int] = {}
+    request_usage.set(usage)
+
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            triagem = await pipeline.ainvoke(text, mode=mode)
+        except Exception as exc:
+            return {'erro': str(exc) or type(exc).__name__, 'gravado': False}
+        latency = time.perf_counter() - start
+
+    output = triagem.model_dump_json()
+    record = {
+        'chave': key,
+        'triagem': triagem.model_dump(),
+        'latencia': latency,
+        'tokens': usage or estimate_usage(pipeline, text, output),
+    }
+    recordings.add(record)
+    return record | {'gravado': False}
+
+
+async def evaluate(
+    pipeline: TriagemPipeline,
+    corpus: list[tuple[str, TriagemModel]],
+    mode: ExtractionMode,
+    recordings: Recordings,
+    concurrency: int,
+) -> dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    records = await asyncio.gather(
+        *(
+            extract(pipeline, text, mode, recordings, semaphore)
+            for text, _ in corpus
+        )
+    )
+
+    scores = [
+        score(expected, TriagemModel.model_validate(record['triagem']))
+        if 'triagem' in record
+        else dict.fromkeys(FIELDS, 0.0)
+        for (_, expected), record in zip(corpus, records)
+    ]
+    done = [record for record in records if 'triagem' in record]
+    latencies = sorted(record['latencia'] for record in done) or [0.0]
+
+    report = {
+        field: statistics.mean(s[field] for s in scores) for field in FIELDS
+    }
+    report['média'] = statistics.mean(report.values())
+    report['p50_ms'] = statistics.median(latencies) * 1000
+    report['p95_ms'] = latencies[int(0.95 * (len(latencies) - 1))] * 1000
+    for kind in ('input_tokens', 'output_tokens'):
+        report[kind] = statistics.mean(
+            [record['tokens'].get(kind, 0) for record in done] or [0]
+        )
+    report['erros'] = len(records) - len(done)
+    report['gravadas'] = sum(record['gravado'] for record in records)
+    return report
+
+
+def load_corpus(path: Path) -> list[tuple[str, TriagemModel]]:
+    with path.open(encoding='utf-8') as file:
+        return [
+            (item['texto'], TriagemModel.model_validate(item['esperado']))
+            for item in map(json.loads, file)
+        ]
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--corpus', type=Path, default=CORPUS)
+    parser.add_argument(
+        '--perfil',
+        nargs='+',
+        type=PromptProfile,
+        default=list(PromptProfile),
+        choices=list(PromptProfile),
+    )
+    parser.add_argument('--k', type=int, nargs='+', default=[0])
+    parser.add_argument(
+        '--modo',
+        nargs='+',
+        type=ExtractionMode,
+        default=[ExtractionMode.LLM],
+        choices=list(ExtractionMode),
+    )
+    parser.add_argument('--concorrencia', type=int, default=8)
+    parser.add_argument('--gravacoes', type=Path, default=RECORDINGS)
+    parser.add_argument('--sem-gravacoes', action='store_true')
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    recordings = Recordings(None if args.sem_gravacoes else args.gravacoes)
+    router = get_router()
+
+    reports = {}
+    for profile, k, mode in itertools.product(args.perfil, args.k, args.modo):
+        pipeline = TriagemPipeline(router, profile=profile, few_shot_k=k)
+        reports[f'{profile}/k={k}/{mode}'] = asyncio.run(
+            evaluate(pipeline, corpus, mode, recordings, args.concorrencia)
+        )
+
+    width = max(len(name) for name in reports) + 2
+    print(f'{"campo":<24}' + ''.join(f'{name:>{width}}' for name in reports))
+    for row in next(iter(reports.values())):
+        values = ''.join(
+            f'{report[row]:>{width}.2f}'
+            if isinstance(report[row], float)
+            else f'{report[row]:>{width}}'
+            for report in reports.values()
+        )
+        print(f'{row:<24}{values}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark de inicialização do app: import, lifespan e primeira requisição.
+
+    python -m benchmarks.startup [--ref HEAD~1] [--repeticoes 5]
+
+Cada medição roda em um processo Python novo, com um banco SQLite
+temporário. Com `--ref`, a mesma medição também é feita em uma cópia
+(`git worktree`) da revisão informada, para comparar antes e depois.
+O `--provider` escolhe o LLM montado no lifespan (`fake` ou `cohere`;
+o Cohere não faz chamadas de rede ao ser instanciado).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+STAGES = ('import', 'lifespan', 'primeira_req', 'processo')
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+from hackathon.app import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app)
+ready = time.perf_counter()
+client.__enter__()
+started = time.perf_counter()
+client.get('/api/v1/triagem/1')
+done = time.perf_counter()
+client.__exit__(None, None, None)
+print(json.dumps({
+    'import': imported - start,
+    'lifespan': started - ready,
+    'primeira_req': done - started,
+}))
+"""
+
+
+def measure(tree: Path, provider: str) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = os.environ | {
+            'DATABASE_URL': f'sqlite:///{Path(tmp) / "startup.db"}',
+            'LLM_PROVIDER': provider,
+        }
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD],
+            cwd=tree,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        elapsed = time.perf_counter() - start
+
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['processo'] = elapsed
+    return timings
+
+
+def median(tree: Path, provider: str, repeat: int) -> dict[str, float]:
+    runs = [measure(tree, provider) for _ in range(repeat)]
+    return {
+        stage: statistics.median(run[stage] for run in runs)
+        for stage in STAGES
+    }
+
+
+def measure_ref(ref: str, provider: str, repeat: int) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = Path(tmp) / 'tree'
+        subprocess.run(
+            ['git', 'worktree', 'add', '--detach', str(tree), ref],
+            cwd=ROOT,
+            capture_output=True,
+            check=True,
+        )
+        try:
+            return median(tree, provider, repeat)
+        finally:
+            subprocess.run(
+                ['git', 'worktree', 'remove', '--force', str(tree)],
+                cwd=ROOT,
+                capture_output=True,
+                check=False,
+            )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--ref', help='revisão git para comparar')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument(
+        '--provider', default='fake', choices=('fake', 'cohere')
+    )
+    args = parser.parse_args(argv)
+
+    results = {'atual': median(ROOT, args.provider, args.repeticoes)}
+    if args.ref:
+        results[args.ref] = measure_ref(
+            args.ref, args.provider, args.repeticoes
+        )
+
+    print(f'{"":<10}' + ''.join(f'{stage:>14}' for stage in STAGES))
+    for name, timings in results.items():
+        print(
+            f'{name:<10}'
+            + ''.join(f'{timings[stage] * 1000:>12.0f}ms' for stage in STAGES)
+        )
+
+
+if __name__ == '__main__':
+    main()
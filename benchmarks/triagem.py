@@ -0,0 +1,232 @@
+"""
+Benchmark de carga dos endpoints de triagem com o modelo falso.
+
+    python -m benchmarks.triagem [--concorrencia 1 8 32] [--salvar]
+
+Sobe o app com `uvicorn` em um processo separado, usando
+`LLM_PROVIDER=fake` e um banco SQLite temporário, e dispara
+`--requisicoes` notas por nível de concorrência. Relata latência
+p50/p95/p99, vazão e memória residente (RSS) do servidor. Os resultados
+são comparados com `baselines.json`; com `--salvar` eles passam a ser a
+nova referência. Sai com código 1 quando há regressão acima de
+`--tolerancia`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from hackathon.llm.refine import triagem_examples
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINES = Path(__file__).resolve().parent / 'baselines.json'
+ENDPOINTS = ('/api/v1/triagem/', '/api/v1/triagem/async')
+STARTUP_TIMEOUT = 30.0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    with open(f'/proc/{pid}/status', encoding='utf-8') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def start_server(
+    port: int, database: Path, latency: float, jitter: float
+) -> subprocess.Popen:
+    env = os.environ | {
+        'DATABASE_URL': f'sqlite:///{database}',
+        'LLM_PROVIDER': 'fake',
+        'FAKE_LLM_LATENCY': str(latency),
+        'FAKE_LLM_JITTER': str(jitter),
+    }
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            '-m',
+            'uvicorn',
+            'hackathon.app:app',
+            '--port',
+            str(port),
+            '--log-level',
+            'warning',
+            '--no-access-log',
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/api/v1/triagem/fila')
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+    server.kill()
+    raise RuntimeError('O servidor não iniciou a tempo')
+
+
+def notas(total: int, offset: int = 0) -> list[str]:
+    # cada nota é única para que o cache de extrações não mascare o custo
+    return [
+        f'{triagem_examples[i % len(triagem_examples)][0]} '
+        f'Registro {offset + i}.'
+        for i in range(total)
+    ]
+
+
+async def run_level(
+    url: str, concurrency: int, texts: list[str]
+) -> tuple[list[float], int, float]:
+    latencies: list[float] = []
+    errors = 0
+    pending = iter(texts)
+
+    async with httpx.AsyncClient(
+        timeout=60,
+        limits=httpx.Limits(max_connections=concurrency),
+    ) as client:
+
+        async def worker():
+            nonlocal errors
+            for text in pending:
+                start = time.perf_counter()
+                response = await client.post(url, json={'triagem_text': text})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != httpx.codes.OK:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return latencies, errors, elapsed
+
+
+def summarize(
+    latencies: list[float], errors: int, elapsed: float, rss: float
+) -> dict[str, float]:
+    percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'p50_ms': round(percentiles[49] * 1000, 2),
+        'p95_ms': round(percentiles[94] * 1000, 2),
+        'p99_ms': round(percentiles[98] * 1000, 2),
+        'rps': round(len(latencies) / elapsed, 1),
+        'rss_mb': round(rss, 1),
+        'erros': errors,
+    }
+
+
+def regressions(
+    results: dict[str, dict], baselines: dict[str, dict], tolerance: float
+) -> list[str]:
+    found = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+
+        if result['p95_ms'] > baseline['p95_ms'] * (1 + tolerance):
+            found.append(
+                f'{name}: p95 {result["p95_ms"]}ms '
+                f'(referência {baseline["p95_ms"]}ms)'
+            )
+        if result['rps'] < baseline['rps'] * (1 - tolerance):
+            found.append(
+                f'{name}: vazão {result["rps"]}/s '
+                f'(referência {baseline["rps"]}/s)'
+            )
+        if result['erros'] > baseline['erros']:
+            found.append(f'{name}: {result["erros"]} erros')
+    return found
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--concorrencia', type=int, nargs='+', default=[1, 8, 32]
+    )
+    parser.add_argument('--requisicoes', type=int, default=200)
+    parser.add_argument(
+        '--latencia', type=float, default=0.05, help='latência do LLM (s)'
+    )
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument(
+        '--endpoint', nargs='+', default=list(ENDPOINTS), choices=ENDPOINTS
+    )
+    parser.add_argument('--tolerancia', type=float, default=0.2)
+    parser.add_argument(
+        '--salvar', action='store_true', help='grava como nova referência'
+    )
+    args = parser.parse_args(argv)
+
+    port = free_port()
+    results: dict[str, dict] = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(
+            port, Path(tmp) / 'bench.db', args.latencia, args.jitter
+        )
+        try:
+            offset = 0
+            for endpoint in args.endpoint:
+                url = f'http://127.0.0.1:{port}{endpoint}'
+                asyncio.run(run_level(url, 1, notas(5, offset)))
+                offset += 5
+
+                for concurrency in args.concorrencia:
+                    texts = notas(args.requisicoes, offset)
+                    offset += args.requisicoes
+                    latencies, errors, elapsed = asyncio.run(
+                        run_level(url, concurrency, texts)
+                    )
+                    results[f'{endpoint} c={concurrency}'] = summarize(
+                        latencies, errors, elapsed, rss_mb(server.pid)
+                    )
+        finally:
+            server.terminate()
+            server.wait()
+
+    header = ('p50_ms', 'p95_ms', 'p99_ms', 'rps', 'rss_mb', 'erros')
+    print(f'{"cenário":<32}' + ''.join(f'{h:>10}' for h in header))
+    for name, result in results.items():
+        print(f'{name:<32}' + ''.join(f'{result[h]:>10}' for h in header))
+
+    baselines = {}
+    if BASELINES.exists():
+        baselines = json.loads(BASELINES.read_text(encoding='utf-8'))
+
+    if args.salvar:
+        BASELINES.write_text(
+            json.dumps(baselines | results, indent=2) + '\n',
+            encoding='utf-8',
+        )
+        return 0
+
+    found = regressions(results, baselines, args.tolerancia)
+    for regression in found:
+        print(f'REGRESSÃO {regression}')
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,45 @@
+import json
+from datetime import datetime
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
-from langchain_cohere import ChatCohere
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from pydantic import BaseModel
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 
-from hackathon.llm.chain import get_llm
-from hackathon.llm.refine import (
-    tool_example_to_messages,
-    triagem_examples,
+from hackathon.db import get_session
+from hackathon.dictation import DictationSession
+from hackathon.fila import FilaPrioridade, get_fila
+from hackathon.jobs import JobQueue, JobQueueFullError, get_jobs
+from hackathon.llm.chain import (
+    LLMBusyError,
+    TriagemPipeline,
+    get_pipeline,
+)
+from hackathon.llm.rules import ExtractionMode, extract_sinais_vitais
+from hackathon.metrics import span
+from hackathon.models import SinaisVitaisOrm, TriagemOrm
+from hackathon.news2 import news2, rescore, triagem_resposta
+from hackathon.schemas import (
+    FilaItem,
+    JobModel,
+    News2Item,
+    TriagemBatchItem,
+    TriagemModel,
+    TriagemResposta,
 )
-from hackathon.schemas import TriagemModel
+from hackathon.settings import get_settings
+from hackathon.writer import TriagemWriter, get_writer
 
 router = APIRouter(
     prefix='/api/v1/triagem',
@@ -24,71 +52,339 @@ class Input(BaseModel):
     triagem_text: str
 
 
-@router.post('/', status_code=HTTPStatus.OK, response_model=TriagemModel)
+class PrioridadeInput(BaseModel):
+    urgencia: int = Field(ge=0, le=10)
+
+
+def get_mode(modo: ExtractionMode | None = None) -> ExtractionMode:
+    # padrão lido a cada requisição, e não na importação do módulo
+    return modo or ExtractionMode(get_settings().EXTRACTION_MODE)
+
+
+@router.post('/', status_code=HTTPStatus.OK, response_model=TriagemResposta)
 def criar_nova_triagem(
     input: Input,
-    llm: Annotated[ChatCohere, Depends(get_llm)],
+    pipeline: Annotated[TriagemPipeline, Depends(get_pipeline)],
+    writer: Annotated[TriagemWriter, Depends(get_writer)],
+    modo: Annotated[ExtractionMode, Depends(get_mode)],
+    segmentar: bool = False,
+):
+    if segmentar:
+        output = pipeline.invoke_segments(input.triagem_text, modo)
+    else:
+        output = pipeline.invoke(input.triagem_text, modo)
+    with span('persist'):
+        writer.submit(output)
+    return triagem_resposta(output)
+
+
+@router.get('/', status_code=HTTPStatus.OK, response_model=list[TriagemModel])
+def listar_triagens(  # noqa: PLR0913, PLR0917
+    session: Annotated[Session, Depends(get_session)],
+    urgencia_min: Annotated[int | None, Query(ge=0, le=10)] = None,
+    escala_dor_min: Annotated[int | None, Query(ge=0, le=10)] = None,
+    saturacao_max: Annotated[int | None, Query(ge=0, le=100)] = None,
+    sistolica_min: Annotated[int | None, Query(ge=0)] = None,
+    limite: Annotated[int, Query(gt=0, le=500)] = 50,
+):
+    query = select(TriagemOrm)
+
+    if urgencia_min is not None:
+        query = query.where(TriagemOrm.urgencia_nivel >= urgencia_min)
+
+    if escala_dor_min is not None:
+        query = query.where(TriagemOrm.escala_dor_nivel >= escala_dor_min)
+
+    if saturacao_max is not None or sistolica_min is not None:
+        query = query.join(TriagemOrm.sinais_vitais)
+
+    if saturacao_max is not None:
+        query = query.where(
+            SinaisVitaisOrm.saturacao_oxigenio_pct <= saturacao_max
+        )
+
+    if sistolica_min is not None:
+        query = query.where(SinaisVitaisOrm.pressao_sistolica >= sistolica_min)
+
+    query = query.order_by(
+        TriagemOrm.urgencia_nivel.desc().nulls_last(), TriagemOrm.criado_em
+    ).limit(limite)
+
+    return session.scalars(query).all()
+
+
+@router.get('/cache', status_code=HTTPStatus.OK)
+def estatisticas_cache(
+    pipeline: Annotated[TriagemPipeline, Depends(get_pipeline)],
+):
+    if pipeline.cache is None:
+        return {}
+    return pipeline.cache.stats()
+
+
+@router.post(
+    '/async', status_code=HTTPStatus.OK, response_model=TriagemResposta
+)
+async def criar_nova_triagem_async(  # noqa: PLR0913, PLR0917
+    input: Input,
+    pipeline: Annotated[TriagemPipeline, Depends(get_pipeline)],
+    writer: Annotated[TriagemWriter, Depends(get_writer)],
+    modo: Annotated[ExtractionMode, Depends(get_mode)],
+    timeout: Annotated[float | None, Query(gt=0)] = None,
+    segmentar: bool = False,
+):
+    extract = pipeline.ainvoke_segments if segmentar else pipeline.ainvoke
+    try:
+        output = await extract(input.triagem_text, timeout, modo)
+    except LLMBusyError as exc:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail=str(exc),
+            headers={'Retry-After': '1'},
+        )
+    except TimeoutError:
+        raise HTTPException(
+            status_code=HTTPStatus.GATEWAY_TIMEOUT,
+            detail='O LLM não respondeu dentro do prazo',
+        )
+
+    with span('persist'):
+        writer.submit(output)
+    return triagem_resposta(output)
+
+
+@router.post(
+    '/batch',
+    status_code=HTTPStatus.OK,
+    response_model=list[TriagemBatchItem],
+)
+async def criar_triagens_em_lote(
+    inputs: Annotated[list[Input], Body(min_length=1)],
+    pipeline: Annotated[TriagemPipeline, Depends(get_pipeline)],
+    writer: Annotated[TriagemWriter, Depends(get_writer)],
+    modo: Annotated[ExtractionMode, Depends(get_mode)],
+    concorrencia: Annotated[int | None, Query(gt=0)] = None,
+):
+    max_size = get_settings().LLM_BATCH_MAX_SIZE
+    if len(inputs) > max_size:
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail=f'O lote aceita no máximo {max_size} notas',
+        )
+
+    outputs = await pipeline.abatch(
+        [input.triagem_text for input in inputs], concorrencia, modo
+    )
+
+    items = []
+    for output in outputs:
+        if isinstance(output, BaseException):
+            items.append(
+                TriagemBatchItem(erro=f'{type(output).__name__}: {output}')
+            )
+        else:
+            writer.submit(output)
+            items.append(TriagemBatchItem(triagem=output))
+
+    return items
+
+
+def sse_erro(status: HTTPStatus, detalhe: str) -> str:
+    data = json.dumps(
+        {'status': status.value, 'detalhe': detalhe}, ensure_ascii=False
+    )
+    return f'event: erro\ndata: {data}\n\n'
+
+
+@router.post('/stream', status_code=HTTPStatus.OK)
+async def criar_nova_triagem_stream(
+    input: Input,
+    pipeline: Annotated[TriagemPipeline, Depends(get_pipeline)],
+    writer: Annotated[TriagemWriter, Depends(get_writer)],
+    modo: Annotated[ExtractionMode, Depends(get_mode)],
+    timeout: Annotated[float | None, Query(gt=0)] = None,
+):
+    async def events():
+        # o escore sai antes da primeira resposta do LLM
+        alerta = news2(extract_sinais_vitais(input.triagem_text))
+        yield f'event: news2\ndata: {alerta.model_dump_json()}\n\n'
+
+        # o status HTTP já foi enviado: os erros do LLM viram um evento
+        triagem = None
+        try:
+            async for triagem in pipeline.astream(
+                input.triagem_text, timeout, modo
+            ):
+                yield f'data: {triagem.model_dump_json()}\n\n'
+        except LLMBusyError as exc:
+            yield sse_erro(HTTPStatus.SERVICE_UNAVAILABLE, str(exc))
+            return
+        except TimeoutError:
+            yield sse_erro(
+                HTTPStatus.GATEWAY_TIMEOUT,
+                'O LLM não respondeu dentro do prazo',
+            )
+            return
+
+        if triagem is not None:
+            writer.submit(triagem)
+            yield f'event: fim\ndata: {triagem.model_dump_json()}\n\n'
+        else:
+            yield 'event: fim\ndata: {}\n\n'
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@router.websocket('/ditado')
+async def ditado_ao_vivo(
+    websocket: WebSocket,
+    pipeline: Annotated[TriagemPipeline, Depends(get_pipeline)],
+):
+    await websocket.accept()
+    try:
+        await DictationSession(pipeline).run(websocket)
+    except WebSocketDisconnect:
+        pass
+
+
+@router.post('/jobs', status_code=HTTPStatus.ACCEPTED, response_model=JobModel)
+async def criar_job(
+    input: Input,
+    jobs: Annotated[JobQueue, Depends(get_jobs)],
+    modo: Annotated[ExtractionMode, Depends(get_mode)],
+):
+    try:
+        job = jobs.submit(input.triagem_text, modo)
+    except JobQueueFullError as exc:
+        raise HTTPException(
+            status_code=HTTPStatus.TOO_MANY_REQUESTS,
+            detail=str(exc),
+            headers={'Retry-After': str(exc.retry_after)},
+        )
+
+    return job.to_model()
+
+
+@router.get(
+    '/jobs/{job_id}', status_code=HTTPStatus.OK, response_model=JobModel
+)
+async def buscar_job(
+    job_id: str,
+    jobs: Annotated[JobQueue, Depends(get_jobs)],
+    espera: Annotated[float, Query(ge=0)] = 0,
+):
+    job = jobs.get(job_id)
+
+    if job is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='Job não encontrado',
+        )
+
+    if espera:
+        # espera longa demais é limitada, e não recusada
+        await jobs.wait(job, min(espera, get_settings().JOB_MAX_WAIT))
+
+    return job.to_model()
+
+
+@router.get('/fila', status_code=HTTPStatus.OK, response_model=list[FilaItem])
+def listar_fila(
+    fila: Annotated[FilaPrioridade, Depends(get_fila)],
+    limite: Annotated[int, Query(ge=1, le=500)] = 10,
 ):
-    prompt = ChatPromptTemplate.from_messages([
-        (
-            'system',
-            'Você é um especialista médico responsável por '
-            'extrair dados. O texto será escrito pelos '
-            'profissionais de enfermagem. Sua tarefa é '
-            'identificar e extrair as informações relevantes. '
-            'Os sinais vitais do paciente devem ser identificados e '
-            'extrair os dados conforme descrito. A pressão '
-            'arterial deve ser extraída em mmHg. Exemplo: '
-            '120/80. A frequência cardíaca deve ser extraída '
-            'em bpm. Exemplo: 75 bpm. A temperatura corporal '
-            'deve ser extraída em graus Celsius. Exemplo: '
-            '37.5°C. A saturação de oxigênio deve ser extraída '
-            'em porcentagem. Exemplo: 98%. A frequência '
-            'respiratória deve ser extraída em rpm. Exemplo: '
-            '16 rpm. Caso não seja mencionado, o valor será '
-            'None. O histórico individual do paciente deve '
-            'ser extraído. Inclua informações sobre doenças '
-            'pré-existentes. Exemplos de doenças: diabetes, '
-            'hipertensão, asma. Se não estiver presente, o '
-            'valor será None. O histórico familiar deve ser '
-            'extraído. Inclua doenças que afetam familiares '
-            'próximos. Exemplo: câncer, mãe; hipertensão, pai. '
-            'Caso não mencione histórico familiar, o valor '
-            'será None. O motivo da consulta deve ser '
-            'descrito. Identifique o início dos sintomas, '
-            'data no formato AAAA-MM-DD. Exemplo: '
-            '2024-11-10. A localização do sintoma principal '
-            'deve ser extraída. Sintomas principais: dor, '
-            'falta de ar, tontura, etc. Sintomas associados '
-            'devem ser identificados, como febre, etc. Se essas '
-            'informações não estiverem no texto, será None. Se '
-            'a intensidade da dor for mencionada, extraia a '
-            'escala. Exemplo: 5. Caso não mencione a escala de '
-            'dor, o valor será None. A urgência do atendimento '
-            'deve ser extraída. A urgência pode ser uma '
-            'classificação de prioridade. Exemplo: 8. Caso a '
-            'urgência não seja mencionada, o valor será None. '
-            'Forneça uma extração precisa e clara das informações. '
-            'Quando algum dado não for encontrado, retorne None.',
-        ),
-        MessagesPlaceholder('examples'),
-        ('human', '{text}'),
-    ])
-
-    messages = []
-
-    for text, tool_call in triagem_examples:
-        messages.extend(
-            tool_example_to_messages({
-                'input': text,
-                'tool_calls': [tool_call],
-            })
+    return fila.top(limite)
+
+
+@router.get(
+    '/fila/proximo', status_code=HTTPStatus.OK, response_model=FilaItem
+)
+def proximo_paciente(
+    fila: Annotated[FilaPrioridade, Depends(get_fila)],
+):
+    item = fila.peek()
+
+    if item is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='Fila vazia',
         )
 
-    runnable = prompt | llm.with_structured_output(schema=TriagemModel)
+    return item
+
+
+@router.post(
+    '/fila/chamar', status_code=HTTPStatus.OK, response_model=FilaItem
+)
+def chamar_proximo_paciente(
+    fila: Annotated[FilaPrioridade, Depends(get_fila)],
+    writer: Annotated[TriagemWriter, Depends(get_writer)],
+):
+    item = fila.pop()
+
+    if item is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='Fila vazia',
+        )
+
+    writer.update(item.triagem_id, atendido_em=datetime.now())
+    return item
+
+
+@router.put(
+    '/fila/{triagem_id}', status_code=HTTPStatus.OK, response_model=FilaItem
+)
+def repriorizar_paciente(
+    triagem_id: int,
+    input: PrioridadeInput,
+    fila: Annotated[FilaPrioridade, Depends(get_fila)],
+    writer: Annotated[TriagemWriter, Depends(get_writer)],
+):
+    item = fila.reprioritize(triagem_id, input.urgencia)
+
+    if item is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='Paciente não está na fila',
+        )
+
+    writer.update(
+        triagem_id,
+        urgencia=str(input.urgencia),
+        urgencia_nivel=input.urgencia,
+    )
+    return item
+
+
+@router.get(
+    '/news2', status_code=HTTPStatus.OK, response_model=list[News2Item]
+)
+def reavaliar_news2(
+    session: Annotated[Session, Depends(get_session)],
+    minimo: Annotated[int, Query(ge=0)] = 5,
+    limite: Annotated[int, Query(gt=0, le=500)] = 50,
+):
+    return rescore(session, minimo, limite)
+
+
+@router.get(
+    '/{triagem_id}', status_code=HTTPStatus.OK, response_model=TriagemResposta
+)
+def buscar_triagem(
+    triagem_id: int,
+    session: Annotated[Session, Depends(get_session)],
+):
+    triagem = session.get(TriagemOrm, triagem_id)
+
+    if triagem is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='Triagem não encontrada',
+        )
 
-    output = runnable.invoke({
-        'examples': messages,
-        'text': input.triagem_text,
-    })
-    return output
+    return triagem_resposta(TriagemModel.model_validate(triagem))
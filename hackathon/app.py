@@ -1,13 +1,108 @@
+import time
+import uuid
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import (
+    HTMLResponse,
+    PlainTextResponse,
+    RedirectResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from sqlalchemy.orm import Session
 
 from hackathon.api import (
     triagem,
 )
+from hackathon.db import create_db_engine
+from hackathon.fila import FilaPrioridade
+from hackathon.jobs import JobQueue
+from hackathon.llm.cache import ExtractionCache
+from hackathon.llm.chain import TriagemPipeline, get_router
+from hackathon.metrics import (
+    HTTP_DURATION,
+    HTTP_IN_FLIGHT,
+    HTTP_REQUESTS,
+    REGISTRY,
+    request_timings,
+    server_timing,
+)
+from hackathon.settings import get_settings
+from hackathon.writer import TriagemWriter
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    engine = create_db_engine(settings.DATABASE_URL)
+    app.state.engine = engine
+    # criado no primeiro uso, por `get_async_engine`
+    app.state.async_engine = None
+
+    cache = ExtractionCache(
+        maxsize=settings.CACHE_MAXSIZE,
+        ttl=settings.CACHE_TTL,
+        engine=engine if settings.CACHE_PERSISTENT else None,
+    )
+    app.state.pipeline = TriagemPipeline(get_router(), cache=cache)
+
+    app.state.fila = FilaPrioridade()
+    with Session(engine) as session:
+        app.state.fila.rebuild(session)
+
+    app.state.writer = TriagemWriter(engine, fila=app.state.fila)
+    app.state.writer.start()
+
+    app.state.jobs = JobQueue(app.state.pipeline, app.state.writer)
+    app.state.jobs.start()
+
+    yield
+
+    await app.state.jobs.stop()
+    app.state.writer.stop()
+    if app.state.async_engine is not None:
+        await app.state.async_engine.dispose()
+    engine.dispose()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware('http')
+async def metrics_middleware(request: Request, call_next):
+    timings: dict[str, float] = {}
+    token = request_timings.set(timings)
+    start = time.perf_counter()
+
+    try:
+        with HTTP_IN_FLIGHT.track():
+            response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+
+    elapsed = time.perf_counter() - start
+    route = getattr(request.scope.get('route'), 'path', 'desconhecida')
+    HTTP_REQUESTS.inc(
+        method=request.method, route=route, status=str(response.status_code)
+    )
+    HTTP_DURATION.observe(elapsed, method=request.method, route=route)
+
+    if get_settings().METRICS_SERVER_TIMING:
+        timings['total'] = elapsed
+        response.headers['Server-Timing'] = server_timing(timings)
+        response.headers['X-Request-ID'] = request.headers.get(
+            'X-Request-ID', uuid.uuid4().hex
+        )
+
+    return response
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(
+        REGISTRY.render(), media_type='text/plain; version=0.0.4'
+    )
 
 
 app.mount('/static', StaticFiles(directory='static'), name='static')
@@ -1,16 +1,100 @@
-from sqlalchemy import create_engine
+from fastapi import FastAPI, Request
+from sqlalchemy import URL, Engine, create_engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from hackathon.models import Base
+from hackathon.migrate import upgrade_schema
 from hackathon.settings import get_settings
 
-settings = get_settings()
+# driver assíncrono de cada banco; o driver precisa estar instalado
+ASYNC_DRIVERS = {'sqlite': 'aiosqlite', 'postgresql': 'asyncpg'}
 
-engine = create_engine(settings.DATABASE_URL)
 
-Base.metadata.create_all(bind=engine, checkfirst=True)
+def pool_options(database_url: str | URL) -> dict:
+    """
+    Configuração do pool de conexões vinda de `Settings`. O SQLite em
+    memória usa um pool de conexão única, que não aceita essas opções.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite' and url.database in {
+        None,
+        '',
+        ':memory:',
+    }:
+        return {}
 
+    settings = get_settings()
+    return {
+        'pool_size': settings.DATABASE_POOL_SIZE,
+        'max_overflow': settings.DATABASE_MAX_OVERFLOW,
+        'pool_timeout': settings.DATABASE_POOL_TIMEOUT,
+        'pool_recycle': settings.DATABASE_POOL_RECYCLE,
+        'pool_pre_ping': settings.DATABASE_POOL_PRE_PING,
+    }
 
-def get_session():
-    with Session(engine) as session:
+
+def async_database_url(database_url: str | URL) -> URL:
+    """Mesma URL, com o driver assíncrono do banco."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'Banco sem driver assíncrono: {backend}')
+    return url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}')
+
+
+def create_db_engine(database_url: str) -> Engine:
+    engine = create_engine(database_url, **pool_options(database_url))
+
+    # cria as tabelas e acrescenta às existentes as colunas novas
+    upgrade_schema(engine)
+
+    return engine
+
+
+def create_async_db_engine(database_url: str) -> AsyncEngine:
+    # as tabelas são criadas pelo engine síncrono, na inicialização
+    options = pool_options(database_url)
+    if options and make_url(database_url).get_backend_name() == 'sqlite':
+        # o padrão do aiosqlite é abrir uma conexão (e uma thread) por
+        # sessão; com o pool, elas são reaproveitadas
+        options['poolclass'] = AsyncAdaptedQueuePool
+
+    url = async_database_url(database_url)
+    try:
+        return create_async_engine(url, **options)
+    except ImportError as exc:
+        raise RuntimeError(
+            f'Driver assíncrono não instalado: {url.get_driver_name()} '
+            '(no PostgreSQL, instale o extra `postgres`)'
+        ) from exc
+
+
+def get_async_engine(app: FastAPI) -> AsyncEngine:
+    """
+    Engine assíncrono do app, criado no primeiro uso: sem rotas
+    assíncronas no banco, a aplicação sobe sem o driver assíncrono.
+    """
+    if app.state.async_engine is None:
+        app.state.async_engine = create_async_db_engine(
+            get_settings().DATABASE_URL
+        )
+    return app.state.async_engine
+
+
+def get_session(request: Request):
+    with Session(request.app.state.engine) as session:
+        yield session
+
+
+async def get_async_session(request: Request):
+    # sem expirar no commit: no modo assíncrono, recarregar um atributo
+    # fora de um `await` levanta erro
+    async with AsyncSession(
+        get_async_engine(request.app), expire_on_commit=False
+    ) as session:
         yield session
@@ -0,0 +1,226 @@
+import asyncio
+import math
+import re
+
+from fastapi import WebSocket
+from pydantic import ValidationError
+
+from hackathon.llm.chain import TriagemPipeline
+from hackathon.llm.rules import (
+    ExtractionMode,
+    extract_rules,
+    free_text_terms,
+    is_vitals_only,
+)
+from hackathon.llm.segments import merge_triagens
+from hackathon.metrics import DICTATION_EXTRACTIONS
+from hackathon.news2 import news2
+from hackathon.schemas import DitadoDelta, TriagemModel
+from hackathon.settings import get_settings
+
+# fim de frase: pontuação seguida de espaço (não quebra '36.7') ou
+# quebra de linha
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?;])\s+|\n+')
+
+
+class DictationSession:
+    """
+    Triagem preenchida enquanto a nota é digitada ou ditada. O cliente
+    envia deltas (`DitadoDelta`: troca `texto[inicio:fim]` por `texto`)
+    e, após `debounce` segundos sem novos deltas, a sessão:
+
+    - extrai por regras apenas as frases novas ou alteradas (as demais
+      vêm de `sentences`) e envia os campos, com o escore NEWS2;
+    - chama o LLM, no modo híbrido, só quando o texto livre mudou em ao
+      menos `min_change` palavras, ou na fração `min_change_ratio` das
+      palavras da nota, se maior, desde a última chamada. É uma chamada
+      por vez, com ao menos `llm_interval` segundos entre o início de
+      duas; o que mudar na espera vai na chamada seguinte. Os parciais
+      não são gravados no cache, e os sinais vitais continuam vindo das
+      regras.
+
+    Cada atualização é enviada como `{'tipo': 'campos', 'fonte': ...}`
+    apenas quando algum campo muda.
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        pipeline: TriagemPipeline,
+        debounce: float | None = None,
+        min_change: int | None = None,
+        max_chars: int | None = None,
+        min_change_ratio: float | None = None,
+        llm_interval: float | None = None,
+    ):
+        settings = get_settings()
+        self.pipeline = pipeline
+        self.debounce = (
+            settings.DICTATION_DEBOUNCE if debounce is None else debounce
+        )
+        self.min_change = min_change or settings.DICTATION_MIN_CHANGE
+        self.max_chars = max_chars or settings.DICTATION_MAX_CHARS
+        self.min_change_ratio = (
+            settings.DICTATION_MIN_CHANGE_RATIO
+            if min_change_ratio is None
+            else min_change_ratio
+        )
+        self.llm_interval = (
+            settings.DICTATION_LLM_INTERVAL
+            if llm_interval is None
+            else llm_interval
+        )
+        self.text = ''
+        self.sentences: dict[str, TriagemModel] = {}
+        self.local = TriagemModel()
+        self.llm_output: TriagemModel | None = None
+        self.llm_terms: set[str] = set()
+        self.sent: TriagemModel | None = None
+        self._llm_task: asyncio.Task | None = None
+        self._llm_started = -math.inf
+        self._send_lock = asyncio.Lock()
+
+    def apply(self, delta: DitadoDelta):
+        if delta.fim < delta.inicio or delta.fim > len(self.text):
+            raise ValueError('Delta fora do texto')
+        size = len(self.text) - (delta.fim - delta.inicio) + len(delta.texto)
+        if size > self.max_chars:
+            raise ValueError('Texto do ditado muito longo')
+
+        self.text = (
+            self.text[: delta.inicio] + delta.texto + self.text[delta.fim :]
+        )
+
+    def extract_local(self) -> TriagemModel:
+        sentences = [
+            sentence
+            for sentence in map(str.strip, SENTENCE_PATTERN.split(self.text))
+            if sentence
+        ]
+        self.sentences = {
+            sentence: self.sentences.get(sentence) or extract_rules(sentence)
+            for sentence in sentences
+        }
+        # na ordem do texto: o último valor de cada sinal vital vale
+        self.local = (
+            merge_triagens([self.sentences[s] for s in sentences])
+            if sentences
+            else TriagemModel()
+        )
+        DICTATION_EXTRACTIONS.inc(source='rules')
+        return self.local
+
+    def needs_llm(self) -> bool:
+        if self._llm_task is not None or is_vitals_only(self.text):
+            return False
+        terms = free_text_terms(self.text)
+        changed = terms ^ self.llm_terms
+        return len(changed) >= max(
+            self.min_change, self.min_change_ratio * len(terms)
+        )
+
+    def current(self) -> TriagemModel:
+        if self.llm_output is None:
+            return self.local
+        return self.llm_output.model_copy(
+            update={
+                'sinais_vitais': self.local.sinais_vitais,
+                'inicio_sintoma': self.llm_output.inicio_sintoma
+                or self.local.inicio_sintoma,
+            }
+        )
+
+    async def send(self, websocket: WebSocket, message: dict):
+        async with self._send_lock:
+            await websocket.send_json(message)
+
+    async def send_fields(self, websocket: WebSocket, source: str):
+        triagem = self.current()
+        if triagem == self.sent:
+            return
+
+        self.sent = triagem
+        await self.send(
+            websocket,
+            {
+                'tipo': 'campos',
+                'fonte': source,
+                'triagem': triagem.model_dump(),
+                'news2': news2(triagem.sinais_vitais).model_dump(),
+            },
+        )
+
+    async def refresh(self, websocket: WebSocket):
+        self.extract_local()
+        await self.send_fields(websocket, 'regras')
+
+        if self.needs_llm():
+            self._llm_task = asyncio.create_task(self._extract_llm(websocket))
+
+    async def _extract_llm(self, websocket: WebSocket):
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.sleep(
+                self._llm_started + self.llm_interval - loop.time()
+            )
+            text = self.text
+            self._llm_started = loop.time()
+            self.llm_output = await self.pipeline.ainvoke(
+                text, mode=ExtractionMode.HYBRID, store=False
+            )
+            self.llm_terms = free_text_terms(text)
+            DICTATION_EXTRACTIONS.inc(source='llm')
+            await self.send_fields(websocket, 'llm')
+        except Exception as exc:
+            await self.send(
+                websocket,
+                {'tipo': 'erro', 'detalhe': str(exc) or type(exc).__name__},
+            )
+            return
+        finally:
+            self._llm_task = None
+
+        # o texto pode ter mudado durante a chamada
+        if self.needs_llm():
+            self._llm_task = asyncio.create_task(self._extract_llm(websocket))
+
+    async def run(self, websocket: WebSocket):
+        changed = asyncio.Event()
+
+        async def receive():
+            while True:
+                try:
+                    message = await websocket.receive_json()
+                    self.apply(DitadoDelta.model_validate(message))
+                except (ValidationError, ValueError) as exc:
+                    await self.send(
+                        websocket, {'tipo': 'erro', 'detalhe': str(exc)}
+                    )
+                    continue
+                changed.set()
+
+        async def process():
+            while True:
+                await changed.wait()
+                # debounce: espera um intervalo sem novos deltas
+                while True:
+                    changed.clear()
+                    try:
+                        await asyncio.wait_for(changed.wait(), self.debounce)
+                    except TimeoutError:
+                        break
+                await self.refresh(websocket)
+
+        tasks = [
+            asyncio.create_task(receive()),
+            asyncio.create_task(process()),
+        ]
+        try:
+            done, _ = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                task.result()
+        finally:
+            for task in [*tasks, self._llm_task]:
+                if task is not None:
+                    task.cancel()
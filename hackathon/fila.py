@@ -0,0 +1,117 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime
+
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from hackathon.models import TriagemOrm
+from hackathon.schemas import FilaItem
+
+SEM_URGENCIA = -1
+
+
+class FilaPrioridade:
+    """
+    Fila de pacientes aguardando atendimento, ordenada pela urgência
+    (maior primeiro) e, no empate, pela chegada. É um heap com remoção
+    preguiçosa: repriorizar marca a entrada antiga como inválida e
+    insere uma nova, mantendo todas as operações em O(log n).
+    """
+
+    def __init__(self):
+        self._heap: list[list] = []
+        self._entries: dict[int, list] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, triagem_id: int) -> bool:
+        return triagem_id in self._entries
+
+    @staticmethod
+    def _item(entry: list) -> FilaItem:
+        prioridade, chegada, _, triagem_id = entry
+        return FilaItem(
+            triagem_id=triagem_id,
+            urgencia=None if -prioridade == SEM_URGENCIA else -prioridade,
+            chegada=chegada,
+        )
+
+    def _push(self, triagem_id: int, urgencia: int | None, chegada: datetime):
+        if triagem_id in self._entries:
+            self._entries.pop(triagem_id)[-1] = None
+
+        prioridade = SEM_URGENCIA if urgencia is None else urgencia
+        entry = [-prioridade, chegada, next(self._counter), triagem_id]
+        self._entries[triagem_id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _discard_removed(self):
+        while self._heap and self._heap[0][-1] is None:
+            heapq.heappop(self._heap)
+
+    def push(
+        self,
+        triagem_id: int,
+        urgencia: int | None,
+        chegada: datetime | None = None,
+    ):
+        with self._lock:
+            self._push(triagem_id, urgencia, chegada or datetime.now())
+
+    def peek(self) -> FilaItem | None:
+        with self._lock:
+            self._discard_removed()
+            if not self._heap:
+                return None
+            return self._item(self._heap[0])
+
+    def pop(self) -> FilaItem | None:
+        with self._lock:
+            self._discard_removed()
+            if not self._heap:
+                return None
+
+            entry = heapq.heappop(self._heap)
+            del self._entries[entry[-1]]
+            return self._item(entry)
+
+    def reprioritize(self, triagem_id: int, urgencia: int) -> FilaItem | None:
+        with self._lock:
+            entry = self._entries.get(triagem_id)
+            if entry is None:
+                return None
+
+            self._push(triagem_id, urgencia, entry[1])
+            return self._item(self._entries[triagem_id])
+
+    def top(self, n: int) -> list[FilaItem]:
+        with self._lock:
+            entries = heapq.nsmallest(n, self._entries.values())
+            return [self._item(entry) for entry in entries]
+
+    def rebuild(self, session: Session):
+        query = select(
+            TriagemOrm.id, TriagemOrm.urgencia_nivel, TriagemOrm.criado_em
+        ).where(TriagemOrm.atendido_em.is_(None))
+
+        with self._lock:
+            self._heap.clear()
+            self._entries.clear()
+
+            for triagem_id, urgencia, chegada in session.execute(query):
+                prioridade = SEM_URGENCIA if urgencia is None else urgencia
+                entry = [-prioridade, chegada, next(self._counter), triagem_id]
+                self._entries[triagem_id] = entry
+                self._heap.append(entry)
+
+            heapq.heapify(self._heap)
+
+
+def get_fila(request: Request) -> FilaPrioridade:
+    return request.app.state.fila
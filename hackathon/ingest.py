@@ -0,0 +1,352 @@
+"""
+Carga em massa de notas de triagem a partir de arquivos JSONL ou CSV.
+
+    python -m hackathon.ingest notas.jsonl --saida triagens.jsonl [--banco]
+        [--sobrescrever]
+
+O arquivo é lido linha a linha, sem carregá-lo na memória, e as notas
+são extraídas em paralelo (`--concorrencia`) pelo mesmo pipeline da API.
+Os resultados saem na ordem da entrada, no JSONL de `--saida` e/ou
+gravados em lote na tabela de triagens (`--banco`), já como atendidos,
+para que o arquivo não entre na fila de atendimento.
+
+A cada `--checkpoint-cada` linhas concluídas o progresso é gravado em
+`<entrada>.checkpoint` (após gravar a saída e esvaziar a fila do banco);
+rodar de novo o mesmo comando retoma da última linha registrada, sem
+repetir chamadas ao LLM. Linhas processadas depois do último checkpoint
+podem chegar ao banco em duplicidade se o processo cair. Uma `--saida`
+que já existe só é sobrescrita com `--sobrescrever`, a menos que seja a
+saída registrada no checkpoint.
+
+Falhas passageiras do LLM (prazo esgotado, limite de chamadas, HTTP 429
+ou 5xx) são repetidas com espera crescente; se persistirem, a carga para
+com o checkpoint antes da linha que falhou, para ser retomada depois.
+Só os demais erros viram linhas com `erro` na saída.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from http import HTTPStatus
+from pathlib import Path
+from typing import IO, Iterator
+
+from hackathon.db import create_db_engine
+from hackathon.llm.cache import ExtractionCache
+from hackathon.llm.chain import (
+    LLMBusyError,
+    LLMLimiter,
+    TriagemPipeline,
+    get_router,
+)
+from hackathon.llm.rules import ExtractionMode
+from hackathon.schemas import TriagemBatchItem
+from hackathon.settings import get_settings
+from hackathon.writer import TriagemWriter
+
+WINDOW_FACTOR = 4
+RETRIES = 3
+RETRY_BACKOFF = 1.0
+RETRYABLE_STATUS = {
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+}
+
+
+class IngestInterruptedError(Exception):
+    def __init__(self, linha: int, erro: str):
+        super().__init__(f'Carga interrompida na linha {linha}: {erro}')
+        self.linha = linha
+
+
+def is_retryable(exc: Exception) -> bool:
+    # os erros de API do Cohere (e da maioria dos SDKs) têm `status_code`
+    return isinstance(exc, (TimeoutError, LLMBusyError)) or (
+        getattr(exc, 'status_code', None) in RETRYABLE_STATUS
+    )
+
+
+def describe(exc: Exception) -> str:
+    return str(exc) or type(exc).__name__
+
+
+def read_rows(path: Path, skip: int = 0) -> Iterator[dict]:
+    with path.open(encoding='utf-8', newline='') as file:
+        if path.suffix.lower() == '.csv':
+            rows = csv.DictReader(file)
+        else:
+            rows = (json.loads(line) for line in file if line.strip())
+
+        for number, row in enumerate(rows):
+            if number >= skip:
+                yield row
+
+
+class Checkpoint:
+    """Progresso da carga: linhas concluídas, saída e o seu tamanho."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.linhas = 0
+        self.saida: str | None = None
+        self.saida_bytes = 0
+        if path.exists():
+            state = json.loads(path.read_text(encoding='utf-8'))
+            self.linhas = state['linhas']
+            self.saida = state.get('saida')
+            self.saida_bytes = state['saida_bytes']
+
+    def save(self, linhas: int, saida_bytes: int):
+        self.linhas = linhas
+        self.saida_bytes = saida_bytes
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(
+            json.dumps({
+                'linhas': linhas,
+                'saida': self.saida,
+                'saida_bytes': saida_bytes,
+            }),
+            encoding='utf-8',
+        )
+        os.replace(tmp, self.path)
+
+
+def open_output(
+    path: Path, checkpoint: Checkpoint, overwrite: bool = False
+) -> IO[str]:
+    """
+    Abre a saída da carga. Se for a saída do checkpoint, descarta o que
+    foi escrito depois dele; senão, só esvazia um arquivo que já tenha
+    conteúdo com `overwrite`, e levanta `FileExistsError` sem ele.
+    """
+    saida = str(path.resolve())
+    size = 0
+    if checkpoint.saida == saida:
+        size = checkpoint.saida_bytes
+    elif path.exists() and path.stat().st_size and not overwrite:
+        raise FileExistsError(
+            f'{path} já existe e não é a saída do checkpoint; '
+            'use --sobrescrever para substituí-lo'
+        )
+
+    output = path.open('a+', encoding='utf-8')
+    output.truncate(size)
+    output.seek(size)
+    checkpoint.saida = saida
+    return output
+
+
+class Ingestor:
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        pipeline: TriagemPipeline,
+        output: IO[str] | None,
+        writer: TriagemWriter | None,
+        checkpoint: Checkpoint,
+        retries: int = RETRIES,
+        retry_backoff: float = RETRY_BACKOFF,
+    ):
+        self.pipeline = pipeline
+        self.output = output
+        self.writer = writer
+        self.checkpoint = checkpoint
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.done = checkpoint.linhas
+        self.errors = 0
+
+    async def extract(
+        self,
+        text: str,
+        mode: ExtractionMode,
+        semaphore: asyncio.Semaphore,
+    ) -> TriagemBatchItem:
+        # falhas passageiras que persistem são levantadas, para a carga
+        # parar antes desta linha; as demais viram `erro` na saída
+        async with semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    triagem = await self.pipeline.ainvoke(text, mode=mode)
+                    break
+                except Exception as exc:
+                    if not is_retryable(exc):
+                        return TriagemBatchItem(erro=describe(exc))
+                    if attempt == self.retries:
+                        raise
+                    await asyncio.sleep(self.retry_backoff * 2**attempt)
+        return TriagemBatchItem(triagem=triagem)
+
+    def emit(self, row: dict, item: TriagemBatchItem):
+        if item.triagem is not None and self.writer is not None:
+            self.writer.submit(item.triagem)
+        if item.erro is not None:
+            self.errors += 1
+
+        if self.output is not None:
+            record = {'linha': self.done, 'origem': row} | item.model_dump()
+            self.output.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.done += 1
+
+    def save_checkpoint(self):
+        size = 0
+        if self.output is not None:
+            self.output.flush()
+            os.fsync(self.output.fileno())
+            size = self.output.tell()
+
+        if self.writer is not None:
+            failed = self.writer.failed
+            self.writer.drain()
+            if self.writer.failed > failed:
+                raise RuntimeError('Falha ao gravar triagens no banco')
+
+        self.checkpoint.save(self.done, size)
+
+    async def run(  # noqa: PLR0913, PLR0917
+        self,
+        rows: Iterator[dict],
+        field: str,
+        mode: ExtractionMode,
+        concurrency: int,
+        every: int,
+    ):
+        semaphore = asyncio.Semaphore(concurrency)
+        window: deque[tuple[dict, asyncio.Task]] = deque()
+        start = time.monotonic()
+        started_at = self.done
+
+        async def commit_head():
+            row, task = window.popleft()
+            try:
+                item = await task
+            except Exception as exc:
+                raise IngestInterruptedError(self.done, describe(exc)) from exc
+            self.emit(row, item)
+
+            if self.done % every == 0:
+                await asyncio.to_thread(self.save_checkpoint)
+                rate = (self.done - started_at) / (time.monotonic() - start)
+                print(
+                    f'{self.done} linhas ({self.errors} erros, {rate:.1f}/s)',
+                    file=sys.stderr,
+                )
+
+        try:
+            for row in rows:
+                task = asyncio.create_task(
+                    self.extract(str(row.get(field) or ''), mode, semaphore)
+                )
+                window.append((row, task))
+                # janela limitada: memória constante e saída na ordem da
+                # entrada
+                if len(window) >= concurrency * WINDOW_FACTOR:
+                    await commit_head()
+
+            while window:
+                await commit_head()
+        except IngestInterruptedError:
+            for _, task in window:
+                task.cancel()
+            await asyncio.gather(
+                *(task for _, task in window), return_exceptions=True
+            )
+            # o checkpoint fica antes da linha que falhou
+            await asyncio.to_thread(self.save_checkpoint)
+            raise
+
+        await asyncio.to_thread(self.save_checkpoint)
+
+
+def main(argv: list[str] | None = None):
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('entrada', type=Path, help='arquivo .jsonl ou .csv')
+    parser.add_argument('--saida', type=Path, help='JSONL com os resultados')
+    parser.add_argument(
+        '--banco', action='store_true', help='grava as triagens no banco'
+    )
+    parser.add_argument(
+        '--campo', default='triagem_text', help='coluna com o texto da nota'
+    )
+    parser.add_argument(
+        '--concorrencia', type=int, default=settings.LLM_BATCH_CONCURRENCY
+    )
+    parser.add_argument(
+        '--modo',
+        type=ExtractionMode,
+        default=ExtractionMode(settings.EXTRACTION_MODE),
+        choices=list(ExtractionMode),
+    )
+    parser.add_argument('--checkpoint-cada', type=int, default=100)
+    parser.add_argument(
+        '--sobrescrever',
+        action='store_true',
+        help='substitui uma --saida que não é a do checkpoint',
+    )
+    args = parser.parse_args(argv)
+
+    if args.saida is None and not args.banco:
+        parser.error('informe --saida e/ou --banco')
+
+    checkpoint = Checkpoint(
+        args.entrada.with_name(args.entrada.name + '.checkpoint')
+    )
+    if checkpoint.linhas:
+        print(f'Retomando da linha {checkpoint.linhas}', file=sys.stderr)
+
+    output = None
+    if args.saida is not None:
+        try:
+            output = open_output(args.saida, checkpoint, args.sobrescrever)
+        except FileExistsError as exc:
+            parser.error(str(exc))
+
+    writer = None
+    if args.banco:
+        # notas antigas: gravadas como atendidas, fora da fila
+        writer = TriagemWriter(
+            create_db_engine(settings.DATABASE_URL), atendidas=True
+        )
+        writer.start()
+
+    pipeline = TriagemPipeline(
+        get_router(),
+        limiter=LLMLimiter(max_concurrency=args.concorrencia),
+        cache=ExtractionCache(settings.CACHE_MAXSIZE, settings.CACHE_TTL),
+    )
+    ingestor = Ingestor(pipeline, output, writer, checkpoint)
+
+    try:
+        asyncio.run(
+            ingestor.run(
+                read_rows(args.entrada, skip=checkpoint.linhas),
+                args.campo,
+                args.modo,
+                args.concorrencia,
+                args.checkpoint_cada,
+            )
+        )
+    except IngestInterruptedError as exc:
+        parser.exit(1, f'{exc}; rode de novo para retomar\n')
+    finally:
+        if writer is not None:
+            writer.stop()
+        if output is not None:
+            output.close()
+
+    print(
+        f'{ingestor.done} linhas concluídas, {ingestor.errors} erros',
+        file=sys.stderr,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+import asyncio
+import math
+import time
+import uuid
+from collections import OrderedDict
+from enum import StrEnum
+
+from fastapi import Request
+
+from hackathon.llm.chain import LLMBusyError, TriagemPipeline
+from hackathon.llm.rules import ExtractionMode, extract_sinais_vitais
+from hackathon.news2 import news2
+from hackathon.schemas import JobModel, TriagemModel
+from hackathon.settings import get_settings
+from hackathon.writer import TriagemWriter
+
+EWMA_WEIGHT = 0.2
+
+
+class JobStatus(StrEnum):
+    PENDENTE = 'pendente'
+    PROCESSANDO = 'processando'
+    CONCLUIDO = 'concluido'
+    ERRO = 'erro'
+
+
+class JobQueueFullError(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__('Fila de extrações cheia')
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, text: str, mode: ExtractionMode):
+        self.id = uuid.uuid4().hex
+        self.text = text
+        self.mode = mode
+        self.news2 = news2(extract_sinais_vitais(text))
+        self.status = JobStatus.PENDENTE
+        self.triagem: TriagemModel | None = None
+        self.erro: str | None = None
+        self.finished_at: float | None = None
+        self.done = asyncio.Event()
+
+    def to_model(self) -> JobModel:
+        return JobModel(
+            id=self.id,
+            status=self.status,
+            news2=self.news2,
+            triagem=self.triagem,
+            erro=self.erro,
+        )
+
+
+class JobQueue:
+    """
+    Extrações em segundo plano: `submit` enfileira a nota e retorna o
+    job na hora, e `workers` tarefas processam a fila com o pipeline,
+    gravando cada triagem pelo `writer`. Sem vaga no limiter do LLM, o
+    worker espera por uma em vez de encerrar o job com erro. A fila é
+    limitada a `maxsize` jobs; cheia, `submit` levanta
+    `JobQueueFullError` com uma estimativa de espera. Jobs concluídos
+    ficam disponíveis por `ttl` segundos.
+    """
+
+    def __init__(
+        self,
+        pipeline: TriagemPipeline,
+        writer: TriagemWriter,
+        workers: int | None = None,
+        maxsize: int | None = None,
+        ttl: float | None = None,
+    ):
+        settings = get_settings()
+        self.pipeline = pipeline
+        self.writer = writer
+        self.workers = workers or settings.JOB_WORKERS
+        self.ttl = settings.JOB_TTL if ttl is None else ttl
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self.avg_duration = 1.0
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(
+            maxsize or settings.JOB_QUEUE_SIZE
+        )
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def retry_after(self) -> int:
+        return max(
+            1,
+            math.ceil(self._queue.qsize() * self.avg_duration / self.workers),
+        )
+
+    def _prune(self):
+        # os jobs estão em ordem de envio: para no primeiro ainda válido
+        now = time.monotonic()
+        while self.jobs:
+            job = next(iter(self.jobs.values()))
+            if job.finished_at is None or now - job.finished_at <= self.ttl:
+                break
+            self.jobs.popitem(last=False)
+
+    def submit(self, text: str, mode: ExtractionMode) -> Job:
+        self._prune()
+
+        job = Job(text, mode)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError(self.retry_after())
+
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float):
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout)
+        except TimeoutError:
+            pass
+
+    async def _extract(self, job: Job) -> TriagemModel:
+        # o job já esperou na fila: com o limiter cheio, aguarda uma vaga
+        # e tenta de novo em vez de falhar como uma requisição síncrona
+        while True:
+            try:
+                return await self.pipeline.ainvoke(job.text, mode=job.mode)
+            except LLMBusyError:
+                await self.pipeline.limiter.wait_available()
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            job.status = JobStatus.PROCESSANDO
+            start = time.monotonic()
+
+            try:
+                job.triagem = await self._extract(job)
+                self.writer.submit(job.triagem)
+                job.status = JobStatus.CONCLUIDO
+            except Exception as exc:
+                job.erro = str(exc) or type(exc).__name__
+                job.status = JobStatus.ERRO
+            finally:
+                job.finished_at = time.monotonic()
+                self.avg_duration += EWMA_WEIGHT * (
+                    job.finished_at - start - self.avg_duration
+                )
+                job.done.set()
+                self._queue.task_done()
+
+
+def get_jobs(request: Request) -> JobQueue:
+    return request.app.state.jobs
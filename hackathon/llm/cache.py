@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import Engine, delete
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from hackathon.metrics import CACHE_LOOKUPS
+from hackathon.models import ExtracaoCacheOrm
+from hackathon.schemas import TriagemModel
+
+logger = logging.getLogger(__name__)
+
+# bancos com `INSERT ... ON CONFLICT DO UPDATE`; nos demais, `merge`
+UPSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+PURGE_INTERVAL = 300.0
+
+
+def normalize_text(text: str) -> str:
+    return ' '.join(text.split())
+
+
+def make_key(text: str, version: str) -> str:
+    payload = f'{version}\0{normalize_text(text)}'
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Cache das extrações endereçado pelo conteúdo da nota. A chave é o
+    hash do texto normalizado junto da versão do pipeline (prompt,
+    exemplos e modelo), então qualquer mudança nesses itens invalida
+    as entradas antigas.
+
+    A camada em memória é um LRU limitado a `maxsize` entradas com
+    validade de `ttl` segundos. Se `engine` for informado, as entradas
+    também são gravadas na tabela `extracao_cache`, compartilhada entre
+    os workers e preservada entre reinícios. Um erro do banco nessa
+    camada é registrado no log e tratado como falta no cache, sem
+    derrubar a extração; as entradas vencidas são apagadas a cada
+    `PURGE_INTERVAL` segundos, na gravação.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        engine: Engine | None = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.engine = engine
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, TriagemModel]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def _get_memory(self, key: str) -> TriagemModel | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value.model_copy(deep=True)
+
+    def _set_memory(self, key: str, value: TriagemModel):
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + self.ttl,
+                value.model_copy(deep=True),
+            )
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _get_persistent(self, key: str) -> TriagemModel | None:
+        try:
+            with Session(self.engine) as session:
+                entry = session.get(ExtracaoCacheOrm, key)
+        except SQLAlchemyError:
+            logger.warning('Falha ao ler o cache persistente', exc_info=True)
+            return None
+
+        if entry is None:
+            return None
+
+        if entry.criado_em + timedelta(seconds=self.ttl) < datetime.now():
+            return None
+
+        return TriagemModel.model_validate_json(entry.resultado)
+
+    def _set_persistent(self, key: str, value: TriagemModel):
+        values = {
+            'chave': key,
+            'resultado': value.model_dump_json(),
+            'criado_em': datetime.now(),
+        }
+        insert = UPSERTS.get(self.engine.dialect.name)  # type: ignore
+
+        try:
+            with Session(self.engine) as session:
+                self._purge(session, values['criado_em'])
+                if insert is None:
+                    session.merge(ExtracaoCacheOrm(**values))
+                else:
+                    # a mesma nota gravada ao mesmo tempo por dois workers
+                    statement = insert(ExtracaoCacheOrm).values(**values)
+                    session.execute(
+                        statement.on_conflict_do_update(
+                            index_elements=[ExtracaoCacheOrm.chave],
+                            set_={
+                                'resultado': statement.excluded.resultado,
+                                'criado_em': statement.excluded.criado_em,
+                            },
+                        )
+                    )
+                session.commit()
+        except SQLAlchemyError:
+            logger.warning(
+                'Falha ao gravar o cache persistente', exc_info=True
+            )
+
+    def _purge(self, session: Session, now: datetime):
+        with self._lock:
+            if time.monotonic() < self._next_purge:
+                return
+            self._next_purge = time.monotonic() + PURGE_INTERVAL
+
+        session.execute(
+            delete(ExtracaoCacheOrm).where(
+                ExtracaoCacheOrm.criado_em < now - timedelta(seconds=self.ttl)
+            )
+        )
+
+    def _count(self, value: TriagemModel | None):
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        CACHE_LOOKUPS.inc(result='miss' if value is None else 'hit')
+
+    def get(self, key: str) -> TriagemModel | None:
+        value = self._get_memory(key)
+
+        if value is None and self.engine is not None:
+            value = self._get_persistent(key)
+            if value is not None:
+                self._set_memory(key, value)
+
+        self._count(value)
+        return value
+
+    def set(self, key: str, value: TriagemModel):
+        self._set_memory(key, value)
+
+        if self.engine is not None:
+            self._set_persistent(key, value)
+
+    async def aget(self, key: str) -> TriagemModel | None:
+        if self.engine is None:
+            return self.get(key)
+
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: TriagemModel):
+        if self.engine is None:
+            self.set(key, value)
+        else:
+            await asyncio.to_thread(self.set, key, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'tamanho': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'persistente': self.engine is not None,
+            }
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import threading
+from enum import StrEnum
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    message_chunk_to_message,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+)
+
+
+class CassetteMode(StrEnum):
+    RECORD = 'record'
+    REPLAY = 'replay'
+    PASSTHROUGH = 'passthrough'
+
+
+class CassetteMissError(Exception):
+    def __init__(self, key: str):
+        super().__init__(f'Resposta do LLM não gravada (chave {key[:12]})')
+        self.key = key
+
+
+class Cassette:
+    """Respostas gravadas do LLM, em JSONL, indexadas pela chave."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.records: dict[str, AIMessage] = {}
+        self._lock = threading.Lock()
+        if path.exists():
+            with path.open(encoding='utf-8') as file:
+                for line in file:
+                    record = json.loads(line)
+                    [message] = messages_from_dict([record['mensagem']])
+                    self.records[record['chave']] = message  # type: ignore
+
+    def get(self, key: str) -> AIMessage | None:
+        return self.records.get(key)
+
+    def add(self, key: str, message: AIMessage):
+        record = {'chave': key, 'mensagem': message_to_dict(message)}
+        with self._lock:
+            self.records[key] = message
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('a', encoding='utf-8') as file:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+@lru_cache
+def get_cassette(path: str) -> Cassette:
+    # um arquivo compartilhado por todos os modelos (as chaves incluem
+    # o nome do modelo)
+    return Cassette(Path(path))
+
+
+def render_message(message: BaseMessage) -> dict:
+    # sem ids: os exemplos few-shot ganham ids novos a cada processo
+    rendered = {'type': message.type, 'content': message.content}
+    if tool_calls := getattr(message, 'tool_calls', None):
+        rendered['tool_calls'] = [
+            {'name': tool_call['name'], 'args': tool_call['args']}
+            for tool_call in tool_calls
+        ]
+    return rendered
+
+
+def cassette_key(
+    model: str, messages: list[BaseMessage], params: dict[str, Any]
+) -> str:
+    payload = {
+        'model': model,
+        'messages': [render_message(message) for message in messages],
+        'params': params,
+    }
+    return hashlib.sha256(
+        json.dumps(
+            payload, sort_keys=True, ensure_ascii=False, default=str
+        ).encode()
+    ).hexdigest()
+
+
+class CassetteChatModel(BaseChatModel):
+    """
+    Envolve o modelo de chat para gravar e reproduzir suas respostas.
+    A chave de cada chamada é o hash do modelo, das mensagens já
+    renderizadas e dos parâmetros enviados ao provedor (ferramentas no
+    formato do próprio provedor, `stop` etc.).
+
+    Em `record`, respostas gravadas são reproduzidas e as demais vão ao
+    modelo e são gravadas; em `replay`, uma chamada não gravada levanta
+    `CassetteMissError`, sem acessar a rede; em `passthrough`, tudo vai
+    direto ao modelo.
+    """
+
+    llm: BaseChatModel
+    cassette: Cassette
+    mode: CassetteMode = CassetteMode.RECORD
+
+    @property
+    def _llm_type(self) -> str:
+        return 'cassette'
+
+    @property
+    def model(self) -> str:
+        return getattr(self.llm, 'model', type(self.llm).__name__)
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        # o modelo envolvido converte as ferramentas para o seu formato
+        return self.bind(**self.llm.bind_tools(tools, **kwargs).kwargs)  # type: ignore
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        # mesma montagem do modelo envolvido, com as chamadas passando
+        # pelo `bind_tools` acima
+        return type(self.llm).with_structured_output(self, schema, **kwargs)
+
+    def _lookup(
+        self, messages: list[BaseMessage], params: dict[str, Any]
+    ) -> tuple[str, AIMessage | None]:
+        key = cassette_key(self.model, messages, params)
+        message = self.cassette.get(key)
+        if message is None and self.mode == CassetteMode.REPLAY:
+            raise CassetteMissError(key)
+        return key, message
+
+    @staticmethod
+    def _result(message: AIMessage) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.mode == CassetteMode.PASSTHROUGH:
+            return self.llm._generate(messages, stop=stop, **kwargs)
+
+        key, message = self._lookup(messages, kwargs | {'stop': stop})
+        if message is not None:
+            return self._result(message)
+
+        result = self.llm._generate(messages, stop=stop, **kwargs)
+        self.cassette.add(key, result.generations[0].message)  # type: ignore
+        return result
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.mode == CassetteMode.PASSTHROUGH:
+            return await self.llm._agenerate(messages, stop=stop, **kwargs)
+
+        key, message = self._lookup(messages, kwargs | {'stop': stop})
+        if message is not None:
+            return self._result(message)
+
+        result = await self.llm._agenerate(messages, stop=stop, **kwargs)
+        self.cassette.add(key, result.generations[0].message)  # type: ignore
+        return result
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        if self.mode == CassetteMode.PASSTHROUGH:
+            yield from self.llm._stream(messages, stop=stop, **kwargs)
+            return
+
+        key, message = self._lookup(messages, kwargs | {'stop': stop})
+        if message is not None:
+            # a resposta gravada chega inteira, em um único pedaço
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=message.content,
+                    tool_call_chunks=[
+                        {
+                            'name': tool_call['name'],
+                            'args': json.dumps(
+                                tool_call['args'], ensure_ascii=False
+                            ),
+                            'id': tool_call['id'],
+                            'index': index,
+                        }
+                        for index, tool_call in enumerate(message.tool_calls)
+                    ],
+                    usage_metadata=message.usage_metadata,
+                )
+            )
+            return
+
+        final = None
+        for chunk in self.llm._stream(messages, stop=stop, **kwargs):
+            final = chunk if final is None else final + chunk
+            yield chunk
+        if final is not None:
+            self.cassette.add(key, message_chunk_to_message(final.message))  # type: ignore
@@ -1,13 +1,1007 @@
-from langchain_cohere import ChatCohere
+import asyncio
+import functools
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from contextlib import asynccontextmanager
+from contextvars import copy_context
+from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable, Iterator, TypeVar
 
+from fastapi.requests import HTTPConnection
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.output_parsers.openai_tools import (
+    JsonOutputKeyToolsParser,
+)
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import (
+    Runnable,
+    RunnableConfig,
+    RunnableLambda,
+    RunnablePassthrough,
+)
+from pydantic import BaseModel, ValidationError
+
+from hackathon.llm.cache import ExtractionCache, make_key
+from hackathon.llm.cassette import (
+    CassetteChatModel,
+    CassetteMode,
+    get_cassette,
+)
+from hackathon.llm.examples import ExampleIndex
+from hackathon.llm.fake import FakeTriagemChatModel
+from hackathon.llm.profiles import (
+    COMPACT_SYSTEM_PROMPT,
+    PromptProfile,
+    compact_text,
+    tool_schema,
+)
+from hackathon.llm.refine import (
+    tool_example_to_messages,
+    triagem_examples,
+)
+from hackathon.llm.repair import (
+    REPAIR_PROMPT,
+    apply_repair,
+    estimate_tokens,
+    fill_from_rules,
+    invalid_fields,
+    record_repair,
+    repair_inputs,
+    repair_model,
+)
+from hackathon.llm.rules import (
+    ExtractionMode,
+    extract_inicio_sintoma,
+    extract_rules,
+    extract_sinais_vitais,
+    free_text_words,
+    is_vitals_only,
+)
+from hackathon.llm.segments import merge_triagens, split_segments
+from hackathon.llm.singleflight import SingleFlight
+from hackathon.metrics import (
+    HEDGED_REQUESTS,
+    ROUTED_REQUESTS,
+    StageTimer,
+    span,
+)
+from hackathon.schemas import (
+    SinaisVitaisModel,
+    TriagemModel,
+    TriagemTextoModel,
+)
 from hackathon.settings import get_settings
 
-settings = get_settings()
+T = TypeVar('T')
 
+STAGE_TIMER = StageTimer({
+    'examples': 'examples',
+    'ChatPromptTemplate': 'prompt',
+    'JsonOutputKeyToolsParser': 'parse',
+    'PydanticToolsParser': 'validate',
+    'validate': 'validate',
+    'repair': 'repair',
+})
 
-def get_llm():
-    llm = ChatCohere(
-        model='command-r-plus', cohere_api_key=settings.COHERE_API_KEY
-    )
+SYSTEM_PROMPT = (
+    'Você é um especialista médico responsável por '
+    'extrair dados. O texto será escrito pelos '
+    'profissionais de enfermagem. Sua tarefa é '
+    'identificar e extrair as informações relevantes. '
+    'Os sinais vitais do paciente devem ser identificados e '
+    'extrair os dados conforme descrito. A pressão '
+    'arterial deve ser extraída em mmHg. Exemplo: '
+    '120/80. A frequência cardíaca deve ser extraída '
+    'em bpm. Exemplo: 75 bpm. A temperatura corporal '
+    'deve ser extraída em graus Celsius. Exemplo: '
+    '37.5°C. A saturação de oxigênio deve ser extraída '
+    'em porcentagem. Exemplo: 98%. A frequência '
+    'respiratória deve ser extraída em rpm. Exemplo: '
+    '16 rpm. Caso não seja mencionado, o valor será '
+    'None. O histórico individual do paciente deve '
+    'ser extraído. Inclua informações sobre doenças '
+    'pré-existentes. Exemplos de doenças: diabetes, '
+    'hipertensão, asma. Se não estiver presente, o '
+    'valor será None. O histórico familiar deve ser '
+    'extraído. Inclua doenças que afetam familiares '
+    'próximos. Exemplo: câncer, mãe; hipertensão, pai. '
+    'Caso não mencione histórico familiar, o valor '
+    'será None. O motivo da consulta deve ser '
+    'descrito. Identifique o início dos sintomas, '
+    'data no formato AAAA-MM-DD. Exemplo: '
+    '2024-11-10. A localização do sintoma principal '
+    'deve ser extraída. Sintomas principais: dor, '
+    'falta de ar, tontura, etc. Sintomas associados '
+    'devem ser identificados, como febre, etc. Se essas '
+    'informações não estiverem no texto, será None. Se '
+    'a intensidade da dor for mencionada, extraia a '
+    'escala. Exemplo: 5. Caso não mencione a escala de '
+    'dor, o valor será None. A urgência do atendimento '
+    'deve ser extraída. A urgência pode ser uma '
+    'classificação de prioridade. Exemplo: 8. Caso a '
+    'urgência não seja mencionada, o valor será None. '
+    'Forneça uma extração precisa e clara das informações. '
+    'Quando algum dado não for encontrado, retorne None.'
+)
+
+
+def get_llm(model: str | None = None) -> BaseChatModel:
+    return _build_llm(model or get_settings().LLM_MODEL)
+
+
+@lru_cache
+def _build_llm(model: str) -> BaseChatModel:
+    settings = get_settings()
+    llm: BaseChatModel
+    if settings.LLM_PROVIDER == 'fake':
+        llm = FakeTriagemChatModel(
+            model=model,
+            latency=settings.FAKE_LLM_LATENCY,
+            jitter=settings.FAKE_LLM_JITTER,
+        )
+    else:
+        # importado aqui: o pacote do Cohere é o import mais lento do app
+        from langchain_cohere import ChatCohere  # noqa: PLC0415
+
+        llm = ChatCohere(model=model, cohere_api_key=settings.COHERE_API_KEY)
+
+    if settings.LLM_CASSETTE:
+        llm = CassetteChatModel(
+            llm=llm,
+            cassette=get_cassette(settings.LLM_CASSETTE),
+            mode=CassetteMode(settings.LLM_CASSETTE_MODE),
+        )
 
     return llm
+
+
+def model_name(llm: BaseChatModel) -> str:
+    return getattr(llm, 'model', type(llm).__name__)
+
+
+class ModelRouter:
+    """
+    Escolhe o modelo de cada nota pela quantidade de texto livre (as
+    palavras que não são sinais vitais). `tiers` associa modelos mais
+    rápidos a um limite de palavras; a nota vai para o primeiro modelo
+    cujo limite a comporte e, acima de todos, para `default`.
+
+    Com `hedge_delay` maior que zero, se o modelo escolhido não
+    responder nesse tempo (ou falhar antes), a mesma extração é
+    disparada no próximo modelo da lista (ou de novo no mesmo, se não
+    houver outro) e vale a resposta que chegar primeiro. O hedge só é
+    disparado se houver uma vaga livre na hora (no `limiter` passado a
+    `build` e, nas chamadas síncronas, no pool de threads); sem vaga,
+    espera-se só pelo modelo escolhido. Se o modelo escolhido falhar, o
+    próximo roda na vaga que ele ocupava.
+    """
+
+    def __init__(
+        self,
+        default: BaseChatModel,
+        tiers: list[tuple[int, BaseChatModel]] | None = None,
+        hedge_delay: float = 0.0,
+    ):
+        self.default = default
+        self.tiers = sorted(tiers or [], key=lambda tier: tier[0])
+        self.hedge_delay = hedge_delay
+        self.models = [llm for _, llm in self.tiers] + [default]
+        self._executor: ThreadPoolExecutor | None = None
+        self._threads: threading.Semaphore | None = None
+
+    def route(self, text: str) -> tuple[BaseChatModel, BaseChatModel]:
+        words = free_text_words(text)
+        candidates = [llm for limit, llm in self.tiers if words <= limit]
+        candidates.append(self.default)
+        return candidates[0], candidates[min(1, len(candidates) - 1)]
+
+    def build(
+        self,
+        factory: Callable[[BaseChatModel], Runnable],
+        limiter: 'LLMLimiter | None' = None,
+    ) -> Runnable:
+        """
+        Monta, com `factory`, um runnable por modelo e devolve um
+        runnable que roteia cada entrada (`{'text': ...}`). Sem camadas
+        nem hedge, devolve diretamente o runnable do modelo padrão.
+        O hedge assíncrono ocupa uma vaga extra de `limiter`.
+        """
+        runnables = {id(llm): factory(llm) for llm in self.models}
+        if len(self.models) == 1 and self.hedge_delay <= 0:
+            return runnables[id(self.default)]
+
+        def plan(inputs: dict) -> list[Runnable]:
+            primary, secondary = self.route(inputs['text'])
+            ROUTED_REQUESTS.inc(model=model_name(primary))
+            return [runnables[id(primary)], runnables[id(secondary)]]
+
+        def invoke(inputs: dict, config: RunnableConfig):
+            primary, secondary = plan(inputs)
+            if self.hedge_delay <= 0:
+                return primary.invoke(inputs, config)
+            return self._hedge([
+                functools.partial(runnable.invoke, inputs, config)
+                for runnable in (primary, secondary)
+            ])
+
+        async def ainvoke(inputs: dict, config: RunnableConfig):
+            primary, secondary = plan(inputs)
+            if self.hedge_delay <= 0:
+                return await primary.ainvoke(inputs, config)
+            return await self._ahedge(
+                [
+                    functools.partial(runnable.ainvoke, inputs, config)
+                    for runnable in (primary, secondary)
+                ],
+                limiter,
+            )
+
+        return RunnableLambda(invoke, afunc=ainvoke, name='router')
+
+    def _submit(
+        self, call: Callable[[], T], block: bool = True
+    ) -> Future | None:
+        # sem `block`, só submete se houver uma thread livre agora
+        if self._executor is None:
+            max_workers = get_settings().LLM_MAX_CONCURRENCY
+            self._threads = threading.Semaphore(max_workers)
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix='llm-hedge'
+            )
+        if not self._threads.acquire(blocking=block):  # type: ignore
+            return None
+
+        future = self._executor.submit(copy_context().run, call)
+        future.add_done_callback(lambda _: self._threads.release())  # type: ignore
+        return future
+
+    def _hedge(self, calls: list[Callable[[], T]]) -> T:
+        primary = self._submit(calls[0])
+        futures: list[Future] = [primary]  # type: ignore
+        done, _ = wait(futures, timeout=self.hedge_delay)
+        hedge = None
+        if done and primary.exception() is not None:  # type: ignore
+            # o primário falhou: o secundário roda na thread que ele liberou
+            hedge = self._submit(calls[1])
+        elif not done:
+            hedge = self._submit(calls[1], block=False)
+        if hedge is not None:
+            HEDGED_REQUESTS.inc()
+            futures.append(hedge)
+
+        for future in as_completed(futures):
+            if future.exception() is None:
+                return future.result()
+        return futures[-1].result()
+
+    async def _ahedge(
+        self,
+        calls: list[Callable[[], Awaitable[T]]],
+        limiter: 'LLMLimiter | None' = None,
+    ) -> T:
+        tasks = [asyncio.ensure_future(calls[0]())]
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+        if done and tasks[0].exception() is not None:
+            # o primário falhou: o secundário roda na vaga que ele ocupava
+            HEDGED_REQUESTS.inc()
+            tasks.append(asyncio.ensure_future(calls[1]()))
+        elif not done and (limiter is None or await limiter.try_acquire()):
+            HEDGED_REQUESTS.inc()
+            tasks.append(asyncio.ensure_future(calls[1]()))
+            if limiter is not None:
+                # libera a vaga extra mesmo se a tarefa for cancelada
+                # antes de começar
+                tasks[-1].add_done_callback(
+                    lambda _: limiter.semaphore.release()
+                )
+
+        try:
+            error: BaseException | None = None
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    return await next_done
+                except Exception as exc:
+                    error = exc
+            raise error  # type: ignore
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def get_router() -> ModelRouter:
+    settings = get_settings()
+    return ModelRouter(
+        get_llm(),
+        [
+            (limit, get_llm(model))
+            for model, limit in settings.LLM_TIERS.items()
+        ],
+        settings.LLM_HEDGE_DELAY,
+    )
+
+
+class LLMBusyError(Exception):
+    pass
+
+
+class LLMLimiter:
+    """
+    Limita as chamadas assíncronas simultâneas ao LLM. Quando não há
+    vaga em `queue_timeout` segundos é levantado `LLMBusyError`, e
+    quando o LLM não responde em `timeout` segundos, `TimeoutError`.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        queue_timeout: float | None = None,
+        timeout: float | None = None,
+    ):
+        settings = get_settings()
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.queue_timeout = (
+            settings.LLM_QUEUE_TIMEOUT
+            if queue_timeout is None
+            else queue_timeout
+        )
+        self.timeout = settings.LLM_TIMEOUT if timeout is None else timeout
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        try:
+            await asyncio.wait_for(
+                self.semaphore.acquire(), self.queue_timeout
+            )
+        except TimeoutError:
+            raise LLMBusyError('Limite de chamadas simultâneas ao LLM')
+
+        try:
+            yield
+        finally:
+            self.semaphore.release()
+
+    async def try_acquire(self) -> bool:
+        """Ocupa uma vaga só se houver uma livre agora, sem esperar."""
+        if self.semaphore.locked():
+            return False
+        # sem vaga ocupada, `acquire` retorna sem suspender
+        return await self.semaphore.acquire()
+
+    async def wait_available(self):
+        """Espera, sem prazo, até haver uma vaga livre, sem ocupá-la."""
+        async with self.semaphore:
+            pass
+
+    def deadline(self, timeout: float | None = None) -> float:
+        if timeout is None or timeout > self.timeout:
+            return self.timeout
+        return timeout
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        timeout: float | None = None,
+    ) -> T:
+        async with self.slot():
+            return await asyncio.wait_for(call(), self.deadline(timeout))
+
+
+def system_prompt(profile: PromptProfile = PromptProfile.VERBOSE) -> str:
+    if profile == PromptProfile.COMPACT:
+        return COMPACT_SYSTEM_PROMPT
+    return SYSTEM_PROMPT
+
+
+def build_example_messages(
+    schema: type[BaseModel] = TriagemModel,
+    profile: PromptProfile = PromptProfile.VERBOSE,
+) -> list[list[BaseMessage]]:
+    return [
+        tool_example_to_messages({
+            'input': (
+                compact_text(text)
+                if profile == PromptProfile.COMPACT
+                else text
+            ),
+            'tool_calls': [schema.model_validate(tool_call.model_dump())],
+        })
+        for text, tool_call in triagem_examples
+    ]
+
+
+def build_prompt(
+    profile: PromptProfile = PromptProfile.VERBOSE,
+) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages([
+        ('system', system_prompt(profile)),
+        MessagesPlaceholder('examples'),
+        ('human', '{text}'),
+    ])
+
+
+def build_tool(
+    schema: type[BaseModel], profile: PromptProfile = PromptProfile.VERBOSE
+) -> type[BaseModel] | dict:
+    if profile == PromptProfile.COMPACT:
+        return tool_schema(schema)
+    return schema
+
+
+def structured_output(
+    llm: BaseChatModel,
+    schema: type[BaseModel],
+    profile: PromptProfile = PromptProfile.VERBOSE,
+) -> Runnable:
+    if profile == PromptProfile.COMPACT:
+        return llm.with_structured_output(
+            schema=tool_schema(schema)
+        ) | RunnableLambda(schema.model_validate, name='validate')
+    return llm.with_structured_output(schema=schema)
+
+
+class TriagemPipeline:
+    """
+    Cadeia de extração da triagem montada uma única vez, no início da
+    aplicação. Guarda o prompt com os exemplos few-shot já convertidos
+    em mensagens e o runnable de saída estruturada, compartilhando o
+    mesmo cliente do LLM (e seu pool de conexões) entre as requisições.
+
+    O `profile` escolhe entre o prompt original (`verbose`) e o
+    compacto, com instruções e descrições do esquema curtas e exemplos
+    sem o excesso de espaços.
+
+    Com `few_shot_k` (padrão: `FEW_SHOT_K`) maior que zero, apenas os
+    `k` exemplos mais parecidos com a nota, segundo o `ExampleIndex`,
+    vão para o prompt; o valor entra na `version`.
+
+    As chamadas assíncronas individuais passam pelo `limiter`. Com um
+    `cache`, notas já extraídas pela mesma versão do pipeline são
+    respondidas sem chamar o LLM. Requisições simultâneas da mesma nota
+    (e versão) compartilham uma única chamada em andamento (`flights`).
+
+    `llm` pode ser um `ModelRouter`, que escolhe o modelo de cada nota
+    e faz o hedge entre modelos; o streaming usa o modelo escolhido, sem
+    hedge. O resultado final do streaming passa pelo reparo e vai ao
+    cache com uma chave própria, pois não tem o hedge nem o agrupamento
+    de chamadas da extração normal.
+
+    Notas longas podem ser extraídas por trechos (`invoke_segments`):
+    cada atendimento, ou grupo de parágrafos de até `segment_max_words`
+    palavras, é extraído em paralelo e as triagens são combinadas por
+    `merge_triagens`, então a latência acompanha o maior trecho.
+
+    Com `repair`, campos com valores inválidos (ou vazios, entre os
+    `repair_required`) são corrigidos por regras quando possível e, os
+    restantes, por uma chamada ao LLM só com esses campos, em vez de
+    repetir a extração inteira.
+
+    O modo de extração (`ExtractionMode`) define o uso do LLM: `rules`
+    não o chama, `llm` extrai todos os campos com ele e `hybrid`
+    preenche os sinais vitais por regras e pede ao LLM apenas os campos
+    de texto livre, dispensando a chamada quando a nota só traz sinais
+    vitais.
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel | ModelRouter,
+        limiter: LLMLimiter | None = None,
+        cache: ExtractionCache | None = None,
+        profile: PromptProfile | None = None,
+        few_shot_k: int | None = None,
+    ):
+        settings = get_settings()
+        profile = profile or PromptProfile(settings.PROMPT_PROFILE)
+        self.router = llm if isinstance(llm, ModelRouter) else ModelRouter(llm)
+        self.llm = self.router.default
+        self.limiter = limiter or LLMLimiter()
+        self.cache = cache
+        self.flights = SingleFlight()
+        self.profile = profile
+        self.batch_concurrency = settings.LLM_BATCH_CONCURRENCY
+        self.segment_max_words = settings.LLM_SEGMENT_MAX_WORDS
+        self.repair = settings.LLM_REPAIR
+        self.repair_required = settings.LLM_REPAIR_REQUIRED
+        self._repair_runnables: dict[tuple[str, ...], Runnable] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self.few_shot_k = (
+            settings.FEW_SHOT_K if few_shot_k is None else few_shot_k
+        )
+        self.example_index = ExampleIndex([
+            text for text, _ in triagem_examples
+        ])
+        self.examples = build_example_messages(TriagemModel, profile)
+        self.text_examples = build_example_messages(TriagemTextoModel, profile)
+
+        self.prompt = self._with_examples(self.examples) | build_prompt(
+            profile
+        )
+
+        self.runnable = self.router.build(
+            lambda llm: (
+                self.prompt | structured_output(llm, TriagemModel, profile)
+            ),
+            self.limiter,
+        ).with_config(callbacks=[STAGE_TIMER])
+
+        self.text_runnable = self.router.build(
+            lambda llm: (
+                self._with_examples(self.text_examples)
+                | build_prompt(profile)
+                | structured_output(llm, TriagemTextoModel, profile)
+            ),
+            self.limiter,
+        ).with_config(callbacks=[STAGE_TIMER])
+
+        self._stream_runnables: dict[tuple[int, str], Runnable] = {}
+
+        self.version = self._build_version()
+
+    def _build_version(self) -> str:
+        payload = json.dumps(
+            {
+                'system': system_prompt(self.profile),
+                'examples': [
+                    [text, tool_call.model_dump()]
+                    for text, tool_call in triagem_examples
+                ],
+                'few_shot_k': self.few_shot_k,
+                'profile': self.profile,
+                'schema': TriagemModel.model_json_schema(),
+                'model': ','.join(map(model_name, self.router.models)),
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def select_examples(
+        self, text: str, examples: list[list[BaseMessage]]
+    ) -> list[BaseMessage]:
+        return [
+            message
+            for i in self.example_index.select(text, self.few_shot_k)
+            for message in examples[i]
+        ]
+
+    def _with_examples(self, examples: list[list[BaseMessage]]) -> Runnable:
+        return RunnablePassthrough.assign(
+            examples=lambda inputs: self.select_examples(
+                inputs['text'], examples
+            )
+        ).with_config(run_name='examples')
+
+    def _key(self, text: str, mode: ExtractionMode) -> str:
+        return make_key(text, f'{self.version}:{mode}')
+
+    def _stream_key(self, text: str, mode: ExtractionMode) -> str:
+        return make_key(text, f'{self.version}:{mode}:stream')
+
+    @staticmethod
+    def _rules_only(text: str, mode: ExtractionMode) -> TriagemModel | None:
+        if mode == ExtractionMode.RULES or (
+            mode == ExtractionMode.HYBRID and is_vitals_only(text)
+        ):
+            return extract_rules(text)
+        return None
+
+    def _plan(
+        self, text: str, mode: ExtractionMode
+    ) -> tuple[Runnable, SinaisVitaisModel | None]:
+        if mode == ExtractionMode.HYBRID:
+            if (sinais_vitais := extract_sinais_vitais(text)) is not None:
+                return self.text_runnable, sinais_vitais
+        return self.runnable, None
+
+    @staticmethod
+    def _merge(
+        text: str,
+        output: BaseModel,
+        sinais_vitais: SinaisVitaisModel | None,
+    ) -> TriagemModel:
+        if sinais_vitais is None:
+            return output  # type: ignore
+
+        triagem = TriagemModel(
+            **output.model_dump(), sinais_vitais=sinais_vitais
+        )
+        triagem.inicio_sintoma = triagem.inicio_sintoma or (
+            extract_inicio_sintoma(text)
+        )
+        return triagem
+
+    def invoke(
+        self, text: str, mode: ExtractionMode = ExtractionMode.LLM
+    ) -> TriagemModel:
+        with span('rules'):
+            output = self._rules_only(text, mode)
+        if output is not None:
+            return output
+
+        key = self._key(text, mode)
+        if self.cache is not None:
+            with span('cache'):
+                cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        return self.flights.do(key, lambda: self._extract(text, mode, key))
+
+    def _extract(
+        self, text: str, mode: ExtractionMode, key: str
+    ) -> TriagemModel:
+        runnable, sinais_vitais = self._plan(text, mode)
+        start = time.perf_counter()
+        output = self._merge(
+            text, runnable.invoke({'text': text}), sinais_vitais
+        )
+        self._repair(text, output, time.perf_counter() - start)
+
+        if self.cache is not None:
+            self.cache.set(key, output)
+        return output
+
+    def _repair(self, text: str, output: TriagemModel, elapsed: float):
+        fields = self._repair_fields(text, output, elapsed)
+        if not fields:
+            return
+
+        inputs = repair_inputs(output, fields, text)
+        start = time.perf_counter()
+        try:
+            repair = self._repair_runnable(fields).invoke(inputs)
+        except Exception:
+            record_repair('error')
+            return
+        self._apply_repair(
+            output, inputs, repair, elapsed - (time.perf_counter() - start)
+        )
+
+    async def _arepair(
+        self,
+        text: str,
+        output: TriagemModel,
+        elapsed: float,
+        timeout: float | None = None,
+    ):
+        fields = self._repair_fields(text, output, elapsed)
+        if not fields:
+            return
+
+        inputs = repair_inputs(output, fields, text)
+        start = time.perf_counter()
+        try:
+            repair = await self.limiter.run(
+                lambda: self._repair_runnable(fields).ainvoke(inputs),
+                timeout,
+            )
+        except Exception:
+            record_repair('error')
+            return
+        self._apply_repair(
+            output, inputs, repair, elapsed - (time.perf_counter() - start)
+        )
+
+    def _full_tokens(self, text: str, triagem: TriagemModel) -> int:
+        return estimate_tokens(
+            self.llm,
+            self.prompt.invoke({'text': text}).to_messages(),
+            build_tool(TriagemModel, self.profile),
+            triagem.model_dump_json(),
+        )
+
+    def _repair_fields(
+        self, text: str, triagem: TriagemModel, elapsed: float
+    ) -> tuple[str, ...]:
+        if not self.repair:
+            return ()
+        fields = invalid_fields(triagem, self.repair_required)
+        if not fields:
+            return ()
+
+        remaining = fill_from_rules(triagem, fields, text)
+        if not remaining:
+            record_repair('rules', self._full_tokens(text, triagem), elapsed)
+        return tuple(remaining)
+
+    def _repair_runnable(self, fields: tuple[str, ...]) -> Runnable:
+        if (runnable := self._repair_runnables.get(fields)) is None:
+            runnable = self._repair_runnables[fields] = (
+                REPAIR_PROMPT
+                | structured_output(
+                    self.llm, repair_model(fields), self.profile
+                )
+            ).with_config(run_name='repair', callbacks=[STAGE_TIMER])
+        return runnable
+
+    def _apply_repair(
+        self,
+        triagem: TriagemModel,
+        inputs: dict,
+        repair: BaseModel,
+        seconds_saved: float,
+    ):
+        repaired = apply_repair(triagem, repair)
+        fields = tuple(inputs['fields'])
+        tokens = estimate_tokens(
+            self.llm,
+            REPAIR_PROMPT.invoke(inputs).to_messages(),
+            build_tool(repair_model(fields), self.profile),
+            repair.model_dump_json(),
+        )
+        record_repair(
+            'llm' if repaired else 'unchanged',
+            self._full_tokens(inputs['text'], triagem) - tokens,
+            seconds_saved,
+        )
+
+    def invoke_segments(
+        self, text: str, mode: ExtractionMode = ExtractionMode.LLM
+    ) -> TriagemModel:
+        segments = split_segments(text, self.segment_max_words)
+        if len(segments) == 1:
+            return self.invoke(text, mode)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=get_settings().LLM_MAX_CONCURRENCY,
+                thread_name_prefix='llm-segment',
+            )
+        futures = [
+            self._executor.submit(
+                copy_context().run, self.invoke, segment, mode
+            )
+            for segment in segments
+        ]
+        return merge_triagens([future.result() for future in futures])
+
+    def _stream_runnable(
+        self, llm: BaseChatModel, schema: type[BaseModel]
+    ) -> Runnable:
+        key = (id(llm), schema.__name__)
+        if (runnable := self._stream_runnables.get(key)) is None:
+            examples = (
+                self.examples if schema is TriagemModel else self.text_examples
+            )
+            runnable = self._stream_runnables[key] = (
+                self._with_examples(examples)
+                | build_prompt(self.profile)
+                | llm.bind_tools([build_tool(schema, self.profile)])
+                | JsonOutputKeyToolsParser(
+                    key_name=schema.__name__, first_tool_only=True
+                )
+            ).with_config(callbacks=[STAGE_TIMER])
+        return runnable
+
+    def _stream_plan(
+        self, text: str, mode: ExtractionMode
+    ) -> tuple[Runnable, type[BaseModel], SinaisVitaisModel | None]:
+        sinais_vitais = None
+        if mode == ExtractionMode.HYBRID:
+            sinais_vitais = extract_sinais_vitais(text)
+        schema = TriagemModel if sinais_vitais is None else TriagemTextoModel
+        llm, _ = self.router.route(text)
+        return self._stream_runnable(llm, schema), schema, sinais_vitais
+
+    def _partial(
+        self,
+        text: str,
+        partial: object,
+        schema: type[BaseModel],
+        sinais_vitais: SinaisVitaisModel | None,
+    ) -> TriagemModel | None:
+        if not isinstance(partial, dict):
+            return None
+        try:
+            output = schema.model_validate(partial)
+        except ValidationError:
+            return None
+        return self._merge(text, output, sinais_vitais)
+
+    def _stream_cached(
+        self, text: str, mode: ExtractionMode
+    ) -> TriagemModel | None:
+        output = self._rules_only(text, mode)
+        if output is None and self.cache is not None:
+            output = self.cache.get(self._key(text, mode)) or self.cache.get(
+                self._stream_key(text, mode)
+            )
+        return output
+
+    def stream(
+        self, text: str, mode: ExtractionMode = ExtractionMode.LLM
+    ) -> Iterator[TriagemModel]:
+        """
+        Emite a triagem parcial a cada trecho da chamada de ferramenta
+        recebido do LLM, apenas quando algum campo muda; a última passa
+        pelo reparo.
+        """
+        if (cached := self._stream_cached(text, mode)) is not None:
+            yield cached
+            return
+
+        runnable, schema, sinais_vitais = self._stream_plan(text, mode)
+        start = time.perf_counter()
+        last = None
+
+        for partial in runnable.stream({'text': text}):
+            triagem = self._partial(text, partial, schema, sinais_vitais)
+            if triagem is not None and triagem != last:
+                last = triagem
+                yield triagem
+
+        if last is None:
+            return
+
+        output = last.model_copy(deep=True)
+        self._repair(text, output, time.perf_counter() - start)
+        if output != last:
+            yield output
+        if self.cache is not None:
+            self.cache.set(self._stream_key(text, mode), output)
+
+    async def astream(
+        self,
+        text: str,
+        timeout: float | None = None,
+        mode: ExtractionMode = ExtractionMode.LLM,
+    ) -> AsyncIterator[TriagemModel]:
+        """
+        Como `stream`, ocupando uma vaga do `limiter` durante a chamada;
+        o prazo vale para a chamada inteira e, esgotado, levanta
+        `TimeoutError`.
+        """
+        if (cached := self._stream_cached(text, mode)) is not None:
+            yield cached
+            return
+
+        runnable, schema, sinais_vitais = self._stream_plan(text, mode)
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        deadline = loop.time() + self.limiter.deadline(timeout)
+        last = None
+
+        async with self.limiter.slot():
+            partials = runnable.astream({'text': text})
+            try:
+                while True:
+                    try:
+                        partial = await asyncio.wait_for(
+                            partials.__anext__(), deadline - loop.time()
+                        )
+                    except StopAsyncIteration:
+                        break
+
+                    triagem = self._partial(
+                        text, partial, schema, sinais_vitais
+                    )
+                    if triagem is not None and triagem != last:
+                        last = triagem
+                        yield triagem
+            finally:
+                await partials.aclose()
+
+        if last is None:
+            return
+
+        # fora da vaga do streaming: o reparo ocupa a sua própria
+        output = last.model_copy(deep=True)
+        await self._arepair(
+            text,
+            output,
+            time.perf_counter() - start,
+            max(deadline - loop.time(), 0.001),
+        )
+        if output != last:
+            yield output
+        if self.cache is not None:
+            await self.cache.aset(self._stream_key(text, mode), output)
+
+    async def ainvoke(
+        self,
+        text: str,
+        timeout: float | None = None,
+        mode: ExtractionMode = ExtractionMode.LLM,
+        store: bool = True,
+    ) -> TriagemModel:
+        # `store=False`: consulta o cache, mas não grava o resultado (textos
+        # que não vão se repetir, como os parciais do ditado)
+        with span('rules'):
+            output = self._rules_only(text, mode)
+        if output is not None:
+            return output
+
+        key = self._key(text, mode)
+        if self.cache is not None:
+            with span('cache'):
+                cached = await self.cache.aget(key)
+            if cached is not None:
+                return cached
+
+        return await self.flights.ado(
+            key if store else f'{key}:parcial',
+            lambda: self._aextract(
+                text, mode, key if store else None, timeout
+            ),
+        )
+
+    async def _aextract(
+        self,
+        text: str,
+        mode: ExtractionMode,
+        key: str | None,
+        timeout: float | None = None,
+    ) -> TriagemModel:
+        runnable, sinais_vitais = self._plan(text, mode)
+        start = time.perf_counter()
+        output = self._merge(
+            text,
+            await self.limiter.run(
+                lambda: runnable.ainvoke({'text': text}), timeout
+            ),
+            sinais_vitais,
+        )
+        await self._arepair(text, output, time.perf_counter() - start, timeout)
+
+        if self.cache is not None and key is not None:
+            await self.cache.aset(key, output)
+        return output
+
+    async def ainvoke_segments(
+        self,
+        text: str,
+        timeout: float | None = None,
+        mode: ExtractionMode = ExtractionMode.LLM,
+    ) -> TriagemModel:
+        segments = split_segments(text, self.segment_max_words)
+        if len(segments) == 1:
+            return await self.ainvoke(text, timeout, mode)
+
+        return merge_triagens(
+            await asyncio.gather(
+                *(self.ainvoke(segment, timeout, mode) for segment in segments)
+            )
+        )
+
+    async def abatch(
+        self,
+        texts: list[str],
+        max_concurrency: int | None = None,
+        mode: ExtractionMode = ExtractionMode.LLM,
+        timeout: float | None = None,
+    ) -> list[TriagemModel | BaseException]:
+        """
+        Extrai as notas com `ainvoke` (cache, chamadas agrupadas, limite
+        global, modo e reparo), no máximo `max_concurrency` de cada vez,
+        valor que não passa do tamanho do `limiter`. Cada posição traz a
+        triagem ou o erro da nota correspondente.
+        """
+        semaphore = asyncio.Semaphore(
+            min(
+                max_concurrency or self.batch_concurrency,
+                self.limiter.max_concurrency,
+            )
+        )
+
+        async def extract(text: str) -> TriagemModel:
+            async with semaphore:
+                return await self.ainvoke(text, timeout, mode)
+
+        return await asyncio.gather(
+            *(extract(text) for text in texts), return_exceptions=True
+        )
+
+
+def get_pipeline(connection: HTTPConnection) -> TriagemPipeline:
+    # HTTPConnection: serve tanto a rotas HTTP quanto a WebSockets
+    return connection.app.state.pipeline
@@ -0,0 +1,71 @@
+import math
+import unicodedata
+from collections import Counter, defaultdict
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.split())
+
+
+def char_ngrams(text: str, sizes: tuple[int, ...] = (3, 4, 5)) -> Counter:
+    text = f' {normalize(text)} '
+    return Counter(
+        text[i : i + size]
+        for size in sizes
+        for i in range(len(text) - size + 1)
+    )
+
+
+class ExampleIndex:
+    """
+    Índice TF-IDF de n-gramas de caracteres sobre os textos dos exemplos
+    few-shot, montado uma vez no início da aplicação. `select` devolve
+    os `k` exemplos mais parecidos com a nota recebida, de modo que o
+    tamanho do prompt não cresce com a biblioteca de exemplos.
+    """
+
+    def __init__(self, texts: list[str]):
+        counts = [char_ngrams(text) for text in texts]
+
+        df = Counter(ngram for count in counts for ngram in count)
+        self.idf = {
+            ngram: math.log((1 + len(texts)) / (1 + freq)) + 1
+            for ngram, freq in df.items()
+        }
+
+        self.postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+        for i, count in enumerate(counts):
+            for ngram, weight in self._vector(count).items():
+                self.postings[ngram].append((i, weight))
+
+        self.size = len(texts)
+
+    def _vector(self, count: Counter) -> dict[str, float]:
+        vector = {
+            ngram: (1 + math.log(freq)) * self.idf[ngram]
+            for ngram, freq in count.items()
+            if ngram in self.idf
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {ngram: w / norm for ngram, w in vector.items()}
+
+    def scores(self, text: str) -> list[float]:
+        scores = [0.0] * self.size
+        for ngram, weight in self._vector(char_ngrams(text)).items():
+            for i, example_weight in self.postings.get(ngram, ()):
+                scores[i] += weight * example_weight
+        return scores
+
+    def select(self, text: str, k: int) -> list[int]:
+        """
+        Índices dos `k` exemplos mais similares, do menos para o mais
+        similar, para que o exemplo mais próximo fique junto da nota.
+        """
+        if k <= 0 or k >= self.size:
+            return list(range(self.size))
+
+        scores = self.scores(text)
+        best = sorted(range(self.size), key=scores.__getitem__)[-k:]
+        return best
@@ -0,0 +1,143 @@
+import asyncio
+import itertools
+import json
+import random
+import time
+from typing import Any, Iterator, Optional, Sequence
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+)
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+)
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from hackathon.llm.rules import extract_rules
+
+STREAM_CHUNK_SIZE = 16
+
+_call_ids = itertools.count()
+
+
+class FakeTriagemChatModel(BaseChatModel):
+    """
+    Modelo de chat local que substitui o Cohere em testes e benchmarks.
+    Responde sempre com uma chamada à primeira ferramenta vinculada: os
+    argumentos são `response`, quando informado, ou a extração por
+    regras da última mensagem humana (eco). `latency` e `jitter`, em
+    segundos, simulam o tempo de resposta do provedor; no streaming os
+    argumentos chegam em pedaços, como no Cohere.
+    """
+
+    model: str = 'fake-triagem'
+    latency: float = 0.0
+    jitter: float = 0.0
+    response: Optional[dict] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return 'fake-triagem'
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(
+            tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs
+        )
+
+    def _delay(self) -> float:
+        return max(self.latency + random.uniform(-self.jitter, self.jitter), 0)
+
+    def _respond(
+        self, messages: list[BaseMessage], tools: list[dict] | None
+    ) -> ChatResult:
+        if not tools:
+            return ChatResult(
+                generations=[ChatGeneration(message=AIMessage(content=''))]
+            )
+
+        function = tools[0]['function']
+        args = self.response
+        if args is None:
+            text = next(
+                (
+                    str(message.content)
+                    for message in reversed(messages)
+                    if isinstance(message, HumanMessage)
+                ),
+                '',
+            )
+            properties = function['parameters'].get('properties', {})
+            args = extract_rules(text).model_dump(
+                include=set(properties) - {'id'}
+            )
+
+        message = AIMessage(
+            content='',
+            tool_calls=[
+                {
+                    'name': function['name'],
+                    'args': args,
+                    'id': f'call_{next(_call_ids)}',
+                }
+            ],
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        tools: list[dict] | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._delay())
+        return self._respond(messages, tools)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        tools: list[dict] | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._respond(messages, tools)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        tools: list[dict] | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._delay())
+        message = self._respond(messages, tools).generations[0].message
+
+        for tool_call in getattr(message, 'tool_calls', []):
+            args = json.dumps(tool_call['args'], ensure_ascii=False)
+            for start in range(0, len(args), STREAM_CHUNK_SIZE):
+                chunk = AIMessageChunk(
+                    content='',
+                    tool_call_chunks=[
+                        {
+                            'name': tool_call['name'] if not start else None,
+                            'args': args[start : start + STREAM_CHUNK_SIZE],
+                            'id': tool_call['id'] if not start else None,
+                            'index': 0,
+                        }
+                    ],
+                )
+                yield ChatGenerationChunk(message=chunk)
@@ -0,0 +1,118 @@
+from enum import StrEnum
+from functools import cache
+
+from pydantic import BaseModel
+
+
+class PromptProfile(StrEnum):
+    VERBOSE = 'verbose'
+    COMPACT = 'compact'
+
+
+COMPACT_SYSTEM_PROMPT = (
+    'Extraia os dados da nota de triagem escrita pela enfermagem. '
+    'Sinais vitais: pressão arterial em mmHg (120/80), frequência '
+    'cardíaca em bpm, temperatura em °C (37.5°C), saturação de '
+    'oxigênio em % e frequência respiratória em rpm. Extraia também '
+    'histórico individual e familiar, sintoma principal, localização, '
+    'sintomas associados, início dos sintomas (AAAA-MM-DD), escala de '
+    'dor e urgência (0 a 10). Dado ausente: None.'
+)
+
+COMPACT_DESCRIPTIONS = {
+    'TriagemModel': 'Dados extraídos da triagem.',
+    'TriagemTextoModel': 'Campos de texto livre da triagem.',
+    'sinais_vitais': 'Sinais vitais aferidos.',
+    'pressao_arterial': 'Em mmHg, como 120/80 mmHg.',
+    'temperatura': 'Em °C, como 37.5°C.',
+    'frequencia_cardiaca': 'Em bpm, como 72 bpm.',
+    'frequencia_respiratoria': 'Em rpm, como 16 rpm.',
+    'saturacao_oxigenio': 'Em %, como 98%.',
+    'historico_individual': 'Doenças prévias do paciente.',
+    'historico_familiar': 'Doenças na família, com o parente.',
+    'inicio_sintoma': 'Início dos sintomas, AAAA-MM-DD.',
+    'sintoma': 'Sintoma principal.',
+    'sintoma_localizacao': 'Local do sintoma no corpo.',
+    'sintomas_associados': 'Outros sintomas, separados por vírgula.',
+    'escala_dor': 'Dor de 0 a 10.',
+    'urgencia': 'Urgência de 0 a 10, como número.',
+}
+
+JSON_TYPES = {'string', 'integer', 'number', 'boolean', 'object', 'array'}
+
+
+def compact_text(text: str) -> str:
+    return ' '.join(text.split())
+
+
+def _ref(definition: dict) -> str | None:
+    for option in [definition, *definition.get('anyOf', [])]:
+        if '$ref' in option:
+            return option['$ref'].rsplit('/', 1)[-1]
+    return None
+
+
+def _clause(description: str) -> str:
+    description = description.rstrip('.')
+    return description[:1].lower() + description[1:]
+
+
+def _json_type(definition: dict) -> str:
+    if definition.get('type') in JSON_TYPES:
+        return definition['type']
+
+    for option in definition.get('anyOf', []):
+        if option.get('type') in JSON_TYPES:
+            return option['type']
+        if '$ref' in option:
+            return 'object'
+
+    return 'string'
+
+
+def _properties(definition: dict, defs: dict) -> dict:
+    properties = {}
+    for name, field in definition['properties'].items():
+        if name == 'id':
+            continue
+
+        properties[name] = {
+            'type': _json_type(field),
+            'description': COMPACT_DESCRIPTIONS.get(name, name),
+            'default': None,
+        }
+        # modelos aninhados mantêm os seus campos, também resumidos; as
+        # chaves vão ainda na descrição, porque alguns provedores (como o
+        # Cohere) achatam a ferramenta e descartam os `properties` internos
+        if (ref := _ref(field)) is not None:
+            nested = _properties(defs[ref], defs)
+            properties[name]['properties'] = nested
+            properties[name]['description'] += (
+                ' Chaves: '
+                + ', '.join(
+                    f'{key} ({_clause(value["description"])})'
+                    for key, value in nested.items()
+                )
+                + '.'
+            )
+    return properties
+
+
+@cache
+def tool_schema(schema: type[BaseModel]) -> dict:
+    """
+    Esquema da ferramenta de extração no perfil compacto, gerado uma
+    única vez por modelo: sem o campo `id`, que é atribuído pelo banco,
+    e com descrições curtas no lugar das descrições dos `Field`,
+    inclusive nos modelos aninhados.
+    """
+    json_schema = schema.model_json_schema()
+
+    return {
+        'title': schema.__name__,
+        'description': COMPACT_DESCRIPTIONS.get(
+            schema.__name__, schema.__name__
+        ),
+        'type': 'object',
+        'properties': _properties(json_schema, json_schema.get('$defs', {})),
+    }
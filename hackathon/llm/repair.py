@@ -0,0 +1,186 @@
+"""
+Reparo de extrações com campos inválidos: em vez de repetir a extração
+inteira, apenas os campos com problema são pedidos de novo ao LLM, em
+uma chamada com esquema reduzido e sem os exemplos few-shot.
+"""
+
+from functools import lru_cache
+from typing import Callable, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, create_model
+
+from hackathon.llm.rules import (
+    SATURACAO_MAX,
+    TEMPERATURA_MAX,
+    TEMPERATURA_MIN,
+    extract_rules,
+)
+from hackathon.metrics import (
+    LLM_REPAIR_SECONDS_SAVED,
+    LLM_REPAIR_TOKENS_SAVED,
+    LLM_REPAIRS,
+)
+from hackathon.parsers import parse_float, parse_int, parse_pressao_arterial
+from hackathon.schemas import SinaisVitaisModel, TriagemModel
+
+REPAIR_SYSTEM_PROMPT = (
+    'Você revisa a extração de dados de uma triagem. Extraia do texto '
+    'apenas os campos pedidos, no formato descrito em cada um. Quando o '
+    'dado não constar no texto, retorne None.'
+)
+REPAIR_PROMPT = ChatPromptTemplate.from_messages([
+    ('system', REPAIR_SYSTEM_PROMPT),
+    ('human', '{text}\n\nValores inválidos na extração anterior: {invalid}'),
+])
+
+
+def _in_range(
+    parse: Callable[[str], float | None], low: float, high: float
+) -> Callable[[str], bool]:
+    def check(value: str) -> bool:
+        number = parse(value)
+        return number is not None and low <= number <= high
+
+    return check
+
+
+# campos verificados, pelo nome no esquema reduzido (os sinais vitais
+# sem o prefixo `sinais_vitais`)
+CHECKS: dict[str, Callable[[str], bool]] = {
+    'pressao_arterial': lambda value: (
+        parse_pressao_arterial(value)[0] is not None
+    ),
+    'temperatura': _in_range(parse_float, TEMPERATURA_MIN, TEMPERATURA_MAX),
+    'frequencia_cardiaca': _in_range(parse_int, 20, 300),
+    'frequencia_respiratoria': _in_range(parse_int, 4, 80),
+    'saturacao_oxigenio': _in_range(parse_int, 50, SATURACAO_MAX),
+    'escala_dor': _in_range(parse_int, 0, 10),
+    'urgencia': _in_range(parse_int, 0, 10),
+}
+VITAL_FIELDS = set(SinaisVitaisModel.model_fields) - {'id'}
+
+
+def field_values(triagem: TriagemModel) -> dict[str, str | None]:
+    sinais_vitais = triagem.sinais_vitais or SinaisVitaisModel()
+    return sinais_vitais.model_dump(exclude={'id'}) | triagem.model_dump(
+        exclude={'id', 'sinais_vitais'}
+    )
+
+
+def invalid_fields(
+    triagem: TriagemModel, required: list[str] | None = None
+) -> list[str]:
+    """
+    Campos com valor que não passa na verificação (fora da faixa ou sem
+    número) e, entre os `required`, os que vieram vazios.
+    """
+    values = field_values(triagem)
+    return [
+        name
+        for name, value in values.items()
+        if (value is not None and name in CHECKS and not CHECKS[name](value))
+        or (value is None and name in (required or []))
+    ]
+
+
+def set_field(triagem: TriagemModel, name: str, value: str | None):
+    if name in VITAL_FIELDS:
+        if triagem.sinais_vitais is None:
+            triagem.sinais_vitais = SinaisVitaisModel()
+        setattr(triagem.sinais_vitais, name, value)
+    else:
+        setattr(triagem, name, value)
+
+
+def is_valid(name: str, value: str | None) -> bool:
+    return value is not None and CHECKS.get(name, bool)(value)
+
+
+def fill_from_rules(
+    triagem: TriagemModel, fields: list[str], text: str
+) -> list[str]:
+    """
+    Corrige, com os valores extraídos por regras, os campos que elas
+    conseguem extrair; devolve os que ainda precisam do LLM.
+    """
+    rules = field_values(extract_rules(text))
+    remaining = []
+    for name in fields:
+        if is_valid(name, rules.get(name)):
+            set_field(triagem, name, rules[name])
+        else:
+            remaining.append(name)
+    return remaining
+
+
+@lru_cache
+def repair_model(fields: tuple[str, ...]) -> type[BaseModel]:
+    """Esquema reduzido, só com os `fields` e suas descrições originais."""
+    definitions = SinaisVitaisModel.model_fields | TriagemModel.model_fields
+    return create_model(
+        'TriagemReparo',
+        __doc__='Campos da triagem que precisam ser extraídos de novo.',
+        **{
+            name: (Optional[str], definitions[name])  # type: ignore
+            for name in fields
+        },
+    )
+
+
+def repair_inputs(
+    triagem: TriagemModel, fields: tuple[str, ...], text: str
+) -> dict:
+    values = field_values(triagem)
+    return {
+        'text': text,
+        'fields': fields,
+        'invalid': '; '.join(f'{name}={values[name]!r}' for name in fields),
+    }
+
+
+def apply_repair(triagem: TriagemModel, output: BaseModel) -> list[str]:
+    """
+    Copia para a triagem os valores válidos da resposta do reparo e
+    devolve os campos corrigidos; os demais mantêm o valor original.
+    """
+    repaired = []
+    for name, value in output.model_dump().items():
+        if is_valid(name, value):
+            set_field(triagem, name, value)
+            repaired.append(name)
+    return repaired
+
+
+def estimate_tokens(
+    llm: BaseChatModel,
+    messages: list[BaseMessage],
+    schema: type[BaseModel] | dict,
+    output: str,
+) -> int:
+    """
+    Tokens de uma chamada: mensagens, ferramenta no formato que `llm`
+    envia ao provedor (como no relatório de `tokens`) e resposta.
+    """
+    # importado aqui: `tokens` depende de `chain`, que depende deste módulo
+    from hackathon.llm.tokens import (  # noqa: PLC0415
+        approx_tokens,
+        message_text,
+        tool_payload,
+    )
+
+    return (
+        sum(approx_tokens(message_text(message)) for message in messages)
+        + approx_tokens(tool_payload(llm, schema))
+        + approx_tokens(output)
+    )
+
+
+def record_repair(
+    result: str, tokens_saved: int = 0, seconds_saved: float = 0.0
+):
+    LLM_REPAIRS.inc(result=result)
+    LLM_REPAIR_TOKENS_SAVED.inc(max(tokens_saved, 0))
+    LLM_REPAIR_SECONDS_SAVED.inc(max(seconds_saved, 0.0))
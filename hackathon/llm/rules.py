@@ -0,0 +1,256 @@
+import re
+from enum import StrEnum
+from typing import Callable
+
+from hackathon.schemas import SinaisVitaisModel, TriagemModel
+
+
+class ExtractionMode(StrEnum):
+    RULES = 'rules'
+    LLM = 'llm'
+    HYBRID = 'hybrid'
+
+
+FLAGS = re.IGNORECASE
+
+# entre o rótulo e o valor, só ':', '=' ou 'de' ("FC: 90", "PA de
+# 120/80"); um número mais adiante na frase não é o sinal vital
+GAP = r'\s*(?:[:=]\s*|de\s+)?'
+
+PRESSAO_ARTERIAL_PATTERNS = [
+    re.compile(r'(?<![\d/])(\d{2,3})\s*[/xX]\s*(\d{2,3})\s*mm\s*hg', FLAGS),
+    re.compile(
+        r'\b(?:PA|press[aã]o arterial)\b'
+        + GAP
+        + r'(\d{2,3})\s*[/xX]\s*(\d{2,3})(?![\d/])',
+        FLAGS,
+    ),
+]
+
+FREQUENCIA_CARDIACA_PATTERNS = [
+    re.compile(r'(?<![\d.,])(\d{2,3})\s*(?:bpm|batimentos)', FLAGS),
+    re.compile(
+        r'\b(?:FC|frequ[eê]ncia card[ií]aca)\b'
+        + GAP
+        + r'(\d{2,3})(?![\d/]|[.,]\d)',
+        FLAGS,
+    ),
+]
+
+FREQUENCIA_RESPIRATORIA_PATTERNS = [
+    re.compile(
+        r'(?<![\d.,])(\d{1,2})\s*'
+        r'(?:i?rpm|ipm|mrm|respira[çc][õo]es\s+por\s+minuto)',
+        FLAGS,
+    ),
+    re.compile(
+        r'\b(?:FR|frequ[eê]ncia respirat[oó]ria)\b'
+        + GAP
+        + r'(\d{1,2})(?![\d/]|[.,]\d)',
+        FLAGS,
+    ),
+]
+
+SATURACAO_OXIGENIO_LABEL = (
+    r'\b(?:sat(?:ura[çc][ãa]o)?(?:\s+de\s+oxig[eê]nio)?|sp\s*o2)\b'
+)
+# com o rótulo, o valor precisa de `%` ou vir logo depois ("SpO2 91")
+SATURACAO_OXIGENIO_PATTERNS = [
+    re.compile(
+        SATURACAO_OXIGENIO_LABEL + r'\D{0,30}?(?<![\d.,])(\d{2,3})\s*%',
+        FLAGS,
+    ),
+    re.compile(
+        SATURACAO_OXIGENIO_LABEL + GAP + r'(\d{2,3})(?![\d/%]|[.,]\d)',
+        FLAGS,
+    ),
+]
+
+TEMPERATURA_PATTERNS = [
+    re.compile(r'(?<![\d.,])(\d{2}(?:[.,]\d{1,2})?)\s*°\s*C\b', FLAGS),
+    re.compile(
+        r'\b(?:temperatura|temp|T\.?\s?ax|tax)\b'
+        + GAP
+        + r'(\d{2}(?:[.,]\d{1,2})?)(?![\d/])',
+        FLAGS,
+    ),
+]
+
+DATA_PATTERN = re.compile(
+    r'\b(\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2})\b', FLAGS
+)
+
+# faixas plausíveis: fora delas, o número não é o sinal vital
+TEMPERATURA_MIN = 30.0
+TEMPERATURA_MAX = 45.0
+SATURACAO_MIN = 50
+SATURACAO_MAX = 100
+SISTOLICA_MIN, SISTOLICA_MAX = 50, 300
+DIASTOLICA_MIN, DIASTOLICA_MAX = 20, 200
+FREQUENCIA_CARDIACA_MIN, FREQUENCIA_CARDIACA_MAX = 20, 250
+FREQUENCIA_RESPIRATORIA_MIN, FREQUENCIA_RESPIRATORIA_MAX = 5, 60
+
+LABELS_PATTERN = re.compile(
+    r'\b(?:PA|FC|FR|SpO2|sat|tax|temp|mmhg|bpm|i?rpm|°C|'
+    r'press[aã]o arterial|frequ[eê]ncia card[ií]aca|'
+    r'frequ[eê]ncia respirat[oó]ria|satura[çc][ãa]o(?: de oxig[eê]nio)?|'
+    r'temperatura(?: corporal)?|respira[çc][õo]es por minuto)\b',
+    FLAGS,
+)
+WORD_PATTERN = re.compile(r'[^\W\d_]{3,}')
+TOKEN_PATTERN = re.compile(r'[^\W\d_]+')
+# palavras que podem acompanhar uma nota só de sinais vitais
+VITALS_ONLY_STOPWORDS = frozenset({
+    'a',
+    'aa',
+    'ambiente',
+    'ar',
+    'ax',
+    'c',
+    'com',
+    'de',
+    'e',
+    'em',
+    'ipm',
+    'mrm',
+    'paciente',
+    'queixa',
+    'queixas',
+    'sem',
+    'sinais',
+    't',
+    'vitais',
+    'x',
+})
+
+
+def _search(
+    patterns: list[re.Pattern],
+    text: str,
+    valid: Callable[[re.Match], bool],
+) -> re.Match | None:
+    """Primeira ocorrência, na ordem dos padrões, com valor plausível."""
+    for pattern in patterns:
+        for match in pattern.finditer(text):
+            if valid(match):
+                return match
+    return None
+
+
+def extract_pressao_arterial(text: str) -> str | None:
+    if match := _search(
+        PRESSAO_ARTERIAL_PATTERNS,
+        text,
+        lambda m: (
+            SISTOLICA_MIN <= int(m[1]) <= SISTOLICA_MAX
+            and DIASTOLICA_MIN <= int(m[2]) <= DIASTOLICA_MAX
+            and int(m[2]) < int(m[1])
+        ),
+    ):
+        return f'{match[1]}/{match[2]} mmHg'
+    return None
+
+
+def extract_frequencia_cardiaca(text: str) -> str | None:
+    if match := _search(
+        FREQUENCIA_CARDIACA_PATTERNS,
+        text,
+        lambda m: (
+            FREQUENCIA_CARDIACA_MIN <= int(m[1]) <= FREQUENCIA_CARDIACA_MAX
+        ),
+    ):
+        return f'{match[1]} bpm'
+    return None
+
+
+def extract_frequencia_respiratoria(text: str) -> str | None:
+    if match := _search(
+        FREQUENCIA_RESPIRATORIA_PATTERNS,
+        text,
+        lambda m: (
+            FREQUENCIA_RESPIRATORIA_MIN
+            <= int(m[1])
+            <= FREQUENCIA_RESPIRATORIA_MAX
+        ),
+    ):
+        return f'{match[1]} rpm'
+    return None
+
+
+def extract_saturacao_oxigenio(text: str) -> str | None:
+    if match := _search(
+        SATURACAO_OXIGENIO_PATTERNS,
+        text,
+        lambda m: SATURACAO_MIN <= int(m[1]) <= SATURACAO_MAX,
+    ):
+        return f'{match[1]}%'
+    return None
+
+
+def extract_temperatura(text: str) -> str | None:
+    if match := _search(
+        TEMPERATURA_PATTERNS,
+        text,
+        lambda m: (
+            TEMPERATURA_MIN <= float(m[1].replace(',', '.')) <= TEMPERATURA_MAX
+        ),
+    ):
+        return f'{match[1].replace(",", ".")}°C'
+    return None
+
+
+def extract_inicio_sintoma(text: str) -> str | None:
+    if match := DATA_PATTERN.search(text):
+        return match[1]
+    return None
+
+
+def extract_sinais_vitais(text: str) -> SinaisVitaisModel | None:
+    sinais_vitais = SinaisVitaisModel(
+        pressao_arterial=extract_pressao_arterial(text),
+        temperatura=extract_temperatura(text),
+        frequencia_cardiaca=extract_frequencia_cardiaca(text),
+        frequencia_respiratoria=extract_frequencia_respiratoria(text),
+        saturacao_oxigenio=extract_saturacao_oxigenio(text),
+    )
+
+    if not sinais_vitais.model_dump(exclude_none=True):
+        return None
+
+    return sinais_vitais
+
+
+def extract_rules(text: str) -> TriagemModel:
+    """
+    Extrai, apenas com expressões regulares, os sinais vitais e a data
+    de início dos sintomas. Os demais campos ficam None.
+    """
+    return TriagemModel(
+        sinais_vitais=extract_sinais_vitais(text),
+        inicio_sintoma=extract_inicio_sintoma(text),
+    )
+
+
+def free_text_words(text: str) -> int:
+    """Conta as palavras da nota que não são rótulos de sinais vitais."""
+    return len(WORD_PATTERN.findall(LABELS_PATTERN.sub(' ', text)))
+
+
+def free_text_terms(text: str) -> set[str]:
+    """Palavras distintas do texto livre da nota, em minúsculas."""
+    return set(WORD_PATTERN.findall(LABELS_PATTERN.sub(' ', text).lower()))
+
+
+def is_vitals_only(text: str) -> bool:
+    """
+    Indica se a nota traz apenas sinais vitais, sem texto livre que
+    justifique uma chamada ao LLM. Ex.: 'PA 120/80, FC 80, sem queixas'.
+    As regras precisam ter extraído algum sinal vital, e as demais
+    palavras precisam estar em `VITALS_ONLY_STOPWORDS`.
+    """
+    if extract_sinais_vitais(text) is None:
+        return False
+    return all(
+        token.lower() in VITALS_ONLY_STOPWORDS
+        for token in TOKEN_PATTERN.findall(LABELS_PATTERN.sub(' ', text))
+    )
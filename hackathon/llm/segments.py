@@ -0,0 +1,133 @@
+"""
+Divisão de notas longas (um plantão inteiro, várias reavaliações) em
+trechos extraídos separadamente, e a combinação das triagens de cada
+trecho em uma só.
+"""
+
+import re
+from typing import Callable, Iterator
+
+from hackathon.parsers import parse_date, parse_int
+from hackathon.schemas import SinaisVitaisModel, TriagemModel
+
+# início de um novo atendimento: horário ('14:30', '[08h15]'), data e
+# hora ('12/11 14:30') ou um rótulo de reavaliação no começo da linha
+ENCOUNTER_PATTERN = re.compile(
+    r'^[ \t]*(?:'
+    r'\[?\d{1,2}[:h]\d{2}\]?(?!\d)'
+    r'|\d{1,2}/\d{1,2}(?:/\d{2,4})?[ \t]+(?:[àa]s[ \t]+)?\d{1,2}[:h]\d{2}'
+    r'|(?:reavalia[çc][ãa]o|evolu[çc][ãa]o|retorno|plant[ãa]o)\b'
+    r')',
+    re.IGNORECASE | re.MULTILINE,
+)
+PARAGRAPH_PATTERN = re.compile(r'\n[ \t]*\n')
+ITEM_PATTERN = re.compile(r'[,;]')
+# no histórico familiar a vírgula separa a doença do parente
+FAMILY_ITEM_PATTERN = re.compile(r';')
+
+
+def _pack(paragraphs: list[str], max_words: int) -> Iterator[str]:
+    current: list[str] = []
+    words = 0
+    for paragraph in filter(None, map(str.strip, paragraphs)):
+        count = len(paragraph.split())
+        if current and words + count > max_words:
+            yield '\n\n'.join(current)
+            current, words = [], 0
+        current.append(paragraph)
+        words += count
+    if current:
+        yield '\n\n'.join(current)
+
+
+def split_segments(text: str, max_words: int) -> list[str]:
+    """
+    Separa a nota nos atendimentos que ela registra e, dentro de cada
+    atendimento, junta parágrafos vizinhos em trechos de até
+    `max_words` palavras (um parágrafo maior que isso fica inteiro).
+    Atendimentos nunca são juntados, para que a ordem entre eles decida
+    quais sinais vitais valem. Uma nota curta resulta em um só trecho.
+    """
+    starts = [match.start() for match in ENCOUNTER_PATTERN.finditer(text)]
+    bounds = [0, *(start for start in starts if start > 0), len(text)]
+
+    segments = [
+        segment
+        for begin, end in zip(bounds, bounds[1:])
+        for segment in _pack(
+            PARAGRAPH_PATTERN.split(text[begin:end]), max_words
+        )
+    ]
+    return segments or [text]
+
+
+def _first(values: list[str | None]) -> str | None:
+    return next((value for value in values if value), None)
+
+
+def _extreme(
+    values: list[str | None], parse: Callable, pick: Callable
+) -> str | None:
+    parsed = [(parse(value), value) for value in values if value]
+    comparable = [item for item in parsed if item[0] is not None]
+    if comparable:
+        return pick(comparable, key=lambda item: item[0])[1]
+    return _first(values)
+
+
+def _union(
+    values: list[str | None],
+    pattern: re.Pattern = ITEM_PATTERN,
+    separator: str = ', ',
+) -> str | None:
+    items: dict[str, str] = {}
+    for value in filter(None, values):
+        for item in map(str.strip, pattern.split(value)):
+            if item:
+                items.setdefault(item.casefold(), item)
+    return separator.join(items.values()) or None
+
+
+def merge_triagens(triagens: list[TriagemModel]) -> TriagemModel:
+    """
+    Combina as triagens dos trechos, na ordem da nota: cada sinal vital
+    vem do último trecho que o informa; sintomas associados e históricos
+    são unidos sem repetição; urgência e dor ficam com o maior valor e o
+    início dos sintomas com a data mais antiga. Sintoma principal e sua
+    localização vêm do primeiro trecho que traz o sintoma.
+    """
+    if len(triagens) == 1:
+        return triagens[0]
+
+    sinais_vitais: dict[str, str] = {}
+    for triagem in triagens:
+        if triagem.sinais_vitais is not None:
+            sinais_vitais |= triagem.sinais_vitais.model_dump(
+                exclude={'id'}, exclude_none=True
+            )
+
+    principal = next(
+        (triagem for triagem in triagens if triagem.sintoma), triagens[0]
+    )
+
+    def values(field: str) -> list[str | None]:
+        return [getattr(triagem, field) for triagem in triagens]
+
+    return TriagemModel(
+        sinais_vitais=(
+            SinaisVitaisModel(**sinais_vitais) if sinais_vitais else None
+        ),
+        historico_individual=_union(values('historico_individual')),
+        historico_familiar=_union(
+            values('historico_familiar'), FAMILY_ITEM_PATTERN, '; '
+        ),
+        inicio_sintoma=_extreme(values('inicio_sintoma'), parse_date, min),
+        sintoma=principal.sintoma,
+        sintoma_localizacao=(
+            principal.sintoma_localizacao
+            or _first(values('sintoma_localizacao'))
+        ),
+        sintomas_associados=_union(values('sintomas_associados')),
+        escala_dor=_extreme(values('escala_dor'), parse_int, max),
+        urgencia=_extreme(values('urgencia'), parse_int, max),
+    )
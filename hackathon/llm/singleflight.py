@@ -0,0 +1,66 @@
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, TypeVar
+
+from hackathon.metrics import COALESCED_REQUESTS
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas simultâneas com a mesma chave: a primeira executa a
+    função e as demais esperam pelo mesmo resultado (ou exceção), que
+    cada uma recebe como cópia. Nada é guardado depois que a chamada
+    termina, então não há risco de resultado desatualizado.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, Future] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def _count(self):
+        with self._lock:
+            self.coalesced += 1
+        COALESCED_REQUESTS.inc()
+
+    def do(self, key: str, call: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            self._count()
+            return copy.deepcopy(future.result())  # type: ignore
+
+        try:
+            result = call()
+        except BaseException as exc:
+            future.set_exception(exc)  # type: ignore
+            raise
+        else:
+            future.set_result(result)  # type: ignore
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def ado(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        task = self._tasks.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            # shield: se quem iniciou a chamada desistir, as demais
+            # continuam esperando pelo resultado
+            return await asyncio.shield(task)
+
+        self._count()
+        return copy.deepcopy(await asyncio.shield(task))
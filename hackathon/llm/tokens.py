@@ -0,0 +1,113 @@
+"""
+Relatório de tokens por componente do prompt de extração, para comparar
+os perfis `verbose` e `compact`.
+
+    python -m hackathon.llm.tokens [--k 2] [--exato]
+
+O esquema da ferramenta é contado como o modelo configurado em `get_llm`
+o envia (`bind_tools`), já no formato do provedor: o Cohere, por exemplo,
+achata a ferramenta em `parameter_definitions`. Por padrão os tokens são
+estimados localmente; com `--exato` a contagem usa o tokenizador do
+modelo.
+"""
+
+import argparse
+import json
+import re
+from typing import Callable
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
+
+from hackathon.llm.chain import (
+    build_example_messages,
+    build_tool,
+    get_llm,
+    system_prompt,
+)
+from hackathon.llm.profiles import PromptProfile
+from hackathon.schemas import TriagemModel
+
+TOKEN_PATTERN = re.compile(r'\w{1,4}|[^\w\s]|\s{2,}')
+
+
+def approx_tokens(text: str) -> int:
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def message_text(message: BaseMessage) -> str:
+    parts = [str(message.content)]
+    for tool_call in getattr(message, 'tool_calls', []):
+        parts.append(json.dumps(tool_call['args'], ensure_ascii=False))
+    return '\n'.join(parts)
+
+
+def tool_payload(llm: BaseChatModel, schema: type[BaseModel] | dict) -> str:
+    """Ferramenta como o modelo a envia ao provedor, serializada."""
+    tools = llm.bind_tools([schema]).kwargs['tools']  # type: ignore
+    return json.dumps(tools, ensure_ascii=False, default=str)
+
+
+def token_report(
+    profile: PromptProfile,
+    k: int = 0,
+    count: Callable[[str], int] = approx_tokens,
+    llm: BaseChatModel | None = None,
+) -> dict[str, int]:
+    llm = get_llm() if llm is None else llm
+    examples = build_example_messages(TriagemModel, profile)
+    if k > 0:
+        examples = examples[:k]
+
+    report = {
+        'system': count(system_prompt(profile)),
+        'examples': sum(
+            count(message_text(message))
+            for messages in examples
+            for message in messages
+        ),
+        'tool_schema': count(
+            tool_payload(llm, build_tool(TriagemModel, profile))
+        ),
+    }
+    report['total'] = sum(report.values())
+    return report
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--k', type=int, default=0, help='exemplos few-shot (0 = todos)'
+    )
+    parser.add_argument(
+        '--exato',
+        action='store_true',
+        help='conta com o tokenizador do modelo (requer acesso à API)',
+    )
+    args = parser.parse_args(argv)
+
+    llm = get_llm()
+    count = llm.get_num_tokens if args.exato else approx_tokens
+
+    reports = {
+        profile: token_report(profile, args.k, count, llm)
+        for profile in PromptProfile
+    }
+    verbose = reports[PromptProfile.VERBOSE]
+
+    print(
+        f'{"componente":<12}'
+        + ''.join(f'{p:>10}' for p in reports)
+        + f'{"economia":>10}'
+    )
+    for component in verbose:
+        values = ''.join(f'{r[component]:>10}' for r in reports.values())
+        saving = 1 - reports[PromptProfile.COMPACT][component] / max(
+            verbose[component], 1
+        )
+        print(f'{component:<12}{values}{saving:>10.0%}')
+
+
+if __name__ == '__main__':
+    main()
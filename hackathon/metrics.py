@@ -0,0 +1,341 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+request_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    'request_timings', default=None
+)
+request_usage: ContextVar[dict[str, int] | None] = ContextVar(
+    'request_usage', default=None
+)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        f'{name}="{str(value).replace(chr(34), chr(39))}"'
+        for name, value in labels.items()
+    )
+    return f'{{{pairs}}}'
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def _samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for key, value in sorted(self._values.items()):
+            yield '', dict(zip(self.labels, key)), value
+
+    def render(self) -> str:
+        lines = [
+            f'# HELP {self.name} {self.help}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        with self._lock:
+            lines.extend(
+                f'{self.name}{suffix}{_format_labels(labels)} {value}'
+                for suffix, labels, value in self._samples()
+            )
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        if not labels:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * (len(self.buckets) + 1), 0.0)
+            )
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels: str) -> int:
+        counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return sum(counts)
+
+    def _samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for key, (counts, total) in sorted(self._values.items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                yield '_bucket', labels | {'le': str(bound)}, cumulative
+            yield '_sum', labels, total
+            yield '_count', labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(
+    Counter(
+        'http_requests_total',
+        'Requisições HTTP atendidas.',
+        ('method', 'route', 'status'),
+    )
+)
+HTTP_DURATION = REGISTRY.register(
+    Histogram(
+        'http_request_duration_seconds',
+        'Duração das requisições HTTP até o envio dos cabeçalhos.',
+        ('method', 'route'),
+    )
+)
+HTTP_IN_FLIGHT = REGISTRY.register(
+    Gauge('http_requests_in_flight', 'Requisições HTTP em andamento.')
+)
+STAGE_DURATION = REGISTRY.register(
+    Histogram(
+        'triagem_stage_duration_seconds',
+        'Duração de cada etapa da extração da triagem.',
+        ('stage',),
+    )
+)
+LLM_CALLS = REGISTRY.register(
+    Counter('llm_calls_total', 'Chamadas ao modelo de chat.')
+)
+LLM_ERRORS = REGISTRY.register(
+    Counter('llm_errors_total', 'Chamadas ao modelo de chat com erro.')
+)
+LLM_TOKENS = REGISTRY.register(
+    Counter(
+        'llm_tokens_total',
+        'Tokens informados pelo provedor do modelo de chat.',
+        ('kind',),
+    )
+)
+LLM_IN_FLIGHT = REGISTRY.register(
+    Gauge('llm_calls_in_flight', 'Chamadas ao modelo de chat em andamento.')
+)
+ROUTED_REQUESTS = REGISTRY.register(
+    Counter(
+        'llm_routed_requests_total',
+        'Extrações por modelo escolhido pelo roteador.',
+        ('model',),
+    )
+)
+HEDGED_REQUESTS = REGISTRY.register(
+    Counter(
+        'llm_hedged_requests_total',
+        'Extrações que dispararam a chamada secundária (hedge).',
+    )
+)
+COALESCED_REQUESTS = REGISTRY.register(
+    Counter(
+        'llm_coalesced_requests_total',
+        'Extrações atendidas por uma chamada ao LLM já em andamento.',
+    )
+)
+LLM_REPAIRS = REGISTRY.register(
+    Counter(
+        'llm_repairs_total',
+        'Reparos de campos inválidos, por resultado.',
+        ('result',),
+    )
+)
+LLM_REPAIR_TOKENS_SAVED = REGISTRY.register(
+    Counter(
+        'llm_repair_tokens_saved_total',
+        'Tokens estimados economizados pelos reparos frente a nova extração.',
+    )
+)
+LLM_REPAIR_SECONDS_SAVED = REGISTRY.register(
+    Counter(
+        'llm_repair_seconds_saved_total',
+        'Segundos economizados pelos reparos frente a nova extração.',
+    )
+)
+DICTATION_EXTRACTIONS = REGISTRY.register(
+    Counter(
+        'dictation_extractions_total',
+        'Extrações do ditado ao vivo, por fonte (regras ou LLM).',
+        ('source',),
+    )
+)
+CACHE_LOOKUPS = REGISTRY.register(
+    Counter(
+        'extraction_cache_lookups_total',
+        'Consultas ao cache de extrações.',
+        ('result',),
+    )
+)
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_DURATION.observe(seconds, stage=stage)
+
+    timings = request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def record_usage(usage: dict[str, int]):
+    totals = request_usage.get()
+    for kind in ('input_tokens', 'output_tokens'):
+        tokens = usage.get(kind, 0)
+        LLM_TOKENS.inc(tokens, kind=kind.removesuffix('_tokens'))
+        if totals is not None:
+            totals[kind] = totals.get(kind, 0) + tokens
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def server_timing(timings: dict[str, float]) -> str:
+    return ', '.join(
+        f'{stage};dur={seconds * 1000:.1f}'
+        for stage, seconds in timings.items()
+    )
+
+
+class StageTimer(BaseCallbackHandler):
+    """
+    Mede as etapas da cadeia do LangChain pelos callbacks: os runnables
+    com nome em `stages` (montagem dos exemplos e do prompt, parsing e
+    validação da saída) e cada chamada ao modelo de chat, que também
+    alimenta os contadores e o gauge de chamadas ao LLM e, quando o
+    provedor informa, o consumo de tokens.
+    """
+
+    run_inline = True
+
+    def __init__(self, stages: dict[str, str]):
+        self.stages = stages
+        self._starts: dict[UUID, tuple[str, float]] = {}
+
+    def _start(self, stage: str, run_id: UUID):
+        self._starts[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id: UUID):
+        if (started := self._starts.pop(run_id, None)) is not None:
+            stage, start = started
+            record_stage(stage, time.perf_counter() - start)
+
+    def on_chain_start(
+        self, serialized, inputs, *, run_id: UUID, **kwargs: Any
+    ):
+        if (stage := self.stages.get(kwargs.get('name') or '')) is not None:
+            self._start(stage, run_id)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id: UUID, **kwargs: Any
+    ):
+        LLM_CALLS.inc()
+        LLM_IN_FLIGHT.inc()
+        self._start('llm', run_id)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        LLM_IN_FLIGHT.dec()
+        self._end(run_id)
+
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, 'message', None)
+                usage = getattr(message, 'usage_metadata', None)
+                if usage:
+                    record_usage(usage)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any):
+        LLM_ERRORS.inc()
+        LLM_IN_FLIGHT.dec()
+        self._end(run_id)
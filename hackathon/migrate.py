@@ -0,0 +1,166 @@
+"""
+Atualiza um banco criado por uma versão anterior para o esquema atual.
+
+    python -m hackathon.migrate [--database-url URL]
+
+`create_all` só cria as tabelas que faltam, sem alterar as existentes.
+`upgrade_schema`, chamado por `create_db_engine` na inicialização,
+acrescenta às tabelas existentes as colunas e os índices novos (todas
+as colunas acrescentadas aceitam nulo) e recalcula as colunas derivadas
+do texto. As triagens antigas ficam marcadas como atendidas, para não
+entrarem na fila de atendimento.
+
+O esquema original (`sinais_vitais_id` na triagem e tabela de
+associação) nunca recebeu gravações; as suas tabelas são recriadas se
+estiverem vazias e, com dados, a migração para com um erro.
+"""
+
+import argparse
+
+from sqlalchemy import (
+    Engine,
+    MetaData,
+    create_engine,
+    func,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from hackathon.models import Base, SinaisVitaisOrm, TriagemOrm
+from hackathon.settings import get_settings
+
+LEGACY_TABLES = ('sinais_vitais_por_triagem_association',)
+LEGACY_COLUMNS = {'triagem': 'sinais_vitais_id'}
+
+
+class SchemaError(RuntimeError):
+    pass
+
+
+def _is_legacy(engine: Engine) -> bool:
+    inspector = inspect(engine)
+    if any(inspector.has_table(name) for name in LEGACY_TABLES):
+        return True
+    return any(
+        inspector.has_table(table)
+        and column in {c['name'] for c in inspector.get_columns(table)}
+        for table, column in LEGACY_COLUMNS.items()
+    )
+
+
+def _drop_legacy(engine: Engine):
+    inspector = inspect(engine)
+    names = [
+        *LEGACY_TABLES,
+        TriagemOrm.__tablename__,
+        SinaisVitaisOrm.__tablename__,
+    ]
+    metadata = MetaData()
+    metadata.reflect(engine, only=[n for n in names if inspector.has_table(n)])
+
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if connection.scalar(select(func.count()).select_from(table)):
+                raise SchemaError(
+                    f'A tabela {table.name} está no esquema original e '
+                    'tem dados; migre-a manualmente'
+                )
+        metadata.drop_all(connection)
+
+
+def _columns(engine: Engine, table: str) -> set[str]:
+    return {column['name'] for column in inspect(engine).get_columns(table)}
+
+
+def _add_columns(engine: Engine) -> dict[str, list[str]]:
+    preparer = engine.dialect.identifier_preparer
+    added = {}
+
+    for table in Base.metadata.sorted_tables:
+        existing = _columns(engine, table.name)
+        missing = [c for c in table.columns if c.name not in existing]
+
+        for column in missing:
+            if not column.nullable:
+                raise SchemaError(
+                    f'Coluna obrigatória ausente: {table.name}.{column.name}'
+                )
+            try:
+                with engine.begin() as connection:
+                    connection.execute(
+                        text(
+                            f'ALTER TABLE {preparer.format_table(table)} '
+                            f'ADD COLUMN {preparer.format_column(column)} '
+                            f'{column.type.compile(engine.dialect)}'
+                        )
+                    )
+            except DBAPIError:
+                # outro worker pode ter acabado de acrescentar a coluna
+                if column.name not in _columns(engine, table.name):
+                    raise
+
+        if missing:
+            added[table.name] = [column.name for column in missing]
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    return added
+
+
+def _backfill(engine: Engine, added: dict[str, list[str]]):
+    with Session(engine) as session:
+        if 'atendido_em' in added.get(TriagemOrm.__tablename__, []):
+            session.execute(
+                update(TriagemOrm).values(atendido_em=TriagemOrm.criado_em)
+            )
+
+        for orm in (TriagemOrm, SinaisVitaisOrm):
+            if orm.__tablename__ in added:
+                # as colunas derivadas são calculadas no `__post_init__`
+                for row in session.scalars(select(orm)):
+                    row.__post_init__()
+
+        session.commit()
+
+
+def upgrade_schema(engine: Engine) -> dict[str, list[str]]:
+    """
+    Cria as tabelas que faltam e acrescenta às existentes as colunas e
+    os índices novos. Retorna as colunas acrescentadas de cada tabela.
+    """
+    if _is_legacy(engine):
+        _drop_legacy(engine)
+
+    Base.metadata.create_all(bind=engine, checkfirst=True)
+
+    added = _add_columns(engine)
+    if added:
+        _backfill(engine, added)
+    return added
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--database-url', help='banco a migrar')
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url or get_settings().DATABASE_URL)
+    try:
+        added = upgrade_schema(engine)
+    finally:
+        engine.dispose()
+
+    for table, columns in added.items():
+        print(f'{table}: {", ".join(columns)}')
+    if not added:
+        print('Esquema atualizado')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,16 @@
+from datetime import date, datetime
+from typing import Optional
+
 from sqlalchemy import (
-    Column,
+    BigInteger,
     Date,
+    DateTime,
+    Float,
     ForeignKey,
+    Index,
     Integer,
     String,
-    Table,
+    Text,
 )
 from sqlalchemy.orm import (
     DeclarativeBase,
@@ -14,75 +20,179 @@ from sqlalchemy.orm import (
     relationship,
 )
 
+from hackathon.parsers import (
+    parse_date,
+    parse_float,
+    parse_int,
+    parse_pressao_arterial,
+)
+
 
 class Base(DeclarativeBase, MappedAsDataclass):
     pass
 
 
-sinais_vitais_por_triagem_association = Table(
-    'sinais_vitais_por_triagem_association',
-    Base.metadata,
-    Column(
-        'sinais_vitais_id', ForeignKey('sinais_vitais.id', ondelete='CASCADE')
-    ),
-    Column('triagem_id', ForeignKey('triagem.id', ondelete='CASCADE')),
-)
-
-
 class SinaisVitaisOrm(Base):
     __tablename__ = 'sinais_vitais'
 
     id: Mapped[int] = mapped_column(
-        Integer,
+        ForeignKey('triagem.id', ondelete='CASCADE'),
         init=False,
         primary_key=True,
-        index=True,
     )
 
-    pressao_arterial: Mapped[str] = mapped_column(String)
+    pressao_arterial: Mapped[Optional[str]] = mapped_column(
+        String, default=None
+    )
+
+    temperatura: Mapped[Optional[str]] = mapped_column(String, default=None)
+
+    frequencia_cardiaca: Mapped[Optional[str]] = mapped_column(
+        String, default=None
+    )
+
+    frequencia_respiratoria: Mapped[Optional[str]] = mapped_column(
+        String, default=None
+    )
+
+    saturacao_oxigenio: Mapped[Optional[str]] = mapped_column(
+        String, default=None
+    )
+
+    pressao_sistolica: Mapped[Optional[int]] = mapped_column(
+        Integer, init=False, default=None
+    )
+
+    pressao_diastolica: Mapped[Optional[int]] = mapped_column(
+        Integer, init=False, default=None
+    )
+
+    temperatura_celsius: Mapped[Optional[float]] = mapped_column(
+        Float, init=False, default=None
+    )
 
-    temperatura: Mapped[str] = mapped_column(String)
+    frequencia_cardiaca_bpm: Mapped[Optional[int]] = mapped_column(
+        Integer, init=False, default=None
+    )
 
-    frequencia_cardiaca: Mapped[str] = mapped_column(String)
+    frequencia_respiratoria_rpm: Mapped[Optional[int]] = mapped_column(
+        Integer, init=False, default=None
+    )
 
-    frequencia_respiratoria: Mapped[str] = mapped_column(String)
+    saturacao_oxigenio_pct: Mapped[Optional[int]] = mapped_column(
+        Integer, init=False, default=None
+    )
 
-    saturacao_oxigenio: Mapped[str] = mapped_column(String)
+    triagem: Mapped['TriagemOrm'] = relationship(
+        back_populates='sinais_vitais', init=False
+    )
 
-    triagem: Mapped[list['TriagemOrm']] = relationship(
-        secondary=sinais_vitais_por_triagem_association,
-        back_populates='sinais_vitais',
+    __table_args__ = (
+        Index('ix_sinais_vitais_saturacao', 'saturacao_oxigenio_pct', 'id'),
+        Index(
+            'ix_sinais_vitais_pressao',
+            'pressao_sistolica',
+            'pressao_diastolica',
+        ),
+        Index(
+            'ix_sinais_vitais_frequencias',
+            'frequencia_cardiaca_bpm',
+            'frequencia_respiratoria_rpm',
+        ),
     )
 
+    def __post_init__(self):
+        self.pressao_sistolica, self.pressao_diastolica = (
+            parse_pressao_arterial(self.pressao_arterial)
+        )
+        self.temperatura_celsius = parse_float(self.temperatura)
+        self.frequencia_cardiaca_bpm = parse_int(self.frequencia_cardiaca)
+        self.frequencia_respiratoria_rpm = parse_int(
+            self.frequencia_respiratoria
+        )
+        self.saturacao_oxigenio_pct = parse_int(self.saturacao_oxigenio)
+
 
 class TriagemOrm(Base):
     __tablename__ = 'triagem'
 
     id: Mapped[int] = mapped_column(
-        Integer, init=False, primary_key=True, index=True, autoincrement=True
+        BigInteger, primary_key=True, autoincrement=False
     )
 
-    sinais_vitais_id: Mapped[int] = mapped_column(
-        ForeignKey('sinais_vitais.id', use_alter=True),
+    sinais_vitais: Mapped[Optional[SinaisVitaisOrm]] = relationship(
+        back_populates='triagem',
+        cascade='all, delete-orphan',
+        lazy='selectin',
+        default=None,
     )
 
-    sinais_vitais: Mapped[list[SinaisVitaisOrm]] = relationship(
-        secondary=sinais_vitais_por_triagem_association,
-        back_populates='triagem',
+    inicio_sintoma: Mapped[Optional[str]] = mapped_column(String, default=None)
+
+    sintoma: Mapped[Optional[str]] = mapped_column(String, default=None)
+
+    sintoma_localizacao: Mapped[Optional[str]] = mapped_column(
+        String, default=None
+    )
+
+    sintomas_associados: Mapped[Optional[str]] = mapped_column(
+        String, default=None
+    )
+
+    historico_individual: Mapped[Optional[str]] = mapped_column(
+        String, default=None
     )
 
-    inicio_sintoma: Mapped[str] = mapped_column(Date)
+    historico_familiar: Mapped[Optional[str]] = mapped_column(
+        String, default=None
+    )
+
+    escala_dor: Mapped[Optional[str]] = mapped_column(String, default=None)
+
+    urgencia: Mapped[Optional[str]] = mapped_column(String, default=None)
 
-    sintoma: Mapped[str] = mapped_column(String)
+    criado_em: Mapped[datetime] = mapped_column(
+        DateTime, default_factory=datetime.now
+    )
+
+    inicio_sintoma_data: Mapped[Optional[date]] = mapped_column(
+        Date, init=False, default=None
+    )
+
+    escala_dor_nivel: Mapped[Optional[int]] = mapped_column(
+        Integer, init=False, default=None
+    )
+
+    urgencia_nivel: Mapped[Optional[int]] = mapped_column(
+        Integer, init=False, default=None
+    )
+
+    atendido_em: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, init=False, default=None
+    )
+
+    __table_args__ = (
+        Index('ix_triagem_urgencia_criado_em', 'urgencia_nivel', 'criado_em'),
+        Index(
+            'ix_triagem_escala_dor_urgencia',
+            'escala_dor_nivel',
+            'urgencia_nivel',
+        ),
+        Index('ix_triagem_inicio_sintoma', 'inicio_sintoma_data'),
+        Index('ix_triagem_atendido_em', 'atendido_em'),
+    )
 
-    sintoma_localizacao: Mapped[str] = mapped_column(String)
+    def __post_init__(self):
+        self.inicio_sintoma_data = parse_date(self.inicio_sintoma)
+        self.escala_dor_nivel = parse_int(self.escala_dor)
+        self.urgencia_nivel = parse_int(self.urgencia)
 
-    sintomas_associados: Mapped[str] = mapped_column(String)
 
-    historico_individual: Mapped[str] = mapped_column(String)
+class ExtracaoCacheOrm(Base):
+    __tablename__ = 'extracao_cache'
 
-    historico_familiar: Mapped[str] = mapped_column(String)
+    chave: Mapped[str] = mapped_column(String(64), primary_key=True)
 
-    escala_dor: Mapped[str] = mapped_column(String)
+    resultado: Mapped[str] = mapped_column(Text)
 
-    urgencia: Mapped[str] = mapped_column(String)
+    criado_em: Mapped[datetime] = mapped_column(DateTime)
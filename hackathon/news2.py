@@ -0,0 +1,157 @@
+"""
+Escore de alerta precoce no estilo NEWS2 a partir dos sinais vitais.
+
+Cada parâmetro soma de 0 a 3 pontos conforme a faixa em que cai; o
+total classifica o risco clínico (0-4 baixo, 5-6 médio, 7+ alto, com
+qualquer parâmetro isolado valendo 3 já indicando risco baixo-médio).
+O nível de consciência e o uso de oxigênio suplementar não constam da
+triagem e não entram na soma; parâmetros ausentes valem zero, e
+`parametros` informa quantos foram de fato avaliados.
+
+O cálculo é vetorizado: `news2_scores` recebe uma matriz com uma linha
+por triagem e pontua todas de uma vez, o que permite reavaliar o
+histórico inteiro em uma única passada.
+"""
+
+from enum import StrEnum
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from hackathon.models import SinaisVitaisOrm
+from hackathon.parsers import (
+    parse_float,
+    parse_int,
+    parse_pressao_arterial,
+)
+from hackathon.schemas import (
+    News2Item,
+    News2Model,
+    SinaisVitaisModel,
+    TriagemModel,
+    TriagemResposta,
+)
+
+# colunas da matriz de sinais vitais, na ordem usada pelas faixas
+COLUMNS = (
+    SinaisVitaisOrm.frequencia_respiratoria_rpm,
+    SinaisVitaisOrm.saturacao_oxigenio_pct,
+    SinaisVitaisOrm.temperatura_celsius,
+    SinaisVitaisOrm.pressao_sistolica,
+    SinaisVitaisOrm.frequencia_cardiaca_bpm,
+)
+
+# limites superiores (inclusivos) de cada faixa e os pontos de cada uma;
+# há sempre uma faixa a mais que limites, para os valores acima do último
+BANDS = (
+    ((8, 11, 20, 24), (3, 1, 0, 2, 3)),
+    ((91, 93, 95), (3, 2, 1, 0)),
+    ((35.0, 36.0, 38.0, 39.0), (3, 1, 0, 1, 2)),
+    ((90, 100, 110, 219), (3, 2, 1, 0, 3)),
+    ((40, 50, 90, 110, 130), (3, 1, 0, 1, 2, 3)),
+)
+
+MEDIO = 5
+ALTO = 7
+PONTUACAO_MAXIMA_PARAMETRO = 3
+
+
+class RiscoNews2(StrEnum):
+    BAIXO = 'baixo'
+    BAIXO_MEDIO = 'baixo-medio'
+    MEDIO = 'medio'
+    ALTO = 'alto'
+
+
+def news2_points(vitals: np.ndarray) -> np.ndarray:
+    """
+    Pontos de cada parâmetro para uma matriz `(n, 5)` de sinais vitais
+    (NaN onde o valor não foi informado), nas colunas de `COLUMNS`.
+    """
+    points = np.zeros(vitals.shape, dtype=np.int8)
+    for column, (limits, values) in enumerate(BANDS):
+        band = np.searchsorted(limits, vitals[:, column], side='left')
+        points[:, column] = np.asarray(values, dtype=np.int8)[band]
+    points[np.isnan(vitals)] = 0
+    return points
+
+
+def news2_scores(
+    vitals: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pontuação total, risco e parâmetros avaliados de cada linha."""
+    points = news2_points(vitals)
+    scores = points.sum(axis=1, dtype=np.int16)
+    risks = np.select(
+        [
+            scores >= ALTO,
+            scores >= MEDIO,
+            points.max(axis=1) >= PONTUACAO_MAXIMA_PARAMETRO,
+        ],
+        [RiscoNews2.ALTO, RiscoNews2.MEDIO, RiscoNews2.BAIXO_MEDIO],
+        default=RiscoNews2.BAIXO,
+    )
+    return scores, risks, (~np.isnan(vitals)).sum(axis=1)
+
+
+def news2(sinais_vitais: SinaisVitaisModel | None) -> News2Model:
+    sinais_vitais = sinais_vitais or SinaisVitaisModel()
+    vitals = np.array(
+        [
+            [
+                parse_int(sinais_vitais.frequencia_respiratoria),
+                parse_int(sinais_vitais.saturacao_oxigenio),
+                parse_float(sinais_vitais.temperatura),
+                parse_pressao_arterial(sinais_vitais.pressao_arterial)[0],
+                parse_int(sinais_vitais.frequencia_cardiaca),
+            ]
+        ],
+        dtype=np.float64,
+    )
+    [score], [risk], [count] = news2_scores(vitals)
+    return News2Model(
+        pontuacao=int(score), risco=str(risk), parametros=int(count)
+    )
+
+
+def load_vitals(session: Session) -> tuple[np.ndarray, np.ndarray]:
+    """Ids e matriz de sinais vitais de todas as triagens gravadas."""
+    # direto na conexão, sem a camada do ORM; e tuplas, pois o NumPy
+    # converte objetos `Row` item a item, dez vezes mais devagar
+    result = session.connection().execute(select(SinaisVitaisOrm.id, *COLUMNS))
+    rows = list(map(tuple, result))
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(COLUMNS)))
+
+    # None vira NaN na conversão para float; os ids cabem sem perda,
+    # pois o IdGenerator os mantém abaixo de 2**53
+    table = np.array(rows, dtype=np.float64)
+    return table[:, 0].astype(np.int64), table[:, 1:]
+
+
+def triagem_resposta(triagem: TriagemModel) -> TriagemResposta:
+    return TriagemResposta.model_validate(
+        triagem.model_dump() | {'news2': news2(triagem.sinais_vitais)}
+    )
+
+
+def rescore(session: Session, minimo: int, limite: int) -> list[News2Item]:
+    """
+    Reavalia todas as triagens gravadas e devolve as de pontuação igual
+    ou maior que `minimo`, da maior para a menor.
+    """
+    ids, vitals = load_vitals(session)
+    scores, risks, counts = news2_scores(vitals)
+
+    selected = np.flatnonzero(scores >= minimo)
+    selected = selected[np.argsort(-scores[selected], kind='stable')][:limite]
+    return [
+        News2Item(
+            triagem_id=int(ids[i]),
+            pontuacao=int(scores[i]),
+            risco=str(risks[i]),
+            parametros=int(counts[i]),
+        )
+        for i in selected
+    ]
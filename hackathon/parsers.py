@@ -0,0 +1,40 @@
+import re
+from datetime import date, datetime
+
+INT_PATTERN = re.compile(r'\d+')
+FLOAT_PATTERN = re.compile(r'\d+(?:[.,]\d+)?')
+PRESSAO_PATTERN = re.compile(r'(\d{2,3})\s*[/xX]\s*(\d{2,3})')
+DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%Y')
+
+
+def parse_int(value: str | None) -> int | None:
+    if value and (match := INT_PATTERN.search(value)):
+        return int(match[0])
+    return None
+
+
+def parse_float(value: str | None) -> float | None:
+    if value and (match := FLOAT_PATTERN.search(value)):
+        return float(match[0].replace(',', '.'))
+    return None
+
+
+def parse_pressao_arterial(
+    value: str | None,
+) -> tuple[int | None, int | None]:
+    if value and (match := PRESSAO_PATTERN.search(value)):
+        return int(match[1]), int(match[2])
+    return None, None
+
+
+def parse_date(value: str | None) -> date | None:
+    if not value:
+        return None
+
+    value = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, create_model
 
 
 class ModelConfig(BaseModel):
@@ -190,3 +191,95 @@ class TriagemModel(ModelConfig):
         imediata, enquanto 0 indica uma situação sem urgência. Exemplo:
         '10' é uma emergência médica. Deve ser transformado em número""",
     )
+
+
+class News2Model(BaseModel):
+    """
+    Escore de alerta precoce (estilo NEWS2) calculado localmente a
+    partir dos sinais vitais, sem chamar o LLM. `risco` é `baixo`,
+    `baixo-medio`, `medio` ou `alto`; `parametros` diz quantos dos cinco
+    sinais vitais pontuados estavam disponíveis.
+    """
+
+    pontuacao: int
+    risco: str
+    parametros: int
+
+
+class News2Item(News2Model):
+    triagem_id: int
+
+
+class TriagemResposta(TriagemModel):
+    """
+    Triagem devolvida pela API: os campos extraídos, com a `urgencia`
+    estimada pelo LLM, e o escore `news2` calculado dos sinais vitais.
+    """
+
+    news2: Optional[News2Model] = None
+
+
+TriagemTextoModel = create_model(
+    'TriagemTextoModel',
+    __base__=ModelConfig,
+    __doc__="""
+    Campos de texto livre da triagem, sem os sinais vitais. Usado na
+    extração híbrida, em que os sinais vitais são obtidos por regras e
+    apenas estes campos são pedidos ao LLM.
+    """,
+    **{
+        name: (field.annotation, field)
+        for name, field in TriagemModel.model_fields.items()
+        if name not in {'id', 'sinais_vitais'}
+    },
+)
+
+
+class TriagemBatchItem(BaseModel):
+    """
+    Resultado de uma nota dentro de uma extração em lote. Quando a
+    extração da nota falha, `triagem` é None e `erro` descreve a falha,
+    sem afetar as demais notas do lote.
+    """
+
+    triagem: Optional[TriagemModel] = None
+    erro: Optional[str] = None
+
+
+class FilaItem(BaseModel):
+    """
+    Paciente aguardando atendimento na fila de prioridade. `urgencia` é
+    None quando a triagem não trouxe uma urgência numérica; esses
+    pacientes ficam no fim da fila, por ordem de chegada.
+    """
+
+    triagem_id: int
+    urgencia: Optional[int] = None
+    chegada: datetime
+
+
+class JobModel(BaseModel):
+    """
+    Extração assíncrona enviada para a fila de jobs. `status` é
+    `pendente`, `processando`, `concluido` ou `erro`; a `triagem` só é
+    preenchida quando o job é concluído, mas o `news2`, calculado dos
+    sinais vitais extraídos por regras, já vem na criação do job.
+    """
+
+    id: str
+    status: str
+    news2: Optional[News2Model] = None
+    triagem: Optional[TriagemModel] = None
+    erro: Optional[str] = None
+
+
+class DitadoDelta(BaseModel):
+    """
+    Alteração no texto do ditado ao vivo: o trecho `[inicio, fim)` do
+    texto atual é substituído por `texto` (inserção quando `inicio` e
+    `fim` são iguais, remoção quando `texto` é vazio).
+    """
+
+    inicio: int = Field(ge=0)
+    fim: int = Field(ge=0)
+    texto: str = ''
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic import SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -8,12 +10,64 @@ class Settings(BaseSettings):
     )
 
     DATABASE_URL: str
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30.0
+    DATABASE_POOL_RECYCLE: int = 1800
+    DATABASE_POOL_PRE_PING: bool = True
     LANGCHAIN_TRACING_V2: bool
     LANGCHAIN_ENDPOINT: str
     LANGCHAIN_API_KEY: SecretStr
     LANGCHAIN_PROJECT: str
     COHERE_API_KEY: SecretStr
 
+    LLM_PROVIDER: str = 'cohere'
+    LLM_MODEL: str = 'command-r-plus'
+    LLM_TIERS: dict[str, int] = {}
+    LLM_HEDGE_DELAY: float = 0.0
+    FAKE_LLM_LATENCY: float = 0.0
+    FAKE_LLM_JITTER: float = 0.0
+    LLM_CASSETTE: str | None = None
+    LLM_CASSETTE_MODE: str = 'record'
+
+    LLM_MAX_CONCURRENCY: int = 64
+    LLM_QUEUE_TIMEOUT: float = 0.5
+    LLM_TIMEOUT: float = 30.0
+    LLM_BATCH_CONCURRENCY: int = 8
+    LLM_BATCH_MAX_SIZE: int = 100
+    LLM_SEGMENT_MAX_WORDS: int = 200
+    LLM_REPAIR: bool = True
+    LLM_REPAIR_REQUIRED: list[str] = []
+
+    EXTRACTION_MODE: str = 'llm'
+    FEW_SHOT_K: int = 0
+    PROMPT_PROFILE: str = 'verbose'
+
+    JOB_WORKERS: int = 8
+    JOB_QUEUE_SIZE: int = 100
+    JOB_TTL: float = 600.0
+    JOB_MAX_WAIT: float = 30.0
+
+    DICTATION_DEBOUNCE: float = 0.4
+    DICTATION_MIN_CHANGE: int = 6
+    DICTATION_MIN_CHANGE_RATIO: float = 0.2
+    DICTATION_LLM_INTERVAL: float = 2.0
+    DICTATION_MAX_CHARS: int = 20000
+
+    WRITER_BATCH_SIZE: int = 100
+    WRITER_FLUSH_INTERVAL: float = 0.5
+    WRITER_RETRIES: int = 3
+    WRITER_RETRY_BACKOFF: float = 0.2
+    # nó dos IDs gerados (0 a 1023), único por processo; sem ele, aleatório
+    WRITER_NODE: int | None = None
+
+    CACHE_MAXSIZE: int = 1024
+    CACHE_TTL: float = 3600.0
+    CACHE_PERSISTENT: bool = False
+
+    METRICS_SERVER_TIMING: bool = False
+
 
+@lru_cache
 def get_settings():
     return Settings()  # type: ignore
@@ -0,0 +1,253 @@
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+from fastapi import Request
+from sqlalchemy import Engine, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from hackathon.fila import FilaPrioridade
+from hackathon.models import SinaisVitaisOrm, TriagemOrm
+from hackathon.parsers import parse_int
+from hackathon.schemas import TriagemModel
+from hackathon.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(2024, 1, 1).timestamp()
+NODE_BITS = 10
+SEQUENCE_BITS = 11
+
+
+class IdGenerator:
+    """
+    Gera IDs inteiros únicos sem consultar o banco, para que a resposta
+    já traga o ID antes da gravação: segundos desde 2024 (32 bits), o
+    nó do processo (10 bits) e uma sequência por segundo (11 bits). O
+    total cabe em 53 bits, preservando a precisão em JavaScript.
+
+    Dois processos com o mesmo nó podem gerar o mesmo ID: em produção,
+    configure um nó diferente para cada processo (`WRITER_NODE`). Sem
+    ele, o nó é sorteado, o que evita as colisões do PID truncado entre
+    contêineres, mas não as elimina.
+    """
+
+    def __init__(self, node: int | None = None):
+        if node is None:
+            node = random.getrandbits(NODE_BITS)
+        elif not 0 <= node < (1 << NODE_BITS):
+            raise ValueError(f'Nó fora do intervalo 0-{(1 << NODE_BITS) - 1}')
+        self.node = node
+        self._second = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> int:
+        with self._lock:
+            second = int(time.time() - EPOCH)
+
+            if second > self._second:
+                self._second = second
+                self._sequence = 0
+            elif self._sequence >= (1 << SEQUENCE_BITS) - 1:
+                # sequência esgotada: usa o próximo segundo
+                self._second += 1
+                self._sequence = 0
+            else:
+                self._sequence += 1
+
+            return (
+                (self._second << (NODE_BITS + SEQUENCE_BITS))
+                | (self.node << SEQUENCE_BITS)
+                | self._sequence
+            )
+
+
+def to_orm(
+    triagem: TriagemModel,
+    criado_em: datetime | None = None,
+    atendido_em: datetime | None = None,
+) -> TriagemOrm:
+    sinais_vitais = None
+    if triagem.sinais_vitais is not None:
+        sinais_vitais = SinaisVitaisOrm(
+            **triagem.sinais_vitais.model_dump(exclude={'id'})
+        )
+
+    orm = TriagemOrm(
+        id=triagem.id,  # type: ignore
+        sinais_vitais=sinais_vitais,
+        **triagem.model_dump(exclude={'id', 'sinais_vitais'}),
+    )
+    if criado_em is not None:
+        orm.criado_em = criado_em
+    orm.atendido_em = atendido_em
+    return orm
+
+
+class TriagemWriter:
+    """
+    Fila de gravação em segundo plano (write-behind) das triagens.
+    `submit` atribui o ID e retorna na hora; uma thread agrupa as
+    triagens e grava cada lote em uma única transação quando a fila
+    alcança `batch_size` itens ou após `flush_interval` segundos.
+    Atualizações (`update`) passam pela mesma fila, então sempre são
+    aplicadas depois da gravação da triagem a que se referem.
+
+    Um lote que falha por erro operacional do banco (conexão, bloqueio)
+    é repetido até `retries` vezes, com espera crescente; se ainda
+    falhar, os itens são gravados um a um, e só os que falharem sozinhos
+    são descartados (e contados em `failed`).
+
+    Com `atendidas`, as triagens são gravadas como já atendidas na
+    chegada, fora da fila de atendimento: é o caso da carga em massa de
+    notas antigas.
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        engine: Engine,
+        batch_size: int | None = None,
+        flush_interval: float | None = None,
+        fila: FilaPrioridade | None = None,
+        retries: int | None = None,
+        retry_backoff: float | None = None,
+        atendidas: bool = False,
+    ):
+        settings = get_settings()
+        self.engine = engine
+        self.batch_size = batch_size or settings.WRITER_BATCH_SIZE
+        self.flush_interval = (
+            settings.WRITER_FLUSH_INTERVAL
+            if flush_interval is None
+            else flush_interval
+        )
+        self.fila = fila
+        self.retries = settings.WRITER_RETRIES if retries is None else retries
+        self.retry_backoff = (
+            settings.WRITER_RETRY_BACKOFF
+            if retry_backoff is None
+            else retry_backoff
+        )
+        self.atendidas = atendidas
+        self.failed = 0
+        self.next_id = IdGenerator(settings.WRITER_NODE)
+        self._queue: queue.Queue[tuple | None] = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name='triagem-writer', daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def submit(self, triagem: TriagemModel) -> int:
+        triagem.id = self.next_id()
+        if triagem.sinais_vitais is not None:
+            triagem.sinais_vitais.id = triagem.id
+
+        criado_em = datetime.now()
+        self._queue.put((triagem.model_copy(deep=True), criado_em))
+
+        if self.fila is not None and not self.atendidas:
+            self.fila.push(triagem.id, parse_int(triagem.urgencia), criado_em)
+
+        return triagem.id
+
+    def update(self, triagem_id: int, **values):
+        self._queue.put((triagem_id, values))
+
+    def _run(self):
+        running = True
+
+        while running:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(
+                        timeout=max(deadline - time.monotonic(), 0)
+                    )
+                except queue.Empty:
+                    break
+
+                if item is None:
+                    running = False
+                    self._queue.task_done()
+                    break
+
+                batch.append(item)
+
+            if batch:
+                self.flush(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def drain(self):
+        """Bloqueia até que tudo o que foi enviado tenha sido gravado."""
+        self._queue.join()
+
+    def flush(self, batch: list[tuple]):
+        try:
+            self._write(batch, self.retries)
+        except Exception:
+            if len(batch) == 1:
+                self.failed += 1
+                logger.exception('Falha ao gravar o item %r', batch[0][0])
+                return
+
+            # isola o item com problema sem perder o restante do lote
+            logger.warning(
+                'Falha ao gravar %d itens; gravando um a um',
+                len(batch),
+                exc_info=True,
+            )
+            for item in batch:
+                try:
+                    self._write([item])
+                except Exception:
+                    self.failed += 1
+                    logger.exception('Falha ao gravar o item %r', item[0])
+
+    def _write(self, batch: list[tuple], retries: int = 0):
+        for attempt in range(retries + 1):
+            try:
+                with Session(self.engine) as session:
+                    session.add_all([
+                        to_orm(
+                            item,
+                            criado_em,
+                            criado_em if self.atendidas else None,
+                        )
+                        for item, criado_em in batch
+                        if isinstance(item, TriagemModel)
+                    ])
+                    session.flush()
+
+                    for item, values in batch:
+                        if not isinstance(item, TriagemModel):
+                            session.execute(
+                                update(TriagemOrm)
+                                .where(TriagemOrm.id == item)
+                                .values(**values)
+                            )
+
+                    session.commit()
+                return
+            except OperationalError:
+                # conexão perdida ou banco bloqueado: vale tentar de novo
+                if attempt == retries:
+                    raise
+                time.sleep(self.retry_backoff * 2**attempt)
+
+
+def get_writer(request: Request) -> TriagemWriter:
+    return request.app.state.writer
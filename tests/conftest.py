@@ -1,3 +1,5 @@
+import os
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import StaticPool, create_engine
@@ -6,6 +8,21 @@ from sqlalchemy.orm import Session
 from hackathon.app import app
 from hackathon.db import get_session
 from hackathon.models import Base
+from hackathon.settings import get_settings
+
+# configuração mínima para os testes rodarem sem `.env`; variáveis já
+# definidas no ambiente têm precedência. Sem `DATABASE_URL` no ambiente,
+# cada `client` sobe o app com um banco próprio, em `tmp_path`
+DATABASE_URL_NO_AMBIENTE = 'DATABASE_URL' in os.environ
+for name, value in {
+    'DATABASE_URL': 'sqlite://',
+    'LANGCHAIN_TRACING_V2': 'false',
+    'LANGCHAIN_ENDPOINT': 'http://localhost',
+    'LANGCHAIN_API_KEY': 'teste',
+    'LANGCHAIN_PROJECT': 'teste',
+    'COHERE_API_KEY': 'teste',
+}.items():
+    os.environ.setdefault(name, value)
 
 
 @pytest.fixture
@@ -30,12 +47,17 @@ def session(engine):
 
 
 @pytest.fixture
-def client(session):
+def client(session, tmp_path, monkeypatch):
     def get_session_override():
         return session
 
+    if not DATABASE_URL_NO_AMBIENTE:
+        monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path}/app.db')
+    get_settings.cache_clear()
+
     with TestClient(app) as client:
         app.dependency_overrides[get_session] = get_session_override
         yield client
 
     app.dependency_overrides.clear()
+    get_settings.cache_clear()
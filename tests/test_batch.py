@@ -0,0 +1,77 @@
+import asyncio
+from http import HTTPStatus
+
+from hackathon.llm.chain import LLMLimiter, TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+from hackathon.settings import get_settings
+
+URL = '/api/v1/triagem/batch'
+
+
+class FalhaChatModel(FakeTriagemChatModel):
+    """Falha nas notas com 'falha' e conta as chamadas simultâneas."""
+
+    active: int = 0
+    peak: int = 0
+
+    async def _agenerate(self, messages, *args, **kwargs):
+        if 'falha' in str(messages[-1].content):
+            raise ValueError('resposta inválida')
+
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.05)
+            return await super()._agenerate(messages, *args, **kwargs)
+        finally:
+            self.active -= 1
+
+
+def test_lote_traz_erro_por_item(client):
+    client.app.state.pipeline = TriagemPipeline(FalhaChatModel())
+
+    response = client.post(
+        URL,
+        json=[
+            {'triagem_text': 'PA 120/80 mmHg, dor de cabeça'},
+            {'triagem_text': 'nota com falha'},
+            {'triagem_text': 'FC 90 bpm, tontura'},
+        ],
+    )
+    items = response.json()
+
+    assert response.status_code == HTTPStatus.OK
+    assert items[0]['triagem']['sinais_vitais']['pressao_arterial'] == (
+        '120/80 mmHg'
+    )
+    assert items[0]['triagem']['id'] is not None
+    assert items[1] == {
+        'triagem': None,
+        'erro': 'ValueError: resposta inválida',
+    }
+    assert items[2]['triagem']['sinais_vitais']['frequencia_cardiaca'] == (
+        '90 bpm'
+    )
+
+
+def test_concorrencia_do_lote_limitada_pelo_limiter(client):
+    llm = FalhaChatModel()
+    client.app.state.pipeline = TriagemPipeline(
+        llm, limiter=LLMLimiter(max_concurrency=2, queue_timeout=5)
+    )
+
+    response = client.post(
+        f'{URL}?concorrencia=50',
+        json=[{'triagem_text': f'dor de cabeça {i}'} for i in range(6)],
+    )
+
+    assert all(item['erro'] is None for item in response.json())
+    assert llm.peak == 2  # noqa: PLR2004
+
+
+def test_lote_maior_que_o_limite_responde_422(client):
+    tamanho = get_settings().LLM_BATCH_MAX_SIZE + 1
+
+    response = client.post(URL, json=[{'triagem_text': 'x'}] * tamanho)
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
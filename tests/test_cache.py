@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from hackathon.db import create_db_engine
+from hackathon.llm.cache import ExtractionCache, make_key
+from hackathon.models import ExtracaoCacheOrm
+from hackathon.schemas import TriagemModel
+
+
+def test_make_key_normaliza_espacos():
+    assert make_key('dor  no\n   peito ', 'v1') == make_key(
+        'dor no peito', 'v1'
+    )
+    assert make_key('dor no peito', 'v1') != make_key('dor no peito', 'v2')
+
+
+def test_cache_lru_descarta_entrada_menos_usada():
+    cache = ExtractionCache(maxsize=2, ttl=60)
+
+    cache.set('a', TriagemModel(urgencia='1'))
+    cache.set('b', TriagemModel(urgencia='2'))
+    cache.get('a')
+    cache.set('c', TriagemModel(urgencia='3'))
+
+    assert cache.get('b') is None
+    assert cache.get('a').urgencia == '1'  # type: ignore
+    assert cache.stats()['hits'] == 2  # noqa: PLR2004
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_expira_pelo_ttl():
+    cache = ExtractionCache(maxsize=2, ttl=-1)
+
+    cache.set('a', TriagemModel(urgencia='1'))
+
+    assert cache.get('a') is None
+
+
+def test_cache_persistente_sobrevive_a_nova_instancia(engine, session):
+    ExtractionCache(maxsize=2, ttl=60, engine=engine).set(
+        'a', TriagemModel(urgencia='9')
+    )
+
+    cache = ExtractionCache(maxsize=2, ttl=60, engine=engine)
+
+    assert cache.get('a').urgencia == '9'  # type: ignore
+    assert cache.stats()['tamanho'] == 1
+
+
+def test_cache_persistente_aceita_gravacoes_concorrentes(tmp_path):
+    engine = create_db_engine(f'sqlite:///{tmp_path / "cache.db"}')
+    # dois workers com o mesmo banco
+    caches = [ExtractionCache(maxsize=2, ttl=60, engine=engine) for _ in '12']
+
+    with ThreadPoolExecutor(8) as executor:
+        list(
+            executor.map(
+                lambda i: caches[i % 2].set(
+                    'a', TriagemModel(urgencia=str(i))
+                ),
+                range(40),
+            )
+        )
+
+    with Session(engine) as session:
+        assert session.scalar(select(func.count(ExtracaoCacheOrm.chave))) == 1
+    engine.dispose()
+
+
+def test_cache_persistente_nao_falha_com_erro_do_banco(tmp_path):
+    # banco sem a tabela `extracao_cache`
+    engine = create_engine(f'sqlite:///{tmp_path / "vazio.db"}')
+    cache = ExtractionCache(maxsize=2, ttl=60, engine=engine)
+
+    cache.set('a', TriagemModel(urgencia='9'))
+
+    assert cache.get('b') is None
+    engine.dispose()
+
+
+def test_cache_persistente_apaga_entradas_vencidas(engine, session):
+    session.add(
+        ExtracaoCacheOrm(
+            chave='velha',
+            resultado=TriagemModel().model_dump_json(),
+            criado_em=datetime.now() - timedelta(hours=2),
+        )
+    )
+    session.commit()
+
+    ExtractionCache(maxsize=2, ttl=3600, engine=engine).set(
+        'nova', TriagemModel(urgencia='1')
+    )
+
+    assert session.scalars(select(ExtracaoCacheOrm.chave)).all() == ['nova']
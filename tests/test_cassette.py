@@ -0,0 +1,61 @@
+import pytest
+
+from hackathon.llm.cassette import (
+    Cassette,
+    CassetteChatModel,
+    CassetteMissError,
+    CassetteMode,
+)
+from hackathon.llm.chain import TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+
+TEXTO = 'Paciente com tontura, FC 110 bpm, PA 150/95 mmHg'
+OUTRA_RESPOSTA = {'sintoma': 'outra resposta'}
+
+
+def pipeline(path, mode, llm=None):
+    llm = CassetteChatModel(
+        llm=llm or FakeTriagemChatModel(),
+        cassette=Cassette(path),
+        mode=mode,
+    )
+    return TriagemPipeline(llm, few_shot_k=2)
+
+
+def test_cassette_grava_e_reproduz(tmp_path):
+    path = tmp_path / 'cassete.jsonl'
+    gravada = pipeline(path, CassetteMode.RECORD).invoke(TEXTO)
+    assert path.exists()
+
+    # os exemplos few-shot ganham ids novos, e a chave continua a mesma
+    reproduzida = pipeline(
+        path,
+        CassetteMode.REPLAY,
+        FakeTriagemChatModel(response=OUTRA_RESPOSTA),
+    ).invoke(TEXTO)
+    assert reproduzida == gravada
+
+
+def test_cassette_grava_e_reproduz_stream(tmp_path):
+    path = tmp_path / 'cassete.jsonl'
+    gravada = list(pipeline(path, CassetteMode.RECORD).stream(TEXTO))
+
+    reproduzida = list(pipeline(path, CassetteMode.REPLAY).stream(TEXTO))
+    assert reproduzida[-1] == gravada[-1]
+
+
+def test_cassette_replay_sem_gravacao_falha(tmp_path):
+    replay = pipeline(tmp_path / 'cassete.jsonl', CassetteMode.REPLAY)
+
+    with pytest.raises(CassetteMissError):
+        replay.invoke(TEXTO)
+
+
+def test_cassette_passthrough_nao_grava(tmp_path):
+    path = tmp_path / 'cassete.jsonl'
+    llm = FakeTriagemChatModel(response=OUTRA_RESPOSTA)
+
+    triagem = pipeline(path, CassetteMode.PASSTHROUGH, llm).invoke(TEXTO)
+
+    assert triagem.sintoma == OUTRA_RESPOSTA['sintoma']
+    assert not path.exists()
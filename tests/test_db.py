@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from hackathon.db import (
+    async_database_url,
+    create_async_db_engine,
+    create_db_engine,
+    get_async_engine,
+    pool_options,
+)
+from hackathon.migrate import SchemaError, upgrade_schema
+from hackathon.models import TriagemOrm
+from hackathon.schemas import SinaisVitaisModel, TriagemModel
+from hackathon.writer import to_orm
+
+
+def test_async_database_url_troca_o_driver():
+    assert str(async_database_url('sqlite:////tmp/banco.db')) == (
+        'sqlite+aiosqlite:////tmp/banco.db'
+    )
+    assert str(
+        async_database_url('postgresql+psycopg2://u:s@host/banco')
+    ).startswith('postgresql+asyncpg://u:')
+
+
+def test_pool_options_ignora_sqlite_em_memoria():
+    assert pool_options('sqlite://') == {}
+    assert pool_options('sqlite:///:memory:') == {}
+    assert pool_options('sqlite:////tmp/banco.db')['pool_pre_ping'] is True
+
+
+def test_engine_assincrono_grava_e_le_o_mesmo_banco(tmp_path):
+    url = f'sqlite:///{tmp_path / "banco.db"}'
+    engine = create_db_engine(url)
+    triagem = TriagemModel(
+        id=1,
+        sintoma='febre',
+        urgencia='7',
+        sinais_vitais=SinaisVitaisModel(temperatura='38.5°C'),
+    )
+
+    async def gravar():
+        async_engine = create_async_db_engine(url)
+        try:
+            async with AsyncSession(
+                async_engine, expire_on_commit=False
+            ) as session:
+                session.add(to_orm(triagem))
+                await session.commit()
+                lida = await session.get(TriagemOrm, 1)
+                # o relacionamento é carregado no próprio `get` (selectin)
+                return lida.sintoma, lida.sinais_vitais.temperatura_celsius
+        finally:
+            await async_engine.dispose()
+
+    assert asyncio.run(gravar()) == ('febre', 38.5)  # noqa: PLR2004
+    with Session(engine) as session:
+        assert session.get(TriagemOrm, 1).urgencia_nivel == 7  # noqa: PLR2004
+    engine.dispose()
+
+
+def test_upgrade_schema_acrescenta_colunas_e_preenche_as_derivadas(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "antigo.db"}')
+    with engine.begin() as connection:
+        # tabela como gravada antes das colunas numéricas e da fila
+        connection.execute(
+            text(
+                'CREATE TABLE triagem (id BIGINT PRIMARY KEY, '
+                'urgencia VARCHAR, escala_dor VARCHAR, criado_em DATETIME)'
+            )
+        )
+        connection.execute(
+            text(
+                'INSERT INTO triagem VALUES '
+                "(1, '8', '6', '2024-11-10 08:00:00')"
+            )
+        )
+
+    added = upgrade_schema(engine)
+
+    assert {'urgencia_nivel', 'atendido_em'} <= set(added['triagem'])
+    with Session(engine) as session:
+        triagem = session.get(TriagemOrm, 1)
+        assert triagem.urgencia_nivel == 8  # noqa: PLR2004
+        assert triagem.atendido_em == triagem.criado_em
+    assert upgrade_schema(engine) == {}
+    engine.dispose()
+
+
+def test_upgrade_schema_recria_tabelas_vazias_do_esquema_original(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "original.db"}')
+    with engine.begin() as connection:
+        connection.execute(
+            text('CREATE TABLE triagem (id INTEGER, sinais_vitais_id INTEGER)')
+        )
+        connection.execute(text('INSERT INTO triagem VALUES (1, 1)'))
+
+    with pytest.raises(SchemaError):
+        upgrade_schema(engine)
+
+    with engine.begin() as connection:
+        connection.execute(text('DELETE FROM triagem'))
+    upgrade_schema(engine)
+
+    assert 'sinais_vitais_id' not in {
+        column['name'] for column in inspect(engine).get_columns('triagem')
+    }
+    engine.dispose()
+
+
+def test_engine_assincrono_criado_no_primeiro_uso(client):
+    app = client.app
+
+    assert app.state.async_engine is None
+
+    engine = get_async_engine(app)
+
+    assert get_async_engine(app) is engine
+    assert engine.dialect.driver == 'aiosqlite'
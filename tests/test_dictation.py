@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+import pytest
+
+from hackathon.dictation import DictationSession
+from hackathon.llm.cache import ExtractionCache
+from hackathon.llm.chain import TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+from hackathon.llm.rules import ExtractionMode
+from hackathon.metrics import DICTATION_EXTRACTIONS
+from hackathon.schemas import DitadoDelta
+from hackathon.settings import get_settings
+
+SINTOMA = {'sintoma': 'dor de cabeça'}
+
+
+def test_dictation_aplica_deltas_e_reaproveita_frases():
+    session = DictationSession(TriagemPipeline(FakeTriagemChatModel()))
+
+    session.apply(DitadoDelta(inicio=0, fim=0, texto='PA 150/90 mmHg. FC 90'))
+    session.extract_local()
+    frase = session.sentences['PA 150/90 mmHg.']
+
+    session.apply(DitadoDelta(inicio=19, fim=21, texto='120 bpm'))
+    triagem = session.extract_local()
+
+    assert session.text == 'PA 150/90 mmHg. FC 120 bpm'
+    assert session.sentences['PA 150/90 mmHg.'] is frase
+    assert triagem.sinais_vitais.frequencia_cardiaca == '120 bpm'  # type: ignore
+
+    with pytest.raises(ValueError, match='fora do texto'):
+        session.apply(DitadoDelta(inicio=0, fim=100))
+
+
+def test_dictation_websocket_chama_llm_so_com_mudanca_relevante(client):
+    client.app.state.pipeline = TriagemPipeline(
+        FakeTriagemChatModel(response=SINTOMA)
+    )
+    debounce = get_settings().DICTATION_DEBOUNCE
+    llm_calls = DICTATION_EXTRACTIONS.value(source='llm')
+
+    with client.websocket_connect('/api/v1/triagem/ditado') as websocket:
+        # vários deltas dentro do debounce geram uma única atualização
+        for inicio, texto in [
+            (0, 'PA 150/90 '),
+            (10, 'mmHg. '),
+            (16, 'FC 120 bpm.'),
+        ]:
+            websocket.send_json({
+                'inicio': inicio,
+                'fim': inicio,
+                'texto': texto,
+            })
+
+        message = websocket.receive_json()
+        assert message['fonte'] == 'regras'
+        assert message['triagem']['sinais_vitais']['frequencia_cardiaca'] == (
+            '120 bpm'
+        )
+        assert message['news2']['pontuacao'] == 2  # noqa: PLR2004
+        assert DICTATION_EXTRACTIONS.value(source='llm') == llm_calls
+
+        texto = ' Paciente com dor de cabeça intensa desde ontem à noite'
+        websocket.send_json({'inicio': 27, 'fim': 27, 'texto': texto})
+
+        message = websocket.receive_json()
+        assert message['fonte'] == 'llm'
+        assert message['triagem']['sintoma'] == SINTOMA['sintoma']
+        assert message['triagem']['sinais_vitais']['pressao_arterial'] == (
+            '150/90 mmHg'
+        )
+
+        # uma palavra a mais não justifica outra chamada ao LLM
+        fim = 27 + len(texto)
+        websocket.send_json({'inicio': fim, 'fim': fim, 'texto': ' hoje'})
+        time.sleep(debounce + 0.3)
+        assert DICTATION_EXTRACTIONS.value(source='llm') == llm_calls + 1
+
+
+class FakeWebSocket:
+    async def send_json(self, message):
+        pass
+
+
+def test_dictation_espaca_chamadas_ao_llm_sem_gravar_no_cache():
+    pipeline = TriagemPipeline(
+        FakeTriagemChatModel(response=SINTOMA),
+        cache=ExtractionCache(maxsize=8, ttl=60),
+    )
+    session = DictationSession(pipeline, min_change=2, llm_interval=0.3)
+    chamadas = []
+    ainvoke = pipeline.ainvoke
+
+    async def ainvoke_medido(*args, **kwargs):
+        chamadas.append(asyncio.get_running_loop().time())
+        return await ainvoke(*args, **kwargs)
+
+    pipeline.ainvoke = ainvoke_medido
+
+    async def ditar():
+        for texto in [
+            'Dor de cabeça forte.',
+            ' Náusea e tontura desde ontem.',
+        ]:
+            session.apply(
+                DitadoDelta(
+                    inicio=len(session.text),
+                    fim=len(session.text),
+                    texto=texto,
+                )
+            )
+            await session.refresh(FakeWebSocket())
+            await session._llm_task
+
+    asyncio.run(ditar())
+
+    assert len(chamadas) == 2  # noqa: PLR2004
+    assert chamadas[1] - chamadas[0] >= 0.3  # noqa: PLR2004
+    assert (
+        pipeline.cache.get(pipeline._key(session.text, ExtractionMode.HYBRID))
+        is None
+    )
@@ -0,0 +1,57 @@
+import asyncio
+
+from benchmarks.evaluate import (
+    CORPUS,
+    Recordings,
+    evaluate,
+    field_score,
+    load_corpus,
+)
+from hackathon.llm.chain import TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+from hackathon.llm.rules import ExtractionMode
+
+
+def test_field_score_normaliza_valores():
+    assert field_score('temperatura', '38,5 °C', '38.5') == 1.0
+    assert field_score('pressao_arterial', '120x80', '120/80 mmHg') == 1.0
+    assert field_score('frequencia_cardiaca', '90', '98') == 0.0
+    assert field_score('sintoma', 'Dor de Cabeça', 'dor de cabeca') == 1.0
+    assert field_score('sintoma', 'dor abdominal', 'dor') == 2 / 3
+    assert field_score('urgencia', None, None) == 1.0
+    assert field_score('urgencia', None, '3') == 0.0
+
+
+def test_evaluate_reaproveita_gravacoes(tmp_path):
+    corpus = load_corpus(CORPUS)[:3]
+    pipeline = TriagemPipeline(FakeTriagemChatModel())
+    path = tmp_path / 'gravacoes.jsonl'
+
+    first = asyncio.run(
+        evaluate(pipeline, corpus, ExtractionMode.LLM, Recordings(path), 4)
+    )
+    second = asyncio.run(
+        evaluate(pipeline, corpus, ExtractionMode.LLM, Recordings(path), 4)
+    )
+
+    assert first['erros'] == 0
+    assert first['gravadas'] == 0
+    assert second['gravadas'] == len(corpus)
+    assert second['média'] == first['média']
+    assert first['input_tokens'] > 0
+
+
+def test_gravacoes_separadas_por_few_shot_k(tmp_path):
+    corpus = load_corpus(CORPUS)[:2]
+    recordings = Recordings(tmp_path / 'gravacoes.jsonl')
+    todos, dois = (
+        TriagemPipeline(FakeTriagemChatModel(), few_shot_k=k) for k in (0, 2)
+    )
+
+    asyncio.run(evaluate(todos, corpus, ExtractionMode.LLM, recordings, 2))
+    report = asyncio.run(
+        evaluate(dois, corpus, ExtractionMode.LLM, recordings, 2)
+    )
+
+    assert todos.version != dois.version
+    assert report['gravadas'] == 0
@@ -0,0 +1,19 @@
+from hackathon.llm.examples import ExampleIndex
+from hackathon.llm.refine import triagem_examples
+
+
+def test_example_index_seleciona_mais_similar_por_ultimo():
+    index = ExampleIndex([text for text, _ in triagem_examples])
+
+    selected = index.select(
+        'Cefaleia frontal intensa, histórico de enxaqueca', 2
+    )
+
+    assert len(selected) == 2  # noqa: PLR2004
+    assert triagem_examples[selected[-1]][1].sintoma == 'dor de cabeça'
+
+
+def test_example_index_sem_k_devolve_todos():
+    index = ExampleIndex(['a', 'b', 'c'])
+
+    assert index.select('a', 0) == [0, 1, 2]
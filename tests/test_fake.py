@@ -0,0 +1,76 @@
+import json
+
+from langchain_cohere import ChatCohere
+
+from hackathon.llm.chain import TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+from hackathon.llm.profiles import PromptProfile, tool_schema
+from hackathon.llm.tokens import approx_tokens, token_report, tool_payload
+from hackathon.schemas import SinaisVitaisModel, TriagemModel
+
+NOTA = 'PA 150/90 mmHg, FC 110 bpm, saturação 93%, início em 10/11/2024.'
+
+
+def test_modelo_falso_ecoa_extracao_por_regras():
+    pipeline = TriagemPipeline(
+        FakeTriagemChatModel(), profile=PromptProfile.COMPACT
+    )
+
+    triagem = pipeline.invoke(NOTA)
+    parciais = list(pipeline.stream(NOTA + ' '))
+
+    assert triagem.sinais_vitais.pressao_arterial == '150/90 mmHg'  # type: ignore
+    assert triagem.sinais_vitais.saturacao_oxigenio == '93%'  # type: ignore
+    assert len(parciais) > 1
+    assert parciais[-1] == triagem
+
+
+def test_modelo_falso_com_resposta_fixa(client):
+    pipeline = client.app.state.pipeline
+    pipeline.runnable = TriagemPipeline(
+        FakeTriagemChatModel(response={'urgencia': '9'})
+    ).runnable
+
+    response = client.post('/api/v1/triagem/', json={'triagem_text': NOTA})
+
+    assert response.json()['urgencia'] == '9'
+    assert response.json()['id'] is not None
+
+
+def test_esquema_compacto_mantem_campos_dos_sinais_vitais():
+    sinais_vitais = tool_schema(TriagemModel)['properties']['sinais_vitais']
+
+    assert sinais_vitais['type'] == 'object'
+    assert set(sinais_vitais['properties']) == (
+        set(SinaisVitaisModel.model_fields) - {'id'}
+    )
+    assert sinais_vitais['properties']['temperatura']['description'] == (
+        'Em °C, como 37.5°C.'
+    )
+
+
+def test_cohere_recebe_as_chaves_dos_sinais_vitais_no_perfil_compacto():
+    llm = ChatCohere(model='command-r', cohere_api_key='teste')
+
+    (tool,) = json.loads(tool_payload(llm, tool_schema(TriagemModel)))
+    sinais_vitais = tool['parameter_definitions']['sinais_vitais']
+
+    # o Cohere achata a ferramenta: as chaves só chegam pela descrição
+    assert 'properties' not in sinais_vitais
+    for campo in set(SinaisVitaisModel.model_fields) - {'id'}:
+        assert campo in sinais_vitais['description']
+
+
+def test_relatorio_de_tokens_conta_a_ferramenta_enviada_pelo_modelo():
+    llm = ChatCohere(model='command-r', cohere_api_key='teste')
+    compact = tool_schema(TriagemModel)
+
+    report = token_report(PromptProfile.COMPACT, llm=llm)
+
+    assert report['tool_schema'] == approx_tokens(tool_payload(llm, compact))
+    assert (
+        report['tool_schema']
+        < token_report(PromptProfile.COMPACT, llm=FakeTriagemChatModel())[
+            'tool_schema'
+        ]
+    )
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from hackathon.fila import FilaPrioridade
+from hackathon.models import TriagemOrm
+from hackathon.schemas import TriagemModel
+from hackathon.writer import TriagemWriter
+
+CHEGADA = datetime(2024, 5, 1, 8)
+
+
+def test_fila_ordena_por_urgencia_e_chegada():
+    fila = FilaPrioridade()
+    fila.push(1, 5, CHEGADA)
+    fila.push(2, 9, CHEGADA + timedelta(minutes=2))
+    fila.push(3, 5, CHEGADA - timedelta(minutes=1))
+    fila.push(4, None, CHEGADA - timedelta(hours=1))
+
+    assert fila.peek().triagem_id == 2  # type: ignore  # noqa: PLR2004
+    assert [item.triagem_id for item in fila.top(10)] == [2, 3, 1, 4]
+    assert [fila.pop().triagem_id for _ in range(4)] == [2, 3, 1, 4]  # type: ignore
+    assert fila.pop() is None
+
+
+def test_fila_repriorizar_mantem_chegada():
+    fila = FilaPrioridade()
+    fila.push(1, 8, CHEGADA)
+    fila.push(2, 3, CHEGADA + timedelta(minutes=5))
+
+    item = fila.reprioritize(2, 8)
+
+    assert item.chegada == CHEGADA + timedelta(minutes=5)  # type: ignore
+    assert [item.triagem_id for item in fila.top(2)] == [1, 2]
+    assert fila.reprioritize(99, 1) is None
+
+    fila.reprioritize(2, 10)
+
+    assert [item.triagem_id for item in fila.top(10)] == [2, 1]
+    assert [fila.pop().triagem_id for _ in range(2)] == [2, 1]  # type: ignore
+
+
+def test_fila_reconstruida_a_partir_do_banco(engine, session):
+    fila = FilaPrioridade()
+    writer = TriagemWriter(engine, batch_size=10, flush_interval=60, fila=fila)
+    writer.start()
+
+    baixa = writer.submit(TriagemModel(urgencia='2'))
+    alta = writer.submit(TriagemModel(urgencia='7'))
+    writer.update(fila.pop().triagem_id, atendido_em=datetime.now())  # type: ignore
+    writer.stop()
+
+    assert session.scalar(
+        select(TriagemOrm.atendido_em).where(TriagemOrm.id == alta)
+    )
+
+    reconstruida = FilaPrioridade()
+    reconstruida.rebuild(session)
+
+    assert [item.triagem_id for item in reconstruida.top(10)] == [baixa]
@@ -0,0 +1,217 @@
+import asyncio
+import json
+from http import HTTPStatus
+from typing import ClassVar
+
+import pytest
+from sqlalchemy import select
+
+from hackathon.fila import FilaPrioridade
+from hackathon.ingest import (
+    Checkpoint,
+    IngestInterruptedError,
+    Ingestor,
+    main,
+    open_output,
+    read_rows,
+)
+from hackathon.llm.chain import TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+from hackathon.llm.rules import ExtractionMode
+from hackathon.models import TriagemOrm
+from hackathon.writer import TriagemWriter
+
+TOTAL = 30
+RETOMADA = 10
+
+
+class LimiteError(Exception):
+    status_code = HTTPStatus.TOO_MANY_REQUESTS
+
+
+class InstavelChatModel(FakeTriagemChatModel):
+    """
+    Responde 429 às `falhas` primeiras chamadas e às notas com "limite";
+    às notas com "inválida", um erro definitivo.
+    """
+
+    falhas: ClassVar[list[int]] = [0]
+
+    async def _agenerate(self, messages, *args, **kwargs):
+        texto = str(messages[-1].content)
+        if 'inválida' in texto:
+            raise ValueError('nota inválida')
+        if 'limite' in texto or self.falhas[0] > 0:
+            self.falhas[0] -= 1
+            raise LimiteError
+        return await super()._agenerate(messages, *args, **kwargs)
+
+
+def ingerir(tmp_path, textos: list[str], retries: int) -> Ingestor:
+    output = (tmp_path / 'saida.jsonl').open('a+', encoding='utf-8')
+    ingestor = Ingestor(
+        TriagemPipeline(InstavelChatModel()),
+        output,
+        None,
+        Checkpoint(tmp_path / 'notas.checkpoint'),
+        retries=retries,
+        retry_backoff=0,
+    )
+    try:
+        asyncio.run(
+            ingestor.run(
+                iter([{'texto': texto} for texto in textos]),
+                'texto',
+                ExtractionMode.LLM,
+                concurrency=2,
+                every=100,
+            )
+        )
+    finally:
+        output.close()
+    return ingestor
+
+
+def saida(tmp_path) -> list[dict]:
+    return [
+        json.loads(line)
+        for line in (tmp_path / 'saida.jsonl').read_text().splitlines()
+    ]
+
+
+def test_read_rows_jsonl_e_csv(tmp_path):
+    jsonl = tmp_path / 'notas.jsonl'
+    jsonl.write_text('{"texto": "a"}\n\n{"texto": "b"}\n', encoding='utf-8')
+    csv = tmp_path / 'notas.csv'
+    csv.write_text('id,texto\n1,a\n2,b\n', encoding='utf-8')
+
+    assert [row['texto'] for row in read_rows(jsonl)] == ['a', 'b']
+    assert [row['texto'] for row in read_rows(csv, skip=1)] == ['b']
+
+
+def test_ingestor_retoma_do_checkpoint_na_ordem(tmp_path):
+    entrada = tmp_path / 'notas.jsonl'
+    entrada.write_text(
+        ''.join(
+            json.dumps({'texto': f'FC {60 + i} bpm, tontura'}) + '\n'
+            for i in range(TOTAL)
+        ),
+        encoding='utf-8',
+    )
+    checkpoint = Checkpoint(tmp_path / 'notas.jsonl.checkpoint')
+    checkpoint.save(RETOMADA, 0)
+    pipeline = TriagemPipeline(FakeTriagemChatModel(jitter=0.01))
+
+    with (tmp_path / 'saida.jsonl').open('a+', encoding='utf-8') as output:
+        ingestor = Ingestor(
+            pipeline, output, None, Checkpoint(checkpoint.path)
+        )
+        asyncio.run(
+            ingestor.run(
+                read_rows(entrada, skip=RETOMADA),
+                'texto',
+                ExtractionMode.LLM,
+                concurrency=4,
+                every=7,
+            )
+        )
+
+    records = [
+        json.loads(line)
+        for line in (tmp_path / 'saida.jsonl').read_text().splitlines()
+    ]
+
+    assert [record['linha'] for record in records] == list(
+        range(RETOMADA, TOTAL)
+    )
+    assert records[0]['triagem']['sinais_vitais']['frequencia_cardiaca'] == (
+        f'{60 + RETOMADA} bpm'
+    )
+    assert Checkpoint(checkpoint.path).linhas == TOTAL
+
+
+def test_ingestor_grava_triagens_fora_da_fila(tmp_path, engine, session):
+    writer = TriagemWriter(engine, atendidas=True)
+    writer.start()
+    ingestor = Ingestor(
+        TriagemPipeline(FakeTriagemChatModel()),
+        None,
+        writer,
+        Checkpoint(tmp_path / 'notas.checkpoint'),
+    )
+
+    asyncio.run(
+        ingestor.run(
+            iter([{'texto': 'FC 120 bpm, dor no peito'}]),
+            'texto',
+            ExtractionMode.LLM,
+            concurrency=1,
+            every=1,
+        )
+    )
+    writer.stop()
+    fila = FilaPrioridade()
+    fila.rebuild(session)
+
+    triagem = session.scalars(select(TriagemOrm)).one()
+    assert triagem.atendido_em == triagem.criado_em
+    assert fila.top(10) == []
+
+
+def test_ingestor_repete_falhas_passageiras(tmp_path):
+    InstavelChatModel.falhas[0] = 2
+
+    ingestor = ingerir(tmp_path, ['FC 70 bpm', 'FC 80 bpm'], retries=3)
+
+    assert ingestor.errors == 0
+    assert [r['erro'] for r in saida(tmp_path)] == [None, None]
+
+
+def test_ingestor_para_antes_de_falha_passageira_persistente(tmp_path):
+    InstavelChatModel.falhas[0] = 0
+    textos = ['FC 70 bpm', 'nota inválida', 'FC 72 bpm', 'limite', 'FC 74']
+
+    with pytest.raises(IngestInterruptedError) as exc_info:
+        ingerir(tmp_path, textos, retries=1)
+
+    # o erro definitivo vira linha da saída; a falha passageira, não
+    assert exc_info.value.linha == textos.index('limite')
+    assert [r['erro'] for r in saida(tmp_path)] == [
+        None,
+        'nota inválida',
+        None,
+    ]
+    checkpoint = Checkpoint(tmp_path / 'notas.checkpoint')
+    assert checkpoint.linhas == textos.index('limite')
+    assert checkpoint.saida_bytes == (tmp_path / 'saida.jsonl').stat().st_size
+
+
+def test_saida_existente_so_e_sobrescrita_com_flag(tmp_path):
+    entrada = tmp_path / 'notas.jsonl'
+    entrada.write_text('{"triagem_text": "FC 80 bpm"}\n', encoding='utf-8')
+    existente = tmp_path / 'saida.jsonl'
+    existente.write_text('resultado anterior\n', encoding='utf-8')
+    checkpoint = Checkpoint(tmp_path / 'notas.checkpoint')
+
+    with pytest.raises(SystemExit):
+        main([str(entrada), '--saida', str(existente)])
+    with pytest.raises(FileExistsError):
+        open_output(existente, checkpoint)
+
+    assert existente.read_text(encoding='utf-8') == 'resultado anterior\n'
+    with open_output(existente, checkpoint, overwrite=True) as output:
+        assert output.tell() == 0
+    assert checkpoint.saida == str(existente.resolve())
+
+
+def test_saida_do_checkpoint_e_truncada_no_ponto_salvo(tmp_path):
+    saida = tmp_path / 'saida.jsonl'
+    saida.write_text('linha 0\nlinha 1 incompl', encoding='utf-8')
+    checkpoint = Checkpoint(tmp_path / 'notas.checkpoint')
+    checkpoint.saida = str(saida.resolve())
+    checkpoint.save(1, len('linha 0\n'))
+
+    with open_output(saida, Checkpoint(checkpoint.path)) as output:
+        output.write('linha 1\n')
+
+    assert saida.read_text(encoding='utf-8') == 'linha 0\nlinha 1\n'
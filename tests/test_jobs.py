@@ -0,0 +1,61 @@
+from http import HTTPStatus
+
+from hackathon.llm.chain import LLMLimiter, TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+
+NOTA = 'PA 120/80 mmHg, FC 80 bpm, dor de cabeça há dois dias'
+
+
+def test_job_processado_e_consultado_com_long_poll(client):
+    client.app.state.jobs.pipeline = TriagemPipeline(FakeTriagemChatModel())
+
+    response = client.post('/api/v1/triagem/jobs', json={'triagem_text': NOTA})
+    job_id = response.json()['id']
+
+    assert response.status_code == HTTPStatus.ACCEPTED
+
+    job = client.get(f'/api/v1/triagem/jobs/{job_id}?espera=5').json()
+
+    assert job['status'] == 'concluido'
+    assert job['triagem']['sinais_vitais']['pressao_arterial'] == '120/80 mmHg'
+    assert job['triagem']['id'] is not None
+
+
+def test_fila_de_jobs_cheia_responde_429(client):
+    jobs = client.app.state.jobs
+    jobs.pipeline = TriagemPipeline(FakeTriagemChatModel(latency=1))
+
+    # os workers pegam um job cada; a fila aceita mais `maxsize`
+    responses = [
+        client.post('/api/v1/triagem/jobs', json={'triagem_text': str(i)})
+        for i in range(jobs.workers + jobs._queue.maxsize + 1)
+    ]
+
+    assert responses[-2].status_code == HTTPStatus.ACCEPTED
+    assert responses[-1].status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert int(responses[-1].headers['Retry-After']) >= 1
+    assert client.get('/api/v1/triagem/jobs/inexistente').status_code == (
+        HTTPStatus.NOT_FOUND
+    )
+
+
+def test_jobs_esperam_vaga_com_o_limiter_saturado(client):
+    # uma vaga e prazo de fila curto: os demais jobs ficariam sem vaga
+    client.app.state.jobs.pipeline = TriagemPipeline(
+        FakeTriagemChatModel(latency=0.1),
+        limiter=LLMLimiter(max_concurrency=1, queue_timeout=0.01),
+    )
+
+    ids = [
+        client.post(
+            '/api/v1/triagem/jobs', json={'triagem_text': f'{NOTA} {i}'}
+        ).json()['id']
+        for i in range(4)
+    ]
+    jobs = [
+        client.get(f'/api/v1/triagem/jobs/{job_id}?espera=5').json()
+        for job_id in ids
+    ]
+
+    assert [job['status'] for job in jobs] == ['concluido'] * 4
+    assert all(job['erro'] is None for job in jobs)
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from hackathon.llm.chain import LLMLimiter, TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+
+URL = '/api/v1/triagem/async'
+
+
+def test_limite_de_concorrencia_responde_503_com_retry_after(client):
+    client.app.state.pipeline = TriagemPipeline(
+        FakeTriagemChatModel(latency=0.5),
+        limiter=LLMLimiter(max_concurrency=1, queue_timeout=0.05),
+    )
+
+    # notas diferentes: chamadas iguais seriam agrupadas em uma só
+    with ThreadPoolExecutor(2) as executor:
+        responses = list(
+            executor.map(
+                lambda text: client.post(URL, json={'triagem_text': text}),
+                ['dor de cabeça', 'dor nas costas'],
+            )
+        )
+
+    statuses = sorted(response.status_code for response in responses)
+    ocupado = next(
+        response
+        for response in responses
+        if response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    )
+
+    assert statuses == [HTTPStatus.OK, HTTPStatus.SERVICE_UNAVAILABLE]
+    assert ocupado.headers['Retry-After'] == '1'
+
+
+def test_prazo_esgotado_responde_504(client):
+    client.app.state.pipeline = TriagemPipeline(
+        FakeTriagemChatModel(latency=0.5)
+    )
+
+    response = client.post(
+        f'{URL}?timeout=0.05', json={'triagem_text': 'febre há dois dias'}
+    )
+
+    assert response.status_code == HTTPStatus.GATEWAY_TIMEOUT
+    assert response.json()['detail'] == 'O LLM não respondeu dentro do prazo'
@@ -0,0 +1,51 @@
+from hackathon.metrics import (
+    Counter,
+    Histogram,
+    Registry,
+    request_timings,
+    span,
+)
+
+
+def test_registry_renderiza_formato_de_exposicao():
+    registry = Registry()
+    requests = registry.register(
+        Counter('requests_total', 'Requisições.', ('status',))
+    )
+    latency = registry.register(
+        Histogram('latency_seconds', 'Latência.', buckets=(0.1, 1.0))
+    )
+
+    requests.inc(status='200')
+    requests.inc(2, status='200')
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    lines = registry.render().splitlines()
+
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{status="200"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'latency_seconds_count 2' in lines
+
+
+def test_span_acumula_tempo_da_requisicao():
+    timings: dict[str, float] = {}
+    token = request_timings.set(timings)
+
+    with span('persist'):
+        pass
+    with span('persist'):
+        pass
+
+    request_timings.reset(token)
+
+    assert list(timings) == ['persist']
+
+
+def test_endpoint_metrics(client):
+    response = client.get('/metrics')
+
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'llm_calls_total' in response.text
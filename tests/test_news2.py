@@ -0,0 +1,73 @@
+import numpy as np
+
+from hackathon.models import SinaisVitaisOrm, TriagemOrm
+from hackathon.news2 import RiscoNews2, news2, news2_points, rescore
+from hackathon.schemas import SinaisVitaisModel
+
+NORMAL = SinaisVitaisModel(
+    pressao_arterial='120/80 mmHg',
+    temperatura='36,7°C',
+    frequencia_cardiaca='80 bpm',
+    frequencia_respiratoria='16 rpm',
+    saturacao_oxigenio='98%',
+)
+GRAVE = SinaisVitaisModel(
+    pressao_arterial='85/50',
+    temperatura='39.5',
+    frequencia_cardiaca='135 bpm',
+    frequencia_respiratoria='28',
+    saturacao_oxigenio='90%',
+)
+
+
+def test_news2_pontua_as_faixas():
+    vitals = np.array([
+        [8, 91, 35.0, 90, 40],
+        [9, 92, 35.1, 91, 41],
+        [12, 94, 36.1, 101, 51],
+        [21, 96, 38.1, 111, 91],
+        [25, 100, 39.1, 220, 131],
+    ])
+
+    assert news2_points(vitals).tolist() == [
+        [3, 3, 3, 3, 3],
+        [1, 2, 1, 2, 1],
+        [0, 1, 0, 1, 0],
+        [2, 0, 1, 0, 1],
+        [3, 0, 2, 3, 3],
+    ]
+
+
+def test_news2_da_triagem():
+    assert news2(NORMAL).model_dump() == {
+        'pontuacao': 0,
+        'risco': RiscoNews2.BAIXO,
+        'parametros': 5,
+    }
+    assert news2(GRAVE).pontuacao == 14  # noqa: PLR2004
+    assert news2(GRAVE).risco == RiscoNews2.ALTO
+
+    isolado = SinaisVitaisModel(frequencia_respiratoria='30 rpm')
+    assert news2(isolado).model_dump() == {
+        'pontuacao': 3,
+        'risco': RiscoNews2.BAIXO_MEDIO,
+        'parametros': 1,
+    }
+    assert news2(None).parametros == 0
+
+
+def test_rescore_ordena_pela_pontuacao(session):
+    for triagem_id, sinais_vitais in enumerate([NORMAL, GRAVE, None]):
+        session.add(
+            TriagemOrm(
+                id=triagem_id,
+                sinais_vitais=sinais_vitais
+                and SinaisVitaisOrm(
+                    **sinais_vitais.model_dump(exclude={'id'})
+                ),
+            )
+        )
+    session.commit()
+
+    assert [item.triagem_id for item in rescore(session, 0, 10)] == [1, 0]
+    assert [item.triagem_id for item in rescore(session, 5, 10)] == [1]
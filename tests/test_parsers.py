@@ -0,0 +1,36 @@
+from datetime import date
+
+from hackathon.models import SinaisVitaisOrm, TriagemOrm
+from hackathon.parsers import parse_date, parse_pressao_arterial
+
+
+def test_parse_pressao_arterial():
+    assert parse_pressao_arterial('120/80 mmHg') == (120, 80)
+    assert parse_pressao_arterial('130x90') == (130, 90)
+    assert parse_pressao_arterial(None) == (None, None)
+
+
+def test_parse_date():
+    assert parse_date('08/11/2024') == date(2024, 11, 8)
+    assert parse_date('2024-11-10') == date(2024, 11, 10)
+    assert parse_date('ontem à noite') is None
+
+
+def test_orm_preenche_colunas_numericas():
+    triagem = TriagemOrm(
+        id=1,
+        urgencia='9',
+        escala_dor='8',
+        inicio_sintoma='08/11/2024',
+        sinais_vitais=SinaisVitaisOrm(
+            temperatura='36,7°C',
+            frequencia_cardiaca='85 bpm',
+            saturacao_oxigenio='97%',
+        ),
+    )
+
+    assert triagem.urgencia_nivel == 9  # noqa: PLR2004
+    assert triagem.escala_dor_nivel == 8  # noqa: PLR2004
+    assert triagem.inicio_sintoma_data == date(2024, 11, 8)
+    assert triagem.sinais_vitais.temperatura_celsius == 36.7  # type: ignore  # noqa: PLR2004
+    assert triagem.sinais_vitais.saturacao_oxigenio_pct == 97  # type: ignore  # noqa: PLR2004
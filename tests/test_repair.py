@@ -0,0 +1,120 @@
+import asyncio
+
+from langchain_cohere import ChatCohere
+
+from hackathon.llm.chain import TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+from hackathon.llm.repair import (
+    estimate_tokens,
+    invalid_fields,
+    repair_model,
+)
+from hackathon.llm.tokens import approx_tokens, tool_payload
+from hackathon.metrics import LLM_REPAIR_TOKENS_SAVED, LLM_REPAIRS
+from hackathon.schemas import SinaisVitaisModel, TriagemModel
+
+EXTRACAO = {
+    'sintoma': 'dor abdominal',
+    'escala_dor': 'muito forte',
+    'sinais_vitais': {'temperatura': '385', 'frequencia_cardiaca': '98'},
+}
+
+
+class ReparoChatModel(FakeTriagemChatModel):
+    """Responde à extração com `response` e ao reparo com `repair`."""
+
+    repair: dict = {}
+    calls: list[set[str]] = []
+
+    def _respond(self, messages, tools):
+        properties = set(tools[0]['function']['parameters']['properties'])
+        self.calls.append(properties)
+        if tools[0]['function']['name'] == 'TriagemReparo':
+            return FakeTriagemChatModel(response=self.repair)._respond(
+                messages, tools
+            )
+        return super()._respond(messages, tools)
+
+
+def test_invalid_fields_aponta_valores_fora_da_faixa():
+    triagem = TriagemModel(
+        escala_dor='12',
+        urgencia='7',
+        sinais_vitais=SinaisVitaisModel(
+            temperatura='385', saturacao_oxigenio='97%'
+        ),
+    )
+
+    assert invalid_fields(triagem) == ['temperatura', 'escala_dor']
+    assert invalid_fields(triagem, ['sintoma']) == [
+        'temperatura',
+        'sintoma',
+        'escala_dor',
+    ]
+    assert set(repair_model(('escala_dor',)).model_fields) == {'escala_dor'}
+
+
+def test_estimativa_de_tokens_usa_a_ferramenta_do_provedor():
+    schema = repair_model(('escala_dor', 'temperatura'))
+    cohere = ChatCohere(model='command-r', cohere_api_key='teste')
+
+    tokens = estimate_tokens(cohere, [], schema, '')
+
+    assert tokens == approx_tokens(tool_payload(cohere, schema))
+    assert tokens != estimate_tokens(FakeTriagemChatModel(), [], schema, '')
+
+
+def test_reparo_pede_ao_llm_so_os_campos_invalidos():
+    llm = ReparoChatModel(
+        response=EXTRACAO, repair={'escala_dor': '9'}, calls=[]
+    )
+    antes = LLM_REPAIRS.value(result='llm')
+
+    triagem = TriagemPipeline(llm).invoke(
+        'Dor abdominal muito forte, nota 9. Temperatura 38,5 °C.'
+    )
+
+    assert triagem.escala_dor == '9'
+    # a temperatura é corrigida pelas regras, sem ir ao LLM
+    assert triagem.sinais_vitais.temperatura == '38.5°C'  # type: ignore
+    assert triagem.sinais_vitais.frequencia_cardiaca == '98'  # type: ignore
+    assert triagem.sintoma == 'dor abdominal'
+    assert llm.calls[-1] == {'escala_dor'}
+    assert LLM_REPAIRS.value(result='llm') == antes + 1
+    assert LLM_REPAIR_TOKENS_SAVED.value() > 0
+
+
+def test_reparo_so_por_regras_nao_chama_o_llm():
+    llm = ReparoChatModel(
+        response={'sinais_vitais': {'temperatura': '385'}}, calls=[]
+    )
+    antes = LLM_REPAIRS.value(result='rules')
+
+    triagem = asyncio.run(
+        TriagemPipeline(llm).ainvoke('Febre: temperatura 38,5 °C.')
+    )
+
+    assert triagem.sinais_vitais.temperatura == '38.5°C'  # type: ignore
+    assert len(llm.calls) == 1
+    assert LLM_REPAIRS.value(result='rules') == antes + 1
+
+
+def test_reparo_mantem_valor_quando_o_llm_nao_corrige():
+    llm = ReparoChatModel(
+        response=EXTRACAO, repair={'escala_dor': 'forte'}, calls=[]
+    )
+    pipeline = TriagemPipeline(llm)
+    pipeline.repair = False
+
+    triagem = pipeline.invoke('Dor abdominal muito forte, febre alta.')
+
+    assert triagem.escala_dor == 'muito forte'
+    assert len(llm.calls) == 1
+
+    pipeline.repair = True
+    antes = LLM_REPAIRS.value(result='unchanged')
+
+    triagem = pipeline.invoke('Dor abdominal muito forte, febre.')
+
+    assert triagem.escala_dor == 'muito forte'
+    assert LLM_REPAIRS.value(result='unchanged') == antes + 1
@@ -0,0 +1,107 @@
+import asyncio
+import time
+from typing import ClassVar
+
+from hackathon.llm.chain import LLMLimiter, ModelRouter, TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+
+CURTA = 'PA 120/80 mmHg, FC 80 bpm, sem queixas'
+LONGA = (
+    'Paciente relata dor no peito intensa irradiando para o braço '
+    'esquerdo, com sudorese, náusea e histórico de hipertensão. PA '
+    '150/90 mmHg.'
+)
+LIMITE_PALAVRAS = 10
+ATRASO_HEDGE = 0.05
+
+
+class FailingChatModel(FakeTriagemChatModel):
+    def _generate(self, *args, **kwargs):
+        raise ConnectionError
+
+    async def _agenerate(self, *args, **kwargs):
+        raise ConnectionError
+
+
+class ContadorChatModel(FakeTriagemChatModel):
+    """Registra em `ativas` as chamadas em curso e o pico: [atual, pico]."""
+
+    ativas: ClassVar[list[int]] = [0, 0]
+
+    async def _agenerate(self, *args, **kwargs):
+        self.ativas[0] += 1
+        self.ativas[1] = max(self.ativas)
+        try:
+            return await super()._agenerate(*args, **kwargs)
+        finally:
+            self.ativas[0] -= 1
+
+
+def test_roteia_pela_quantidade_de_texto_livre():
+    pequeno = FakeTriagemChatModel(model='pequeno')
+    grande = FakeTriagemChatModel(model='grande')
+    router = ModelRouter(grande, [(LIMITE_PALAVRAS, pequeno)])
+
+    assert router.route(CURTA) == (pequeno, grande)
+    assert router.route(LONGA) == (grande, grande)
+
+
+def test_hedge_usa_a_resposta_mais_rapida():
+    pipeline = TriagemPipeline(
+        ModelRouter(
+            FakeTriagemChatModel(model='grande'),
+            [(LIMITE_PALAVRAS, FakeTriagemChatModel(latency=1.0))],
+            hedge_delay=ATRASO_HEDGE,
+        )
+    )
+
+    start = time.perf_counter()
+    triagem = pipeline.invoke(CURTA)
+    atriagem = asyncio.run(pipeline.ainvoke(CURTA + '.'))
+
+    assert time.perf_counter() - start < 1.0
+    assert triagem.sinais_vitais.pressao_arterial == '120/80 mmHg'  # type: ignore
+    assert atriagem.sinais_vitais == triagem.sinais_vitais
+
+
+def test_hedge_recorre_ao_secundario_quando_o_primario_falha():
+    pipeline = TriagemPipeline(
+        ModelRouter(
+            FakeTriagemChatModel(model='grande'),
+            [(LIMITE_PALAVRAS, FailingChatModel())],
+            hedge_delay=10,
+        )
+    )
+
+    triagem = pipeline.invoke(CURTA)
+    atriagem = asyncio.run(pipeline.ainvoke(CURTA + '.'))
+
+    assert triagem.sinais_vitais.frequencia_cardiaca == '80 bpm'  # type: ignore
+    assert atriagem.sinais_vitais == triagem.sinais_vitais
+
+
+def test_hedge_nao_passa_do_limite_de_concorrencia():
+    ativas = ContadorChatModel.ativas
+    limiter = LLMLimiter(max_concurrency=2, queue_timeout=10)
+    pipeline = TriagemPipeline(
+        ModelRouter(
+            ContadorChatModel(model='grande', latency=0.2),
+            [(LIMITE_PALAVRAS, ContadorChatModel(latency=0.2))],
+            hedge_delay=ATRASO_HEDGE,
+        ),
+        limiter=limiter,
+    )
+
+    async def extrair(n: int):
+        return await asyncio.gather(
+            *(pipeline.ainvoke(f'{CURTA} {i}') for i in range(n))
+        )
+
+    # com vaga livre, o hedge ocupa a segunda vaga
+    asyncio.run(extrair(1))
+    assert ativas == [0, 2]
+
+    triagens = asyncio.run(extrair(6))
+
+    assert ativas == [0, limiter.max_concurrency]
+    assert all(t.sinais_vitais.frequencia_cardiaca for t in triagens)  # type: ignore
@@ -0,0 +1,101 @@
+import pytest
+
+from hackathon.llm.chain import TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+from hackathon.llm.refine import triagem_examples
+from hackathon.llm.rules import (
+    ExtractionMode,
+    extract_rules,
+    extract_saturacao_oxigenio,
+    extract_sinais_vitais,
+    is_vitals_only,
+)
+
+SINTOMA = {'sintoma': 'queixa do paciente'}
+
+
+@pytest.mark.parametrize(('text', 'expected'), triagem_examples)
+def test_extract_rules_exemplos(text, expected):
+    triagem = extract_rules(text)
+
+    assert triagem.sinais_vitais == expected.sinais_vitais
+    assert triagem.inicio_sintoma == expected.inicio_sintoma
+
+
+def test_extract_rules_nota_abreviada():
+    triagem = extract_rules('PA: 130x90 FC 110 FR 22 SpO2 91% Tax 38,2')
+
+    assert triagem.sinais_vitais.model_dump(exclude_none=True) == {  # type: ignore
+        'pressao_arterial': '130/90 mmHg',
+        'temperatura': '38.2°C',
+        'frequencia_cardiaca': '110 bpm',
+        'frequencia_respiratoria': '22 rpm',
+        'saturacao_oxigenio': '91%',
+    }
+
+
+def test_extract_rules_nao_confunde_data_com_pressao():
+    triagem = extract_rules('Dor abdominal iniciada em 08/11/2024.')
+
+    assert triagem.sinais_vitais is None
+    assert triagem.inicio_sintoma == '08/11/2024'
+
+
+@pytest.mark.parametrize(
+    ('text', 'expected'),
+    [
+        ('SpO2 97, FC 80', '97%'),
+        ('Saturação de oxigênio em 88 %', '88%'),
+        ('Paciente satisfeito, 45 anos', None),
+        ('sem saturação aferida, idade 67 anos', None),
+        ('Sat 30%', None),
+    ],
+)
+def test_extract_saturacao_oxigenio(text, expected):
+    assert extract_saturacao_oxigenio(text) == expected
+
+
+@pytest.mark.parametrize(
+    'text',
+    [
+        'Temperatura: normal. Paciente de 40 anos',
+        'FC normal, paciente de 72 anos',
+        'FR sem alteração, 3 filhos',
+        'PA não aferida, 12/10 retorno',
+        'PA 300/400, FC 15, FR 90',
+    ],
+)
+def test_extract_sinais_vitais_ignora_numeros_longe_do_rotulo(text):
+    assert extract_sinais_vitais(text) is None
+
+
+def test_extract_sinais_vitais_aceita_rotulo_com_dois_pontos_ou_de():
+    sinais_vitais = extract_sinais_vitais(
+        'PA de 120/80, FC=88, FR: 18, temperatura de 37,8'
+    )
+
+    assert sinais_vitais.model_dump(exclude_none=True) == {  # type: ignore
+        'pressao_arterial': '120/80 mmHg',
+        'temperatura': '37.8°C',
+        'frequencia_cardiaca': '88 bpm',
+        'frequencia_respiratoria': '18 rpm',
+    }
+
+
+def test_is_vitals_only():
+    assert is_vitals_only('PA 120/80, FC 80, sem queixas')
+    assert is_vitals_only('SpO2 97% em ar ambiente, T.ax 36,5 °C')
+    assert not is_vitals_only(triagem_examples[0][0])
+
+
+@pytest.mark.parametrize(
+    'text',
+    ['febre 39 graus', 'dor 8/10, PA 130/85', 'Glicemia 120 mg/dl, FC 90'],
+)
+def test_nota_com_texto_livre_vai_ao_llm_no_modo_hibrido(text):
+    pipeline = TriagemPipeline(FakeTriagemChatModel(response=SINTOMA))
+
+    triagem = pipeline.invoke(text, ExtractionMode.HYBRID)
+
+    assert not is_vitals_only(text)
+    assert triagem.sintoma == SINTOMA['sintoma']
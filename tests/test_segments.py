@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from hackathon.llm.chain import TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+from hackathon.llm.segments import merge_triagens, split_segments
+from hackathon.schemas import SinaisVitaisModel, TriagemModel
+
+PLANTAO = """Paciente de 67 anos, hipertensa, deu entrada com dor torácica.
+
+08:00 PA 150/90 mmHg, FC 98 bpm, SpO2 95%. Refere náuseas.
+11:30 Reavaliada: FC 120 bpm, SpO2 91%, sudorese.
+Reavaliação às 14h: PA 100/60 mmHg, mantém dor.
+"""
+LATENCIA = 0.2
+
+
+def test_split_segments_separa_atendimentos():
+    segments = split_segments(PLANTAO, max_words=200)
+
+    assert len(segments) == 4  # noqa: PLR2004
+    assert segments[1].startswith('08:00')
+    assert segments[3].startswith('Reavaliação')
+
+
+def test_split_segments_junta_paragrafos_ate_o_limite():
+    texto = '\n\n'.join(['uma duas três'] * 5)
+
+    assert split_segments(texto, max_words=6) == [
+        'uma duas três\n\numa duas três',
+        'uma duas três\n\numa duas três',
+        'uma duas três',
+    ]
+    assert split_segments('nota curta', max_words=6) == ['nota curta']
+
+
+def test_merge_triagens_aplica_as_regras():
+    triagem = merge_triagens([
+        TriagemModel(
+            sintoma='dor torácica',
+            sintoma_localizacao='peito',
+            sintomas_associados='náuseas',
+            historico_familiar='câncer, mãe',
+            inicio_sintoma='2024-11-10',
+            urgencia='6',
+            sinais_vitais=SinaisVitaisModel(
+                pressao_arterial='150/90', frequencia_cardiaca='98 bpm'
+            ),
+        ),
+        TriagemModel(
+            sintoma='sudorese',
+            sintomas_associados='Náuseas, sudorese',
+            historico_familiar='hipertensão, pai',
+            inicio_sintoma='2024-11-08',
+            urgencia='9',
+            sinais_vitais=SinaisVitaisModel(frequencia_cardiaca='120 bpm'),
+        ),
+        TriagemModel(urgencia='8'),
+    ])
+
+    assert triagem.sintoma == 'dor torácica'
+    assert triagem.sintoma_localizacao == 'peito'
+    assert triagem.sintomas_associados == 'náuseas, sudorese'
+    assert triagem.historico_familiar == 'câncer, mãe; hipertensão, pai'
+    assert triagem.inicio_sintoma == '2024-11-08'
+    assert triagem.urgencia == '9'
+    assert triagem.sinais_vitais == SinaisVitaisModel(
+        pressao_arterial='150/90', frequencia_cardiaca='120 bpm'
+    )
+
+
+def test_pipeline_extrai_trechos_em_paralelo():
+    pipeline = TriagemPipeline(FakeTriagemChatModel(latency=LATENCIA))
+
+    start = time.perf_counter()
+    triagem = asyncio.run(pipeline.ainvoke_segments(PLANTAO))
+    assert time.perf_counter() - start < 2 * LATENCIA
+
+    start = time.perf_counter()
+    assert pipeline.invoke_segments(PLANTAO) == triagem
+    assert time.perf_counter() - start < 2 * LATENCIA
+
+    assert triagem.sinais_vitais == SinaisVitaisModel(
+        pressao_arterial='100/60 mmHg',
+        frequencia_cardiaca='120 bpm',
+        saturacao_oxigenio='91%',
+    )
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from hackathon.api.triagem import get_mode
+from hackathon.llm.rules import ExtractionMode
+from hackathon.settings import get_settings
+
+
+def test_importar_app_nao_le_configuracao():
+    # sem as variáveis de ambiente: a configuração só é lida quando o
+    # app sobe
+    result = subprocess.run(
+        [sys.executable, '-c', 'import hackathon.app'],
+        cwd=Path(__file__).resolve().parent.parent,
+        env={},
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_modo_padrao_lido_a_cada_requisicao(monkeypatch):
+    monkeypatch.setenv('EXTRACTION_MODE', 'hybrid')
+    get_settings.cache_clear()
+    try:
+        assert get_mode() == ExtractionMode.HYBRID
+        assert get_mode(ExtractionMode.RULES) == ExtractionMode.RULES
+    finally:
+        get_settings.cache_clear()
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hackathon.llm.singleflight import SingleFlight
+
+CHAMADAS = 8
+
+
+def test_chamadas_simultaneas_compartilham_o_resultado():
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def call():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return {'urgencia': '9'}
+
+    with ThreadPoolExecutor(CHAMADAS) as executor:
+        first = executor.submit(flights.do, 'nota', call)
+        started.wait()
+        others = [
+            executor.submit(flights.do, 'nota', call)
+            for _ in range(CHAMADAS - 1)
+        ]
+        results = [first.result()] + [other.result() for other in others]
+
+    assert len(calls) == 1
+    assert flights.coalesced == CHAMADAS - 1
+    assert all(result == {'urgencia': '9'} for result in results)
+    assert results[0] is not results[1]
+
+
+def test_chamadas_assincronas_compartilham_a_excecao():
+    flights = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise TimeoutError
+
+    async def run():
+        return await asyncio.gather(
+            *(flights.ado('nota', call) for _ in range(CHAMADAS)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(isinstance(result, TimeoutError) for result in results)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(flights.ado('nota', call))
+    assert len(calls) == 2  # noqa: PLR2004
@@ -0,0 +1,89 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+from hackathon.llm.cache import ExtractionCache
+from hackathon.llm.chain import LLMLimiter, TriagemPipeline
+from hackathon.llm.fake import FakeTriagemChatModel
+from hackathon.llm.rules import ExtractionMode
+
+URL = '/api/v1/triagem/stream'
+NOTA = 'PA 150/90 mmHg, FC 110 bpm, dor no peito há duas horas.'
+
+
+def eventos(response) -> list[tuple[str, dict]]:
+    """Pares (evento, dados) do corpo SSE; `data` quando sem nome."""
+    result = []
+    for bloco in response.text.split('\n\n'):
+        if not bloco:
+            continue
+        campos = dict(linha.split(': ', 1) for linha in bloco.split('\n'))
+        result.append((
+            campos.get('event', 'data'),
+            json.loads(campos['data']),
+        ))
+    return result
+
+
+def test_stream_emite_news2_parciais_e_fim(client):
+    client.app.state.pipeline = TriagemPipeline(FakeTriagemChatModel())
+
+    response = client.post(URL, json={'triagem_text': NOTA})
+    nomes = [nome for nome, _ in eventos(response)]
+    fim = eventos(response)[-1][1]
+
+    assert response.status_code == HTTPStatus.OK
+    assert nomes[0] == 'news2'
+    assert set(nomes[1:-1]) == {'data'}
+    assert len(nomes) > 3  # noqa: PLR2004
+    assert nomes[-1] == 'fim'
+    assert fim['id'] is not None
+    assert fim['sinais_vitais']['pressao_arterial'] == '150/90 mmHg'
+
+
+def test_stream_ocupado_e_prazo_viram_evento_de_erro(client):
+    pipeline = TriagemPipeline(
+        FakeTriagemChatModel(latency=0.5),
+        limiter=LLMLimiter(max_concurrency=1, queue_timeout=0.05),
+    )
+    client.app.state.pipeline = pipeline
+
+    response = client.post(f'{URL}?timeout=0.05', json={'triagem_text': NOTA})
+
+    assert eventos(response)[-1] == (
+        'erro',
+        {
+            'status': HTTPStatus.GATEWAY_TIMEOUT,
+            'detalhe': 'O LLM não respondeu dentro do prazo',
+        },
+    )
+
+    # ocupa a única vaga do limiter
+    asyncio.run(pipeline.limiter.semaphore.acquire())
+    response = client.post(URL, json={'triagem_text': 'febre alta'})
+
+    assert eventos(response)[-1][0] == 'erro'
+    assert eventos(response)[-1][1]['status'] == (
+        HTTPStatus.SERVICE_UNAVAILABLE
+    )
+
+
+def test_stream_repara_o_resultado_e_usa_chave_propria_no_cache():
+    texto = 'Febre: temperatura 38,5 °C.'
+    pipeline = TriagemPipeline(
+        FakeTriagemChatModel(
+            response={'sinais_vitais': {'temperatura': '385'}}
+        ),
+        cache=ExtractionCache(maxsize=8, ttl=60),
+    )
+
+    parciais = list(pipeline.stream(texto))
+
+    assert parciais[-2].sinais_vitais.temperatura == '385'  # type: ignore
+    assert parciais[-1].sinais_vitais.temperatura == '38.5°C'  # type: ignore
+    # o resultado do streaming não é servido a `invoke`
+    assert pipeline.cache.get(pipeline._key(texto, ExtractionMode.LLM)) is None
+    assert (
+        pipeline.cache.get(pipeline._stream_key(texto, ExtractionMode.LLM))
+        == (parciais[-1])
+    )
@@ -0,0 +1,79 @@
+import sqlite3
+from datetime import datetime
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import OperationalError
+
+from hackathon.models import TriagemOrm
+from hackathon.schemas import SinaisVitaisModel, TriagemModel
+from hackathon.writer import IdGenerator, TriagemWriter
+
+
+def test_id_generator_gera_ids_crescentes_e_unicos():
+    next_id = IdGenerator(node=1)
+
+    ids = [next_id() for _ in range(5000)]
+
+    assert ids == sorted(set(ids))
+    assert max(ids) < 2**53
+
+
+def test_writer_grava_lote_com_ids_atribuidos(engine, session):
+    writer = TriagemWriter(engine, batch_size=10, flush_interval=60)
+    writer.start()
+
+    ids = [
+        writer.submit(
+            TriagemModel(
+                urgencia=str(i),
+                sinais_vitais=SinaisVitaisModel(pressao_arterial='120/80'),
+            )
+        )
+        for i in range(3)
+    ]
+    writer.stop()
+
+    triagens = session.scalars(select(TriagemOrm)).all()
+
+    assert [triagem.id for triagem in triagens] == ids
+    assert triagens[0].sinais_vitais.pressao_arterial == '120/80'  # type: ignore
+
+
+def test_writer_isola_o_item_que_falha_sem_perder_o_lote(engine, session):
+    writer = TriagemWriter(engine, retries=0)
+    agora = datetime.now()
+    triagens = [TriagemModel(id=i, urgencia=str(i)) for i in (1, 2, 3)]
+    repetida = TriagemModel(id=2, urgencia='9')
+
+    writer.flush([
+        (triagens[0], agora),
+        (repetida, agora),
+        (triagens[1], agora),
+        (triagens[2], agora),
+    ])
+
+    assert writer.failed == 1
+    assert session.scalars(select(TriagemOrm.urgencia)).all() == [
+        '1',
+        '9',
+        '3',
+    ]
+
+
+def test_writer_repete_o_lote_apos_erro_operacional(engine, session):
+    falhas = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def falha_uma_vez(*args):
+        if not falhas:
+            falhas.append(1)
+            raise OperationalError(
+                'INSERT', {}, sqlite3.OperationalError('database is locked')
+            )
+
+    writer = TriagemWriter(engine, retries=2, retry_backoff=0)
+    writer.flush([(TriagemModel(id=1, urgencia='5'), datetime.now())])
+
+    assert falhas == [1]
+    assert writer.failed == 0
+    assert session.get(TriagemOrm, 1) is not None